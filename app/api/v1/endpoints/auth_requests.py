@@ -1,60 +1,70 @@
-from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi import APIRouter, HTTPException, Header, Depends, Query, Response
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
+import hmac
 import logging
-import jwt
 
-from ....models.auth_request import AuthRequestCreate, AuthRequestResponse
-from ....services.auth_request_service import AuthRequestService
-from ....database.session import supabase, SUPABASE_SERVICE_KEY
+from ....models.auth_request import (
+    AuthRequestCreate,
+    AuthRequestResponse,
+    BulkAuthRequestCreate,
+    BulkResult,
+    BulkStatusUpdate,
+)
+from ....core.config import settings
+from ....core.security import AuthenticationError, get_jwt_verifier
+from ....services.auth_request_service import (
+    PROJECTABLE_FIELDS,
+    AuthRequestService,
+    parse_fields,
+)
+from ....database.session import SUPABASE_SERVICE_KEY
+from ....utils.helpers import compute_etag, etag_matches
 
 router = APIRouter()
-auth_request_service = AuthRequestService()
 logger = logging.getLogger(__name__)
 
+_auth_request_service: Optional[AuthRequestService] = None
+
+
+async def get_auth_request_service() -> AuthRequestService:
+    global _auth_request_service
+    if _auth_request_service is None:
+        _auth_request_service = AuthRequestService()
+    return _auth_request_service
+
 # Fixed UUID for service role user
 SERVICE_ROLE_USER_ID = "e9d0682e-d6b4-41f2-ac38-514a0881264c"
 
 async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-    
+
+    token = authorization.split(" ")[1]
+
+    # For service role token, use the fixed UUID
+    if SUPABASE_SERVICE_KEY and hmac.compare_digest(token.encode(), SUPABASE_SERVICE_KEY.encode()):
+        logger.debug("Using service role token")
+        return {"id": SERVICE_ROLE_USER_ID, "role": "service_role"}
+
+    # User tokens are verified locally; see app/core/security.py
     try:
-        token = authorization.split(" ")[1]
-        logger.debug(f"Received token: {token[:10]}...")
-        
-        # For service role token, use the fixed UUID
-        if SUPABASE_SERVICE_KEY and token == SUPABASE_SERVICE_KEY:
-            logger.debug("Using service role token")
-            return {"id": SERVICE_ROLE_USER_ID, "role": "service_role"}
-            
-        # For user tokens, set the session and verify
-        try:
-            logger.debug("Attempting to set session and get user")
-            supabase.auth.set_session(token, token)
-            user = supabase.auth.get_user()
-            if user and user.user:
-                logger.debug(f"Found user with ID: {user.user.id}")
-                return user.user
-            else:
-                raise HTTPException(status_code=401, detail="Invalid user token")
-        except Exception as e:
-            logger.error(f"Error getting user: {str(e)}")
-            raise HTTPException(status_code=401, detail=f"Invalid user token: {str(e)}")
-            
-    except Exception as e:
-        logger.error(f"Authentication error: {str(e)}")
-        raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
+        claims = await get_jwt_verifier().verify(token)
+    except AuthenticationError as e:
+        logger.debug("Rejected user token: %s", e)
+        raise HTTPException(status_code=401, detail=f"Invalid user token: {str(e)}")
+    return {"id": claims["sub"], "role": claims.get("role"), "email": claims.get("email")}
 
 @router.post("/", response_model=AuthRequestResponse)
 async def create_auth_request(
     request: AuthRequestCreate,
-    user = Depends(get_current_user)
+    user = Depends(get_current_user),
+    auth_request_service: AuthRequestService = Depends(get_auth_request_service),
 ) -> AuthRequestResponse:
     try:
-        logger.debug(f"Creating auth request with user: {user}")
-        return auth_request_service.create_auth_request(request, user)
+        return await auth_request_service.create_auth_request(request, user)
     except Exception as e:
         logger.error(f"Error creating auth request: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -62,36 +72,118 @@ async def create_auth_request(
 @router.get("/", response_model=List[AuthRequestResponse])
 async def get_auth_requests(
     provider_id: UUID,
-    user = Depends(get_current_user)
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    payer_id: Optional[str] = None,
+    payer_name: Optional[str] = None,
+    submitted_from: Optional[datetime] = None,
+    submitted_to: Optional[datetime] = None,
+    limit: int = Query(
+        settings.AUTH_REQUEST_PAGE_SIZE, ge=1, le=settings.AUTH_REQUEST_MAX_PAGE_SIZE
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    user = Depends(get_current_user),
+    auth_request_service: AuthRequestService = Depends(get_auth_request_service),
 ) -> List[AuthRequestResponse]:
+    """List a provider's requests newest first, one page at a time.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    try:
+        filters = {
+            "status": status,
+            "priority": priority,
+            "payer_id": payer_id,
+            "payer_name": payer_name,
+            "submitted_from": submitted_from.isoformat() if submitted_from else None,
+            "submitted_to": submitted_to.isoformat() if submitted_to else None,
+        }
+        # Rows come back as JSON-ready dicts and are serialized directly,
+        # skipping a model object and response_model validation per row.
+        rows, next_cursor = await auth_request_service.get_auth_requests(
+            provider_id,
+            filters=filters,
+            limit=limit,
+            cursor=cursor,
+            fields=parse_fields(fields) or list(PROJECTABLE_FIELDS),
+        )
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return JSONResponse(content=rows, headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_batch_size(count: int) -> None:
+    if count > settings.AUTH_REQUEST_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {count} items; the limit is {settings.AUTH_REQUEST_BULK_MAX_ITEMS}",
+        )
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_auth_requests_bulk(
+    body: BulkAuthRequestCreate,
+    idempotency_key: Optional[str] = Header(None),
+    user = Depends(get_current_user),
+    auth_request_service: AuthRequestService = Depends(get_auth_request_service),
+) -> BulkResult:
+    """Create many requests; each item reports created, existing or invalid.
+
+    Send an Idempotency-Key header (or an idempotency_key per item) so a
+    retried batch returns the rows it already created instead of duplicates.
+    """
+    _check_batch_size(len(body.requests))
+    try:
+        return await auth_request_service.create_auth_requests(
+            body.requests, user, idempotency_key=idempotency_key
+        )
+    except Exception as e:
+        logger.error(f"Error creating auth requests in bulk: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/bulk/status", response_model=BulkResult)
+async def update_auth_request_statuses(
+    body: BulkStatusUpdate,
+    user = Depends(get_current_user),
+    auth_request_service: AuthRequestService = Depends(get_auth_request_service),
+) -> BulkResult:
+    """Set one status on many requests; each id reports updated, not_found or invalid."""
+    _check_batch_size(len(body.ids))
     try:
-        return auth_request_service.get_auth_requests(provider_id)
+        return await auth_request_service.update_auth_request_statuses(body.ids, body.status, user)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{request_id}", response_model=AuthRequestResponse)
 async def get_auth_request(
     request_id: UUID,
-    user = Depends(get_current_user)
+    if_none_match: Optional[str] = Header(None),
+    user = Depends(get_current_user),
+    auth_request_service: AuthRequestService = Depends(get_auth_request_service),
 ) -> AuthRequestResponse:
+    """Fetch one request; send its ETag back in If-None-Match to get a 304 when unchanged."""
     try:
-        request = auth_request_service.get_auth_request(request_id)
-        if not request:
-            raise HTTPException(status_code=404, detail="Authorization request not found")
-        return request
-    except HTTPException:
-        raise
+        body = await auth_request_service.get_auth_request_json(request_id, user)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if body is None:
+        raise HTTPException(status_code=404, detail="Authorization request not found")
+
+    etag = compute_etag(body)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.put("/{request_id}/status", response_model=AuthRequestResponse)
 async def update_auth_request_status(
     request_id: UUID,
     status: str,
-    user = Depends(get_current_user)
+    user = Depends(get_current_user),
+    auth_request_service: AuthRequestService = Depends(get_auth_request_service),
 ) -> AuthRequestResponse:
     try:
-        request = auth_request_service.update_auth_request_status(request_id, status)
+        request = await auth_request_service.update_auth_request_status(request_id, status, user)
         if not request:
             raise HTTPException(status_code=404, detail="Authorization request not found")
         return request
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from typing import List, Optional
+from functools import partial
+from app.core.config import settings
+from app.models.job import ExtractionJobResponse
+from app.services.extraction_jobs import (
+    CallbackURLError,
+    ExtractionJobManager,
+    QueueFullError,
+    check_callback_url,
+)
+from app.services.image_preprocessor import summarize_preprocessing
+from app.services.interfaces import FileHandler
+from app.services.job_queue import create_job_queue
+from app.services.rate_limiter import DEFAULT_PRIORITY
+from app.api.v1.endpoints.form_extraction import (
+    get_ai_processor,
+    get_file_handler,
+    read_uploads,
+)
+
+router = APIRouter()
+
+_job_manager: Optional[ExtractionJobManager] = None
+
+
+async def get_job_manager() -> ExtractionJobManager:
+    global _job_manager
+    if _job_manager is None:
+        # Background jobs wait behind interactive Emergency/Urgent extractions.
+        _job_manager = ExtractionJobManager(
+            partial(get_ai_processor, DEFAULT_PRIORITY), create_job_queue()
+        )
+    return _job_manager
+
+
+async def shutdown_job_manager() -> None:
+    global _job_manager
+    if _job_manager is not None:
+        await _job_manager.stop()
+    _job_manager = None
+
+
+@router.post("/extract-jobs/", response_model=ExtractionJobResponse, status_code=202)
+async def submit_extraction_job(
+    files: List[UploadFile] = File(...),
+    additional_notes: str = None,
+    callback_url: str = None,
+    file_handler: FileHandler = Depends(get_file_handler),
+    job_manager: ExtractionJobManager = Depends(get_job_manager),
+):
+    """
+    Queue a form extraction and return its job id immediately.
+
+    - Poll GET /extract-jobs/{job_id} for the result
+    - Or pass callback_url (a host in JOB_CALLBACK_HOSTS) to receive the finished job as a POST
+    - Returns 429 when the queue is full
+    """
+    if callback_url:
+        try:
+            check_callback_url(callback_url)
+        except CallbackURLError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    processed_contents = await read_uploads(files, file_handler)
+    try:
+        job = await job_manager.submit(
+            processed_contents,
+            additional_notes,
+            callback_url=callback_url,
+            metadata=summarize_preprocessing(processed_contents),
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(settings.JOB_RETRY_AFTER)},
+        )
+    return job
+
+
+@router.get("/extract-jobs/{job_id}", response_model=ExtractionJobResponse)
+async def get_extraction_job(
+    job_id: str,
+    job_manager: ExtractionJobManager = Depends(get_job_manager),
+):
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Extraction job not found")
+    return job
@@ -1,11 +1,28 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from typing import List, Dict, Any
 from app.models.response import FormExtractionResponse
 from app.services.file_handler import ImageFileHandler
 from app.services.gpt_processor import GPTVisionProcessor
+from app.services.code_index import CodeCheckingProcessor
+from app.services.coalescing import CoalescingAIProcessor
+from app.services.extraction_cache import CachingAIProcessor, get_extraction_cache
+from app.services.image_preprocessor import summarize_preprocessing
+from app.services.model_router import ModelRouter, get_model_backends
+from app.services.ocr_prepass import OcrPrepassProcessor
+from app.services.openai_client import OpenAIAPIError
+from app.services.parallel_extraction import ParallelExtractionProcessor
+from app.services.rate_limiter import (
+    DEFAULT_PRIORITY,
+    RateLimitedProcessor,
+    estimate_call_tokens,
+    get_model_scheduler,
+)
+from app.core.config import settings
+from app.core.metrics import EXTRACTION_STAGE_SECONDS
 from app.services.response_mapper import GPTResponseMapper
 from app.services.interfaces import FileHandler, AIModelProcessor, ResponseMapper
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import json
 import traceback
 
 router = APIRouter()
@@ -15,7 +32,35 @@ async def get_file_handler() -> FileHandler:
     return ImageFileHandler()
 
 
-async def get_ai_processor() -> AIModelProcessor:
+PRIORITY_QUERY = Query(
+    DEFAULT_PRIORITY,
+    description="Emergency, Urgent or Standard; orders calls waiting for OpenAI rate-limit budget",
+)
+
+
+async def get_ai_processor(priority: str = PRIORITY_QUERY) -> AIModelProcessor:
+    if settings.MODEL_BACKENDS:
+        processor = ModelRouter(get_model_backends(), priority=priority)
+    else:
+        processor = RateLimitedProcessor(GPTVisionProcessor(), priority=priority)
+    if settings.EXTRACTION_FANOUT:
+        processor = ParallelExtractionProcessor(processor)
+    if settings.OCR_PREPASS:
+        # Outside the fan-out, so pages answered by the rules make no call at all.
+        processor = OcrPrepassProcessor(processor)
+    if settings.CODE_INDEX:
+        # Also checks the codes read by the OCR rules; cached answers are already checked.
+        processor = CodeCheckingProcessor(processor)
+    cache = get_extraction_cache()
+    if cache is not None:
+        processor = CachingAIProcessor(processor, cache)
+    if settings.EXTRACTION_COALESCE:
+        # Outermost, so concurrent cache misses for the same files share one call.
+        processor = CoalescingAIProcessor(processor, priority=priority)
+    return processor
+
+
+async def get_streaming_processor() -> GPTVisionProcessor:
     return GPTVisionProcessor()
 
 
@@ -23,8 +68,29 @@ async def get_response_mapper() -> ResponseMapper:
     return GPTResponseMapper()
 
 
+async def read_uploads(
+    files: List[UploadFile], file_handler: FileHandler
+) -> List[Dict[str, Any]]:
+    """Validate uploads and turn them into content items for the model."""
+    processed_contents = []
+    for file in files:
+        # Validate file
+        with EXTRACTION_STAGE_SECONDS.labels("validate_file").time():
+            await file_handler.validate_file(file)
+
+        # Process file (PDFs yield one item per page)
+        with EXTRACTION_STAGE_SECONDS.labels("process_file").time():
+            async for processed_content in file_handler.iter_file(file):
+                processed_contents.append(processed_content)
+
+    if not processed_contents:
+        raise HTTPException(status_code=400, detail="No valid files to process")
+    return processed_contents
+
+
 @router.post("/extract-form-data/", response_model=FormExtractionResponse)
 async def extract_form_data(
+    http_response: Response,
     files: List[UploadFile] = File(...),
     additional_notes: str = None,
     file_handler: FileHandler = Depends(get_file_handler),
@@ -37,21 +103,11 @@ async def extract_form_data(
     - Accepts multiple files (images/PDFs)
     - Optional additional notes for context
     - Returns structured form data with confidence scores
+    - Sets `X-Extraction-Status: partial` if some pages could not be read
     """
     try:
         # Validate and process files
-        processed_contents = []
-        for file in files:
-            # Validate file
-            await file_handler.validate_file(file)
-
-            # Process file
-            processed_content = await file_handler.process_file(file)
-            if processed_content:
-                processed_contents.append(processed_content)
-
-        if not processed_contents:
-            raise HTTPException(status_code=400, detail="No valid files to process")
+        processed_contents = await read_uploads(files, file_handler)
 
         # Process with AI
         ai_response = await ai_processor.process_content(
@@ -59,8 +115,14 @@ async def extract_form_data(
         )
 
         # Map to response
-        return response_mapper.map_to_response(ai_response)
+        response = response_mapper.map_to_response(ai_response)
+        response.processing_metadata.update(summarize_preprocessing(processed_contents))
+        if response.processing_metadata.get("status") == "partial":
+            http_response.headers["X-Extraction-Status"] = "partial"
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -69,3 +131,58 @@ async def extract_form_data(
                 "traceback": traceback.format_exc()
             }
         )
+
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/extract-form-data/stream")
+async def stream_form_data(
+    files: List[UploadFile] = File(...),
+    additional_notes: str = None,
+    file_handler: FileHandler = Depends(get_file_handler),
+    processor: GPTVisionProcessor = Depends(get_streaming_processor),
+    priority: str = PRIORITY_QUERY,
+):
+    """
+    Stream form extraction results as server-sent events.
+
+    - Emits a `section` event as soon as each section (patient_info, ...) is parsed
+    - Ends with a `complete` event carrying the full FormExtractionResponse
+    - Emits an `error` event if extraction fails mid-stream
+    """
+    processed_contents = await read_uploads(files, file_handler)
+    preprocessing = summarize_preprocessing(processed_contents)
+
+    async def events():
+        # Streams are not retried once started; they only wait for budget.
+        scheduler = get_model_scheduler()
+        cost = estimate_call_tokens(processor, processed_contents, additional_notes)
+        # A stream that failed or was dropped after it started was billed in full.
+        used = cost
+        await scheduler.acquire(cost, priority)
+        try:
+            async for event, data in processor.stream_content(
+                processed_contents, additional_notes
+            ):
+                if event == "complete":
+                    used = data.processing_metadata.get("total_tokens") or cost
+                    data.processing_metadata.update(preprocessing)
+                    data = data.model_dump(mode="json")
+                yield _sse_event(event, data)
+        except OpenAIAPIError as e:
+            # Rejected before the stream started, so not billed against the limit.
+            used = 0
+            yield _sse_event("error", {"error": str(e)})
+        except Exception as e:
+            yield _sse_event("error", {"error": str(e)})
+        finally:
+            scheduler.settle(cost, used)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,16 +1,7 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
 import os
 from dotenv import load_dotenv
-import logging
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-
-# Set Supabase client logging to DEBUG
-logging.getLogger("supabase").setLevel(logging.DEBUG)
 
 load_dotenv()
 
@@ -27,13 +18,144 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+    OPENAI_TIMEOUT: float = 60.0  # seconds, per call
+    OPENAI_CONNECT_TIMEOUT: float = 5.0
+    OPENAI_MAX_CONNECTIONS: int = 20
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+    # Client-side budgets matching the account's rate limits; 0 disables a budget
+    OPENAI_RPM_LIMIT: int = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+    OPENAI_TPM_LIMIT: int = int(os.getenv("OPENAI_TPM_LIMIT", "300000"))
+    OPENAI_RATE_BURST: float = 10.0  # seconds of budget that may be spent at once
+    OPENAI_MAX_RETRIES: int = 4  # on 429 and 5xx
+    OPENAI_RETRY_BACKOFF: float = 1.0  # seconds, doubled per attempt with full jitter
+    OPENAI_RETRY_MAX_WAIT: float = 60.0
+    # json_schema (strict structured output), json_object or none
+    OPENAI_RESPONSE_FORMAT: str = os.getenv("OPENAI_RESPONSE_FORMAT", "json_schema")
+    OPENAI_SECTION_RETRIES: int = 1  # follow-up calls for sections missing from the output
+
+    # Model router: set MODEL_BACKENDS (a JSON list) to route calls across several
+    # backends, e.g. [{"name": "mini", "model": "gpt-4.1-mini", "cost": 0.4},
+    # {"name": "eu", "base_url": "https://...", "api_key_env": "EU_KEY", "rpm": 100},
+    # {"name": "local", "type": "stub"}]. Empty means one gpt-4.1 backend as before.
+    MODEL_BACKENDS: List[Dict[str, Any]] = []
+    MODEL_ROUTER_WINDOW: int = 100  # recent calls per backend behind its p95 and error rate
+    MODEL_ROUTER_MIN_SAMPLES: int = 5  # successes needed before a backend's p95 is used
+    MODEL_ROUTER_DEFAULT_LATENCY: float = 10.0  # seconds, assumed p95 until then
+    MODEL_ROUTER_COST_WEIGHT: float = 1.0  # seconds of p95 one unit of backend cost is worth
+    MODEL_ROUTER_MAX_HEDGES: int = 1  # extra backends raced once the first passes its p95
+    MODEL_ROUTER_BREAKER_FAILURES: int = 5  # consecutive failures that open a circuit
+    MODEL_ROUTER_BREAKER_RESET: float = 30.0  # seconds before an open circuit is retried
+
+    # Fan-out extraction: one model call per document or page chunk, merged afterwards.
+    # Off by default: a failed chunk leaves its pages unread (status "partial").
+    EXTRACTION_FANOUT: bool = False
+    EXTRACTION_CHUNK_SIZE: int = 2  # max pages per model call
+    EXTRACTION_MAX_CONCURRENCY: int = 5  # concurrent model calls per request
+
+    # Extraction result cache
+    EXTRACTION_CACHE_BACKEND: str = os.getenv("EXTRACTION_CACHE_BACKEND", "memory")  # memory, sqlite or none
+    EXTRACTION_CACHE_TTL: int = 24 * 60 * 60  # seconds
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 512
+    EXTRACTION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # memory backend only
+    EXTRACTION_CACHE_PATH: str = os.getenv(
+        "EXTRACTION_CACHE_PATH", ".cache/extractions.sqlite3"
+    )
+
+    # Request coalescing: identical extractions in flight share one model
+    # call, and the result is kept briefly for late duplicates
+    EXTRACTION_COALESCE: bool = True
+    EXTRACTION_COALESCE_TTL: float = 30.0  # seconds
+    EXTRACTION_COALESCE_MAX_ENTRIES: int = 256
+
+    # Extraction job queue
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "memory")  # memory or sqlite
+    JOB_QUEUE_PATH: str = os.getenv("JOB_QUEUE_PATH", ".cache/jobs.sqlite3")
+    JOB_WORKERS: int = 4
+    JOB_QUEUE_MAX_DEPTH: int = 100  # waiting jobs before submissions get 429
+    JOB_TIMEOUT: float = 300.0  # seconds per job
+    JOB_RETENTION: int = 1000  # finished jobs kept by the memory backend
+    JOB_WEBHOOK_TIMEOUT: float = 10.0
+    # Hosts callback_url may point at ("hooks.example.com", or "*.example.com" for its
+    # subdomains); empty refuses callbacks. Hosts resolving to private addresses are refused.
+    JOB_CALLBACK_HOSTS: List[str] = []
+    JOB_RETRY_AFTER: int = 5  # Retry-After seconds sent with 429
 
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_FILE_TYPES: List[str] = ["image/jpeg", "image/png", "application/pdf"]
+    STREAMING_UPLOADS: bool = True  # chunked reads, size cap and magic-byte sniffing
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024  # bytes per read when streaming
+
+    # PDF rasterization
+    PDF_RASTER_DPI: int = 150
+    PDF_MAX_PAGES: int = 200
+    PDF_RENDER_PREFETCH: int = 2  # pages rendered ahead of the consumer
+
+    # Image preprocessing before model upload
+    IMAGE_PREPROCESSING: bool = True
+    IMAGE_MAX_EDGE: int = 2048  # pixels, longest edge
+    IMAGE_OUTPUT_FORMAT: str = "JPEG"  # JPEG or WEBP
+    IMAGE_QUALITY: int = 85
+    IMAGE_GRAYSCALE_SATURATION: int = 16  # mean HSV saturation (0-255) below which scans go grayscale
+
+    # Local OCR pre-pass for typed forms: fields read by anchor rules fill the response
+    # (no model call when all are found); readable pages go to the model as text
+    OCR_PREPASS: bool = False
+    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "tesseract")  # tesseract, bitmap or module:Class
+    OCR_MIN_CONFIDENCE: float = 0.9  # lines below this are cropped instead of read
+    OCR_MIN_READABLE: float = 0.6  # share of a page's lines readable to send it as text
+    OCR_MAX_CROP_AREA: float = 0.5  # share of a page crops may cover before it is sent whole
+
+    # CPT/HCPCS and ICD-10-CM code index: extracted codes are normalized and checked
+    # (OCR misreads corrected), auth requests with unknown codes are rejected
+    CODE_INDEX: bool = False
+    CODE_SET_DIR: str = os.getenv("CODE_SET_DIR", "")  # default: the sample sets in app/data/code_sets
+    CODE_INDEX_CACHE_DIR: str = ".cache/code_index"  # compiled indexes, memory-mapped
+    CODE_MAX_SUGGESTIONS: int = 5
+
+    # Process pool for CPU-bound work (PDF rendering, image preprocessing, OCR)
+    WORKER_PROCESSES: int = 2
+
+    # Auth request storage: "supabase" (PostgREST over pooled HTTP/2) or "sqlite" (local stand-in)
+    AUTH_REQUEST_BACKEND: str = os.getenv("AUTH_REQUEST_BACKEND", "supabase")
+    SUPABASE_TIMEOUT: float = 10.0  # seconds, per call
+    SUPABASE_MAX_RETRIES: int = 3
+    SUPABASE_RETRY_BACKOFF: float = 0.2  # seconds, doubled per attempt with full jitter
+    SUPABASE_MAX_CONNECTIONS: int = 50
+    LOCAL_DATABASE_URL: str = os.getenv(
+        "LOCAL_DATABASE_URL", "sqlite:///.cache/auth_requests.sqlite3"
+    )
+    AUTH_REQUEST_PAGE_SIZE: int = 50  # default rows per GET /auth-requests page
+    AUTH_REQUEST_MAX_PAGE_SIZE: int = 500
+    AUTH_REQUEST_BULK_CHUNK_SIZE: int = 500  # rows per multi-row insert/update
+    AUTH_REQUEST_BULK_MAX_ITEMS: int = 5000
+    # Read-through cache for GET /auth-requests/{id}: memory, redis or none
+    AUTH_REQUEST_CACHE_BACKEND: str = os.getenv("AUTH_REQUEST_CACHE_BACKEND", "memory")
+    AUTH_REQUEST_CACHE_TTL: float = 30.0  # seconds; also bounds staleness across processes
+    AUTH_REQUEST_CACHE_MAX_ENTRIES: int = 10000  # memory backend only
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Supabase JWTs are verified locally: HS256 with the project's JWT secret,
+    # asymmetric algorithms against its JWKS (refreshed in the background)
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    SUPABASE_JWT_ISSUER: str = os.getenv("SUPABASE_JWT_ISSUER", "")  # default: {SUPABASE_URL}/auth/v1
+    JWT_LEEWAY: float = 30.0  # seconds of clock skew allowed on exp/iat
+    JWKS_REFRESH_INTERVAL: float = 600.0
+    JWKS_MIN_REFRESH_INTERVAL: float = 30.0  # floor between refreshes for unknown key ids
+    AUTH_CACHE_TTL: float = 60.0  # verified claims, capped at the token's exp
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+
+    # Prometheus-style /metrics endpoint and per-route HTTP metrics
+    METRICS_ENABLED: bool = True
 
-    # Logging
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG")
+    # Logging; see app/core/logging.py
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text or json (one object per line)
+    LOG_QUEUE_SIZE: int = 10000  # records waiting for the writer thread before new ones are dropped
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01  # share of DEBUG payload logs that are written
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,253 @@
+"""Application logging: queued output, request ids, payload sampling and PHI redaction.
+
+Records are handed to a bounded queue and written by a background listener
+thread, so a request never waits on stderr. Every record carries the id of
+the request it was logged under. Full payloads (model responses, rows,
+user objects) go through log_payload, which is a no-op unless DEBUG is on
+and the record is sampled, and whose PHI fields are redacted before the
+record leaves the calling thread.
+"""
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import time
+import uuid
+
+from .config import settings
+from .metrics import Counter
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+REDACTED = "[REDACTED]"
+
+# Keys whose values are patient data or identify a person, wherever they
+# appear in a logged payload (rows, model output, user objects).
+PHI_FIELDS = frozenset(
+    {
+        "patient_name",
+        "patient_id",
+        "name",
+        "date_of_birth",
+        "dob",
+        "email",
+        "phone",
+        "address",
+        "procedure_description",
+        "diagnosis_description",
+        "medical_justification",
+        "primary_diagnosis",
+        "symptoms",
+        "affected_area",
+        "prescribed_treatment",
+        "policy_number",
+        "value",
+        "content",
+        "image",
+        "image_url",
+    }
+)
+
+# Attributes every LogRecord has; anything else came in through extra=.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full."
+)
+
+access_logger = logging.getLogger("app.access")
+
+
+def redact(value: Any) -> Any:
+    """Return a copy of value with PHI fields replaced, recursing into dicts and lists."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in PHI_FIELDS and item is not None else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if hasattr(value, "model_dump"):
+        return redact(value.model_dump(mode="json"))
+    return value
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any) -> None:
+    """Log a verbose payload at DEBUG for a sample of calls, with PHI redacted.
+
+    Costs one level check when DEBUG is off, so it is safe on hot paths.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.debug(message, extra={"payload": redact(payload)})
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp each record with the current request id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via extra= become keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + (
+            f".{int(record.msecs):03d}Z"
+        )
+
+
+class TextFormatter(logging.Formatter):
+    """The previous human-readable format, plus request id and payload."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        text = super().format(record)
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            text += " " + json.dumps(payload, default=str)
+        return text
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records, rather than blocking or erroring, when full.
+
+    As with the stdlib handler, args and tracebacks are merged into the
+    message before queueing, while the objects they refer to are still in
+    their logged state; the output formatter runs on the listener thread.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that sets the request id and writes one access log line.
+
+    A well-formed incoming X-Request-ID is reused so ids line up with the
+    caller's logs; otherwise a new one is generated. The id is echoed back
+    in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == _REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (_REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "%s %s %s %.1fms",
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    (time.perf_counter() - started) * 1000,
+                )
+            request_id_var.reset(token)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    handler: Optional[logging.Handler] = None,
+) -> None:
+    """Route all logging through a queue to one handler on a background thread.
+
+    Replaces any handlers already on the root logger. handler defaults to
+    stderr; log_format is "json" or "text".
+    """
+    global _listener
+    stop_logging()
+
+    output = handler or logging.StreamHandler()
+    output.setFormatter(
+        JSONFormatter() if (log_format or settings.LOG_FORMAT) == "json" else TextFormatter()
+    )
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,411 @@
+"""In-process metrics with Prometheus text exposition.
+
+A deliberately small subset of prometheus_client: counters, gauges and
+histograms with fixed label names, kept in one registry and rendered on
+demand by the /metrics endpoint. Recording a sample is a dict lookup for
+the label set plus a few additions under a lock, so it is cheap enough to
+leave on in the request path.
+"""
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import math
+import threading
+import time
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Timer:
+    """Context manager that observes its elapsed seconds into a histogram child."""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _InProgress:
+    """Context manager that holds a gauge child up by one while the block runs."""
+
+    __slots__ = ("_child",)
+
+    def __init__(self, child: "_GaugeChild"):
+        self._child = child
+
+    def __enter__(self) -> "_InProgress":
+        self._child.inc()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.dec()
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def track_inprogress(self) -> _InProgress:
+        return _InProgress(self)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_upper_bounds", "bucket_counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        # Per-bucket (not cumulative) counts; the last slot is +Inf.
+        self.bucket_counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["MetricsRegistry"] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the child for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(
+                    tuple(str(value) for value in values), self._new_child()
+                )
+            self._children.setdefault(values, child)
+        return child
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        # labels() may alias a child under non-string values; list each once.
+        seen = set()
+        items = []
+        for values, child in list(self._children.items()):
+            if id(child) not in seen:
+                seen.add(id(child))
+                items.append((tuple(str(value) for value in values), child))
+        return items
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for values, child in self._items():
+            yield "", _format_labels(self.labelnames, values), child.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._children[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def track_inprogress(self) -> _InProgress:
+        return self._children[()].track_inprogress()
+
+    def _samples(self):
+        for values, child in self._items():
+            yield "", _format_labels(self.labelnames, values), child.value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional["MetricsRegistry"] = None,
+    ):
+        upper_bounds = tuple(sorted(float(b) for b in buckets))
+        if not upper_bounds or upper_bounds[-1] != math.inf:
+            upper_bounds += (math.inf,)
+        self.upper_bounds = upper_bounds
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def _samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for values, child in self._items():
+            with child._lock:
+                counts = list(child.bucket_counts)
+                total, count = child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.upper_bounds, counts):
+                cumulative += bucket_count
+                yield "_bucket", _format_labels(
+                    bucket_names, values + (_format_value(bound),)
+                ), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Extraction pipeline
+EXTRACTION_STAGE_SECONDS = Histogram(
+    "extraction_stage_seconds",
+    "Time spent in each form extraction stage.",
+    ["stage"],
+)
+MODEL_CALLS_IN_FLIGHT = Gauge(
+    "openai_requests_in_flight", "Chat completion requests awaiting a response."
+)
+OPENAI_TOKENS = Counter(
+    "openai_tokens_total", "Tokens reported by the OpenAI API.", ["model", "type"]
+)
+MODEL_CALLS_QUEUED = Gauge(
+    "openai_requests_queued", "Model calls waiting for rate-limit budget."
+)
+MODEL_QUEUE_WAIT_SECONDS = Histogram(
+    "openai_queue_wait_seconds",
+    "Time model calls waited for rate-limit budget, by priority.",
+    ["priority"],
+)
+OPENAI_RETRIES = Counter(
+    "openai_retries_total", "Model calls retried after a retryable error.", ["status"]
+)
+MODEL_OUTPUT_REPAIRS = Counter(
+    "model_output_repairs_total",
+    "Model outputs that were not clean JSON, by how they were handled.",
+    ["kind"],
+)
+MODEL_SECTION_RETRIES = Counter(
+    "model_section_retries_total",
+    "Follow-up calls for sections missing from the model output, by outcome.",
+    ["outcome"],
+)
+MODEL_BACKEND_CALLS = Counter(
+    "model_backend_calls_total",
+    "Calls routed to each model backend, by outcome (ok, error, rejected, cancelled).",
+    ["backend", "outcome"],
+)
+MODEL_BACKEND_SECONDS = Histogram(
+    "model_backend_seconds",
+    "Latency of successful calls to each model backend.",
+    ["backend"],
+)
+MODEL_BACKEND_CIRCUIT_OPEN = Gauge(
+    "model_backend_circuit_open",
+    "1 while a model backend's circuit breaker is open.",
+    ["backend"],
+)
+MODEL_HEDGES = Counter(
+    "model_hedged_calls_total",
+    "Hedged model calls started, and those that answered first.",
+    ["outcome"],
+)
+OCR_PREPASS_ROUTES = Counter(
+    "ocr_prepass_total",
+    "Extractions by OCR pre-pass route (rules: no model call, text, vision).",
+    ["route"],
+)
+CODE_CHECKS = Counter(
+    "code_checks_total",
+    "Extracted and submitted codes checked against the code index, by status.",
+    ["kind", "status"],
+)
+EXTRACTION_COALESCED = Counter(
+    "extraction_coalesced_total",
+    "Extractions answered from an identical in-flight or just-finished call.",
+    ["kind"],
+)
+EXTRACTION_JOBS_IN_FLIGHT = Gauge(
+    "extraction_jobs_in_flight", "Queued extraction jobs currently being processed."
+)
+
+# Authorization requests
+AUTH_REQUEST_DB_SECONDS = Histogram(
+    "auth_request_db_seconds",
+    "Latency of auth request storage calls, by AuthRequestService method.",
+    ["method"],
+)
+
+# HTTP
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording in-flight requests and latency per route.
+
+    Routes are labelled by their path template (e.g. /api/v1/auth-requests/{request_id})
+    so ids in URLs do not create new series; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,214 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+import httpx
+
+from .config import settings
+from ..services.cache import MemoryCacheBackend
+
+# PyJWT (and cryptography behind it) is imported where tokens are checked,
+# which keeps it out of application startup.
+if TYPE_CHECKING:
+    import jwt
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "EdDSA")
+
+
+class AuthenticationError(Exception):
+    """Raised when a bearer token cannot be verified."""
+
+
+class JWTVerifier:
+    """Verifies Supabase access tokens locally and caches the verified claims.
+
+    HS256 tokens are checked against the project's JWT secret and
+    asymmetrically signed ones against its JWKS, which is refreshed in the
+    background and on demand when a token names an unknown key id. If no
+    secret is configured, HS256 tokens go to the fallback (a remote check)
+    and the result is cached the same way.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        fallback: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.jwt_secret = jwt_secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.issuer = issuer
+        self.fallback = fallback
+        self.cache = MemoryCacheBackend(max_entries=settings.AUTH_CACHE_MAX_ENTRIES)
+        self._keys: Dict[str, "jwt.PyJWK"] = {}
+        self._keys_fetched_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._client = httpx.AsyncClient(timeout=settings.SUPABASE_TIMEOUT, transport=transport)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims, raising AuthenticationError if it is not valid."""
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            claims = json.loads(cached)
+            if claims.get("exp", 0) + settings.JWT_LEEWAY > time.time():
+                return claims
+
+        import jwt
+
+        self.start()
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise AuthenticationError(str(e))
+        algorithm = header.get("alg")
+
+        if algorithm == "HS256" and not self.jwt_secret and self.fallback is not None:
+            claims = await self.fallback(token)
+        elif algorithm == "HS256" and self.jwt_secret:
+            claims = self._decode(token, self.jwt_secret, algorithm)
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = await self._signing_key(header.get("kid"))
+            claims = self._decode(token, key.key, algorithm)
+        else:
+            raise AuthenticationError(f"Unsupported token algorithm: {algorithm}")
+
+        ttl = min(settings.AUTH_CACHE_TTL, claims.get("exp", 0) - time.time())
+        if ttl > 0:
+            await self.cache.set(cache_key, json.dumps(claims).encode(), ttl)
+        return claims
+
+    def _decode(self, token: str, key: Any, algorithm: str) -> Dict[str, Any]:
+        import jwt
+
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=settings.JWT_LEEWAY,
+                options={"require": ["exp", "sub"], "verify_aud": bool(self.audience)},
+            )
+        except jwt.PyJWTError as e:
+            raise AuthenticationError(str(e))
+
+    async def _signing_key(self, kid: Optional[str]) -> "jwt.PyJWK":
+        key = self._keys.get(kid)
+        if key is None:
+            # A new key id usually means the keys were rotated; refetch, but
+            # not more often than the floor so random kids cannot flood JWKS.
+            fetched_at = self._keys_fetched_at
+            if fetched_at is None or time.monotonic() - fetched_at >= settings.JWKS_MIN_REFRESH_INTERVAL:
+                await self.refresh_keys()
+            key = self._keys.get(kid)
+        if key is None:
+            raise AuthenticationError(f"Unknown signing key: {kid}")
+        return key
+
+    async def refresh_keys(self) -> None:
+        """Fetch the JWKS, keeping the previous keys if the fetch fails."""
+        if not self.jwks_url:
+            return
+        import jwt
+
+        async with self._refresh_lock:
+            try:
+                response = await self._client.get(self.jwks_url)
+                response.raise_for_status()
+                keys = {}
+                for data in response.json().get("keys", []):
+                    try:
+                        keys[data.get("kid")] = jwt.PyJWK(data)
+                    except jwt.PyJWTError as e:
+                        logger.warning(f"Skipping unusable JWK {data.get('kid')}: {str(e)}")
+                self._keys = keys
+            except Exception as e:
+                logger.warning(f"Failed to refresh JWKS from {self.jwks_url}: {str(e)}")
+            self._keys_fetched_at = time.monotonic()
+
+    def start(self) -> None:
+        """Start the background JWKS refresh if it is not already running."""
+        if self.jwks_url and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            if (
+                self._keys_fetched_at is None
+                or time.monotonic() - self._keys_fetched_at >= settings.JWKS_REFRESH_INTERVAL
+            ):
+                await self.refresh_keys()
+            await asyncio.sleep(settings.JWKS_REFRESH_INTERVAL)
+
+    async def aclose(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+        await self._client.aclose()
+
+
+async def verify_with_supabase(token: str) -> Dict[str, Any]:
+    """Ask Supabase Auth about the token; used when no JWT secret is configured."""
+    import jwt
+
+    from ..database.session import get_supabase
+
+    try:
+        # The first call also builds the client, so keep it off the loop too.
+        response = await asyncio.to_thread(lambda: get_supabase().auth.get_user(token))
+    except Exception as e:
+        raise AuthenticationError(str(e))
+    if not response or not response.user:
+        raise AuthenticationError("Invalid user token")
+    # Supabase has vouched for the signature; exp only bounds the cache entry.
+    unverified = jwt.decode(token, options={"verify_signature": False})
+    return {
+        "sub": response.user.id,
+        "role": response.user.role,
+        "email": response.user.email,
+        "exp": unverified.get("exp", 0),
+    }
+
+
+_verifier: Optional[JWTVerifier] = None
+_verifier_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_jwt_verifier() -> JWTVerifier:
+    """Return the shared verifier for the running event loop."""
+    global _verifier, _verifier_loop
+    loop = asyncio.get_running_loop()
+    if _verifier is None or _verifier_loop is not loop:
+        supabase_url = (os.getenv("SUPABASE_URL") or "").rstrip("/")
+        _verifier = JWTVerifier(
+            jwt_secret=settings.SUPABASE_JWT_SECRET or None,
+            jwks_url=f"{supabase_url}/auth/v1/.well-known/jwks.json" if supabase_url else None,
+            audience=settings.SUPABASE_JWT_AUDIENCE,
+            issuer=settings.SUPABASE_JWT_ISSUER
+            or (f"{supabase_url}/auth/v1" if supabase_url else None),
+            fallback=verify_with_supabase,
+        )
+        _verifier_loop = loop
+    return _verifier
+
+
+async def close_jwt_verifier() -> None:
+    global _verifier, _verifier_loop
+    if _verifier is not None:
+        await _verifier.aclose()
+    _verifier = None
+    _verifier_loop = None
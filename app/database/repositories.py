@@ -0,0 +1,442 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+
+from ..core.config import settings
+from ..services.interfaces import AuthRequestRepository
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+EQUALITY_FILTERS = ("status", "priority", "payer_id", "payer_name")
+
+
+def _to_datetime(value: Any) -> Any:
+    """Parse ISO strings for datetime columns; SQLite stores naive UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _quote_list(values: List[str]) -> str:
+    """Quote values for a PostgREST in.(...) filter."""
+    return ",".join(
+        '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for value in values
+    )
+
+
+def _owner_filter(provider_id: Optional[str]) -> Dict[str, str]:
+    """PostgREST filter limiting a statement to one provider's rows.
+
+    Requests go out with the service key, which bypasses row-level
+    security, so ownership is enforced here; None (service role) matches all.
+    """
+    return {"provider_id": f"eq.{provider_id}"} if provider_id is not None else {}
+
+
+class RepositoryError(Exception):
+    """Raised when the database rejects a request."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Database error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class PostgRESTAuthRequestRepository(AuthRequestRepository):
+    """auth_requests over Supabase's PostgREST API on a pooled HTTP/2 client.
+
+    Reads and updates are retried on transport errors and 429/5xx responses
+    with exponential backoff and full jitter. Inserts are retried only when
+    the connection could not be established, so rows are never duplicated.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_retries = (
+            settings.SUPABASE_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self._client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={"apikey": api_key, "Authorization": f"Bearer {api_key}"},
+            timeout=timeout or settings.SUPABASE_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            ),
+            http2=transport is None,
+            transport=transport,
+        )
+
+    async def _request(
+        self, method: str, params: Any, idempotent: bool = True, **kwargs: Any
+    ) -> Any:
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self._client.request(
+                    method, "/auth_requests", params=params, **kwargs
+                )
+            except httpx.ConnectError:
+                if last_attempt:
+                    raise
+            except httpx.TransportError:
+                if last_attempt or not idempotent:
+                    raise
+            else:
+                if response.status_code < 400:
+                    return response.json() if response.content else []
+                if (
+                    last_attempt
+                    or not idempotent
+                    or response.status_code not in RETRYABLE_STATUS_CODES
+                ):
+                    raise RepositoryError(response.status_code, response.text)
+            delay = random.uniform(0, settings.SUPABASE_RETRY_BACKOFF * 2**attempt)
+            logger.warning(f"Retrying auth_requests {method} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        rows = await self._request(
+            "POST",
+            {},
+            idempotent=False,
+            json=record,
+            headers={"Prefer": "return=representation"},
+        )
+        return rows[0] if rows else None
+
+    async def list_by_provider(
+        self,
+        provider_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        filters = filters or {}
+        params = [
+            ("select", ",".join(fields) if fields else "*"),
+            ("provider_id", f"eq.{provider_id}"),
+            ("order", "submitted_at.desc,id.desc"),
+        ]
+        for name in EQUALITY_FILTERS:
+            if filters.get(name) is not None:
+                params.append((name, f"eq.{filters[name]}"))
+        if filters.get("submitted_from") is not None:
+            params.append(("submitted_at", f"gte.{filters['submitted_from']}"))
+        if filters.get("submitted_to") is not None:
+            params.append(("submitted_at", f"lt.{filters['submitted_to']}"))
+        if after is not None:
+            submitted_at, request_id = after
+            params.append(("submitted_at", f"lte.{submitted_at}"))
+            params.append(("or", f'(submitted_at.lt."{submitted_at}",id.lt.{request_id})'))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        return await self._request("GET", params)
+
+    async def get(
+        self, request_id: str, provider_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        params = {"select": "*", "id": f"eq.{request_id}", **_owner_filter(provider_id)}
+        rows = await self._request("GET", params)
+        return rows[0] if rows else None
+
+    async def update(
+        self, request_id: str, values: Dict[str, Any], provider_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        rows = await self._request(
+            "PATCH",
+            {"id": f"eq.{request_id}", **_owner_filter(provider_id)},
+            json=values,
+            headers={"Prefer": "return=representation"},
+        )
+        return rows[0] if rows else None
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # With every row keyed, a repeated POST cannot duplicate anything, so
+        # it is as safe to retry as a read.
+        return await self._request(
+            "POST",
+            {"on_conflict": "provider_id,idempotency_key"},
+            idempotent=all(record.get("idempotency_key") for record in records),
+            json=records,
+            headers={"Prefer": "return=representation,resolution=ignore-duplicates"},
+        )
+
+    async def list_by_idempotency_keys(
+        self, provider_id: str, keys: List[str]
+    ) -> List[Dict[str, Any]]:
+        return await self._request(
+            "GET",
+            {
+                "select": "*",
+                "provider_id": f"eq.{provider_id}",
+                "idempotency_key": f"in.({_quote_list(keys)})",
+            },
+        )
+
+    async def update_many(
+        self,
+        request_ids: List[str],
+        values: Dict[str, Any],
+        provider_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._request(
+            "PATCH",
+            {"id": f"in.({_quote_list(request_ids)})", **_owner_filter(provider_id)},
+            json=values,
+            headers={"Prefer": "return=representation"},
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class SQLAlchemyAuthRequestRepository(AuthRequestRepository):
+    """Local stand-in backed by the SQLAlchemy models (e.g. SQLite) for tests and benchmarks."""
+
+    def __init__(self, database_url: str):
+        from sqlalchemy import create_engine, make_url
+        from sqlalchemy.orm import sessionmaker
+
+        from ..models.base_models import AuthRequest, User
+
+        directory = os.path.dirname(make_url(database_url).database or "")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.model = AuthRequest
+        self.engine = create_engine(database_url)
+        User.__table__.create(self.engine, checkfirst=True)
+        AuthRequest.__table__.create(self.engine, checkfirst=True)
+        self._sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self._columns = [column.name for column in AuthRequest.__table__.columns]
+
+    def _to_dict(self, row: Any, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        record = {}
+        for name in columns or self._columns:
+            value = getattr(row, name)
+            if isinstance(value, UUID):
+                value = str(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            record[name] = value
+        return record
+
+    def _from_dict(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        converted = {}
+        for name, value in values.items():
+            if name in ("id", "provider_id") and isinstance(value, str):
+                value = UUID(value)
+            elif name in ("submitted_at", "updated_at"):
+                value = _to_datetime(value)
+            converted[name] = value
+        return converted
+
+    def _insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self._sessions() as session:
+            row = self.model(**self._from_dict(record))
+            session.add(row)
+            session.commit()
+            return self._to_dict(row)
+
+    def _list_by_provider(
+        self,
+        provider_id: str,
+        filters: Dict[str, Any],
+        limit: Optional[int],
+        after: Optional[Tuple[str, str]],
+        fields: Optional[List[str]],
+    ) -> List[Dict[str, Any]]:
+        from sqlalchemy import or_
+
+        model = self.model
+        columns = fields or self._columns
+        with self._sessions() as session:
+            query = session.query(*(getattr(model, name) for name in columns)).filter(
+                model.provider_id == UUID(provider_id)
+            )
+            for name in EQUALITY_FILTERS:
+                if filters.get(name) is not None:
+                    query = query.filter(getattr(model, name) == filters[name])
+            if filters.get("submitted_from") is not None:
+                query = query.filter(
+                    model.submitted_at >= _to_datetime(filters["submitted_from"])
+                )
+            if filters.get("submitted_to") is not None:
+                query = query.filter(
+                    model.submitted_at < _to_datetime(filters["submitted_to"])
+                )
+            if after is not None:
+                submitted_at, request_id = _to_datetime(after[0]), UUID(after[1])
+                # The redundant leading bound lets the index seek straight to the
+                # cursor instead of scanning every newer row to evaluate the OR.
+                query = query.filter(
+                    model.submitted_at <= submitted_at,
+                    or_(model.submitted_at < submitted_at, model.id < request_id),
+                )
+            query = query.order_by(model.submitted_at.desc(), model.id.desc())
+            if limit is not None:
+                query = query.limit(limit)
+            return [self._to_dict(row, columns) for row in query]
+
+    def _owned_row(self, session: Any, request_id: str, provider_id: Optional[str]) -> Any:
+        row = session.get(self.model, UUID(request_id))
+        if row is None or (provider_id is not None and row.provider_id != UUID(provider_id)):
+            return None
+        return row
+
+    def _get(self, request_id: str, provider_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        with self._sessions() as session:
+            row = self._owned_row(session, request_id, provider_id)
+            return self._to_dict(row) if row is not None else None
+
+    def _update(
+        self, request_id: str, values: Dict[str, Any], provider_id: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        with self._sessions() as session:
+            row = self._owned_row(session, request_id, provider_id)
+            if row is None:
+                return None
+            for name, value in self._from_dict(values).items():
+                setattr(row, name, value)
+            session.commit()
+            return self._to_dict(row)
+
+    def _insert_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        from sqlalchemy.dialects import postgresql, sqlite
+
+        dialect = postgresql if self.engine.dialect.name == "postgresql" else sqlite
+        table = self.model.__table__
+        statement = (
+            dialect.insert(table)
+            .values([self._from_dict(record) for record in records])
+            .on_conflict_do_nothing(index_elements=["provider_id", "idempotency_key"])
+            .returning(*table.columns)
+        )
+        with self.engine.begin() as conn:
+            return [self._to_dict(row) for row in conn.execute(statement)]
+
+    def _list_by_idempotency_keys(
+        self, provider_id: str, keys: List[str]
+    ) -> List[Dict[str, Any]]:
+        with self._sessions() as session:
+            rows = session.query(self.model).filter(
+                self.model.provider_id == UUID(provider_id),
+                self.model.idempotency_key.in_(keys),
+            )
+            return [self._to_dict(row) for row in rows]
+
+    def _update_many(
+        self, request_ids: List[str], values: Dict[str, Any], provider_id: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        from sqlalchemy import update
+
+        table = self.model.__table__
+        statement = update(table).where(
+            table.c.id.in_([UUID(request_id) for request_id in request_ids])
+        )
+        if provider_id is not None:
+            statement = statement.where(table.c.provider_id == UUID(provider_id))
+        statement = statement.values(**self._from_dict(values)).returning(*table.columns)
+        with self.engine.begin() as conn:
+            return [self._to_dict(row) for row in conn.execute(statement)]
+
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._insert, record)
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._insert_many, records)
+
+    async def list_by_idempotency_keys(
+        self, provider_id: str, keys: List[str]
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._list_by_idempotency_keys, provider_id, keys)
+
+    async def update_many(
+        self,
+        request_ids: List[str],
+        values: Dict[str, Any],
+        provider_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._update_many, request_ids, values, provider_id)
+
+    async def list_by_provider(
+        self,
+        provider_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._list_by_provider, provider_id, filters or {}, limit, after, fields
+        )
+
+    async def get(
+        self, request_id: str, provider_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, request_id, provider_id)
+
+    async def update(
+        self, request_id: str, values: Dict[str, Any], provider_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._update, request_id, values, provider_id)
+
+    async def aclose(self) -> None:
+        self.engine.dispose()
+
+
+_repository: Optional[AuthRequestRepository] = None
+_repository_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_auth_request_repository() -> AuthRequestRepository:
+    """Return the repository selected by AUTH_REQUEST_BACKEND.
+
+    The PostgREST client's pooled connections are bound to the running
+    event loop, so it is recreated if the loop changes.
+    """
+    global _repository, _repository_loop
+    if settings.AUTH_REQUEST_BACKEND == "sqlite":
+        if _repository is None:
+            _repository = SQLAlchemyAuthRequestRepository(settings.LOCAL_DATABASE_URL)
+        return _repository
+
+    loop = asyncio.get_running_loop()
+    if _repository is None or _repository_loop is not loop:
+        from .session import (
+            SUPABASE_ANON_KEY,
+            SUPABASE_SERVICE_KEY,
+            SUPABASE_URL,
+            require_supabase_credentials,
+        )
+
+        require_supabase_credentials()
+        _repository = PostgRESTAuthRequestRepository(
+            SUPABASE_URL, SUPABASE_SERVICE_KEY or SUPABASE_ANON_KEY
+        )
+        _repository_loop = loop
+    return _repository
+
+
+async def close_auth_request_repository() -> None:
+    global _repository, _repository_loop
+    if _repository is not None:
+        await _repository.aclose()
+    _repository = None
+    _repository_loop = None
@@ -1,4 +1,4 @@
-from supabase import create_client
+from typing import Any, Optional
 import os
 from dotenv import load_dotenv
 
@@ -9,11 +9,26 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")  # Add service role key
 
-if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY environment variables must be set")
+_supabase: Optional[Any] = None
 
-# Create Supabase client with service role key if available, otherwise use anon key
-supabase = create_client(
-    SUPABASE_URL,
-    SUPABASE_SERVICE_KEY if SUPABASE_SERVICE_KEY else SUPABASE_ANON_KEY
-)
\ No newline at end of file
+
+def require_supabase_credentials() -> None:
+    if not SUPABASE_URL or not SUPABASE_ANON_KEY:
+        raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY environment variables must be set")
+
+
+def get_supabase() -> Any:
+    """Return the Supabase client, creating it (and importing supabase) on first use.
+
+    Uses the service role key if available, otherwise the anon key.
+    """
+    global _supabase
+    if _supabase is None:
+        require_supabase_credentials()
+        from supabase import create_client
+
+        _supabase = create_client(
+            SUPABASE_URL,
+            SUPABASE_SERVICE_KEY if SUPABASE_SERVICE_KEY else SUPABASE_ANON_KEY
+        )
+    return _supabase
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, UUID4, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
 
@@ -37,4 +37,26 @@ class AuthRequestResponse(BaseModel):
 
     class Config:
         from_attributes = True  # For SQLAlchemy model compatibility
-        orm_mode = True  # Required for older versions of Pydantic 
\ No newline at end of file
+        orm_mode = True  # Required for older versions of Pydantic 
+
+class BulkAuthRequestCreate(BaseModel):
+    # Items are validated one by one so a bad row does not reject the batch.
+    requests: List[Dict[str, Any]]
+
+
+class BulkStatusUpdate(BaseModel):
+    ids: List[str]
+    status: str
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # "created", "existing", "updated", "not_found" or "invalid"
+    id: Optional[UUID] = None
+    request: Optional[AuthRequestResponse] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+    counts: Dict[str, int]
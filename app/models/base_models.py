@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from datetime import datetime
@@ -20,16 +20,32 @@ class User(Base):
 
 class AuthRequest(Base):
     __tablename__ = "auth_requests"
-    __table_args__ = {'extend_existing': True}
+    # Provider listings page newest-first on (submitted_at, id); each index
+    # leads with the equality filters so the keyset seek is a range scan.
+    __table_args__ = (
+        Index("ix_auth_requests_provider_submitted", "provider_id", "submitted_at", "id"),
+        Index("ix_auth_requests_provider_status_submitted", "provider_id", "status", "submitted_at", "id"),
+        Index("ix_auth_requests_provider_priority_submitted", "provider_id", "priority", "submitted_at", "id"),
+        Index("ix_auth_requests_provider_payer_submitted", "provider_id", "payer_id", "submitted_at", "id"),
+        # Bulk creates are retried safely by ignoring rows whose key already exists.
+        UniqueConstraint("provider_id", "idempotency_key", name="uq_auth_requests_provider_idempotency_key"),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     patient_name = Column(String, nullable=False)
-    patient_dob = Column(String, nullable=False)
-    insurance_provider = Column(String, nullable=False)
+    patient_id = Column(String, nullable=False)
     procedure_code = Column(String, nullable=False)
+    procedure_description = Column(String, nullable=False)
     diagnosis_code = Column(String, nullable=False)
+    diagnosis_description = Column(String, nullable=False)
+    medical_justification = Column(Text, nullable=False)
+    priority = Column(String, nullable=False, default="Standard")
+    payer_name = Column(String)
+    payer_id = Column(String)
     status = Column(String, nullable=False, default="PENDING")
     submitted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     provider_id = Column(UUID(as_uuid=True), ForeignKey("profiles.id"), nullable=False)
-    notes = Column(Text) 
\ No newline at end of file
+    notes = Column(Text)
+    idempotency_key = Column(String)
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from app.models.response import FormExtractionResponse
+
+
+class ExtractionJobResponse(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "succeeded" or "failed"
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    queue_ms: Optional[int] = None
+    run_ms: Optional[int] = None
+    result: Optional[FormExtractionResponse] = None
+    error: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, Any
 
 
 class FieldData(BaseModel):
@@ -15,4 +15,4 @@ class FormExtractionResponse(BaseModel):
     diagnosis_info: Dict[str, FieldData]
     medical_justification: FieldData
     insurance_info: Dict[str, FieldData]
-    processing_metadata: Dict[str, Union[str, int]]
+    processing_metadata: Dict[str, Any]
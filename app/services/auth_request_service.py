@@ -1,82 +1,222 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 from uuid import UUID
+import asyncio
+import base64
 import logging
+import uuid
 
-from ..models.auth_request import AuthRequestCreate, AuthRequestResponse
-from ..database.session import supabase
+from pydantic import ValidationError
+
+from ..core.config import settings
+from ..core.logging import log_payload
+from ..core.metrics import AUTH_REQUEST_DB_SECONDS
+from ..models.auth_request import (
+    AuthRequestCreate,
+    AuthRequestResponse,
+    BulkItemResult,
+    BulkResult,
+)
+from ..database.repositories import get_auth_request_repository
+from .cache import MemoryCacheBackend, RedisCacheBackend, create_redis_client
+from .code_index import check_codes, get_code_index
+from .interfaces import AuthRequestRepository, CacheBackend
 
 logger = logging.getLogger(__name__)
 
 # Fixed UUID for service role user
 SERVICE_ROLE_USER_ID = "e9d0682e-d6b4-41f2-ac38-514a0881264c"
 
+# Columns a listing can be projected to; id and submitted_at are always
+# returned because the next page's cursor is built from them.
+PROJECTABLE_FIELDS = tuple(AuthRequestResponse.model_fields)
+CURSOR_FIELDS = ("id", "submitted_at")
+
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past record in (submitted_at, id) order."""
+    raw = f"{record['submitted_at']}|{record['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submitted_at, request_id = raw.split("|")
+        datetime.fromisoformat(submitted_at)
+        return submitted_at, str(UUID(request_id))
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated fields= value into the columns to select."""
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [name for name in PROJECTABLE_FIELDS if name in CURSOR_FIELDS or name in requested]
+
+
+def _provider_id(user: dict) -> str:
+    # Get the user ID based on the type of user
+    if user.get("role") == "service_role":
+        logger.debug("Using service role ID")
+        return SERVICE_ROLE_USER_ID
+    logger.debug("Using user ID: %s", user["id"])
+    return str(user["id"])
+
+
+def _owner(user: dict) -> Optional[str]:
+    """Provider whose rows the caller may read and change; None for the service role."""
+    return None if user.get("role") == "service_role" else str(user["id"])
+
+
+def _new_record(
+    request: AuthRequestCreate, provider_id: str, idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
+    now = datetime.utcnow().isoformat()
+    return {
+        "id": str(uuid.uuid4()),
+        "patient_name": request.patient_name,
+        "patient_id": request.patient_id,
+        "procedure_code": request.procedure_code,
+        "procedure_description": request.procedure_description,
+        "diagnosis_code": request.diagnosis_code,
+        "diagnosis_description": request.diagnosis_description,
+        "medical_justification": request.medical_justification,
+        "priority": request.priority,
+        "payer_name": request.payer_name,
+        "payer_id": request.payer_id,
+        "status": "PENDING",
+        "provider_id": provider_id,
+        "submitted_at": now,
+        "updated_at": now,
+        "idempotency_key": idempotency_key,
+    }
+
+
+# AuthRequestCreate fields checked against the code index, and their code kind.
+REQUEST_CODE_FIELDS = (("procedure_code", "procedure"), ("diagnosis_code", "diagnosis"))
+
+
+def _check_record_codes(records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Normalize the codes of new records in place and return each record's errors.
+
+    Each code field is looked up for all records at once. Codes the index
+    would correct are rejected too, with the correction as the suggestion:
+    a requester's code is never changed behind their back.
+    """
+    errors: List[List[Dict[str, Any]]] = [[] for _ in records]
+    if not settings.CODE_INDEX or not records:
+        return errors
+    for field, kind in REQUEST_CODE_FIELDS:
+        index = get_code_index(kind)
+        results = check_codes(kind, [record[field] for record in records])
+        for record, result, record_errors in zip(records, results, errors):
+            if result["status"] == "valid":
+                record[field] = result["code"]
+            else:
+                record_errors.append(
+                    {
+                        "loc": [field],
+                        "msg": index.describe(result),
+                        "type": "unknown_code",
+                        "ctx": {"suggestions": result["suggestions"]},
+                    }
+                )
+    return errors
+
+
+def _validation_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    # Leave out the offending input; it may hold patient data.
+    return [
+        {"loc": list(detail["loc"]), "msg": detail["msg"], "type": detail["type"]}
+        for detail in error.errors()
+    ]
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def _bulk_result(results: List[BulkItemResult]) -> BulkResult:
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return BulkResult(results=results, counts=counts)
+
+
+def to_auth_request_response(record: Dict[str, Any]) -> AuthRequestResponse:
+    """Map a database row (JSON-style values, extra columns ignored) to the response model.
+
+    A single model_validate call does all the parsing in pydantic-core; it
+    measures faster than model_construct, which loops over fields in Python.
+    """
+    return AuthRequestResponse.model_validate(record)
+
+
+def _generation_key(request_id: Any) -> str:
+    return f"auth_request:{request_id}:generation"
+
+
+def _cache_key(request_id: Any, generation: Optional[bytes]) -> str:
+    """Entries are keyed by the request's generation, which every write replaces.
+
+    A lookup that read the row before a write but fills the cache after it
+    stores the old row under the old generation, where no later lookup reads.
+    """
+    return f"auth_request:{request_id}:{(generation or b'0').decode()}"
+
+
 class AuthRequestService:
-    def create_auth_request(self, request: AuthRequestCreate, user: dict) -> AuthRequestResponse:
-        logger.debug(f"Creating auth request for user: {user}")
-        
-        # Get the user ID based on the type of user
-        if user.get("role") == "service_role":
-            current_user_id = SERVICE_ROLE_USER_ID
-            logger.debug("Using service role ID")
-        else:
-            current_user_id = user["id"]
-            logger.debug(f"Using user ID: {current_user_id}")
-
-        # Prepare data for insertion
-        auth_request_data = {
-            "patient_name": request.patient_name,
-            "patient_id": request.patient_id,
-            "procedure_code": request.procedure_code,
-            "procedure_description": request.procedure_description,
-            "diagnosis_code": request.diagnosis_code,
-            "diagnosis_description": request.diagnosis_description,
-            "medical_justification": request.medical_justification,
-            "priority": request.priority,
-            "payer_name": request.payer_name,
-            "payer_id": request.payer_id,
-            "status": "PENDING",
-            "provider_id": current_user_id,
-            "submitted_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
-        }
+    def __init__(
+        self,
+        repository: Optional[AuthRequestRepository] = None,
+        cache: Optional[CacheBackend] = None,
+    ):
+        self._repository = repository
+        self._cache = cache
 
-        try:
-            logger.debug(f"Attempting to insert auth request with data: {auth_request_data}")
-            # Insert into Supabase with RLS enabled
-            response = (
-                supabase.table("auth_requests")
-                .insert(auth_request_data)
-                .execute()
-            )
-            
-            logger.debug(f"Supabase response: {response}")
-            
-            if not response.data:
-                raise Exception(f"No data returned from Supabase. Response: {response}")
-
-            # Get the created record
-            created_record = response.data[0]
-            logger.debug(f"Created record: {created_record}")
-
-            # Convert to response model
-            return AuthRequestResponse(
-                id=UUID(created_record["id"]),
-                patient_name=created_record["patient_name"],
-                patient_id=created_record["patient_id"],
-                procedure_code=created_record["procedure_code"],
-                procedure_description=created_record["procedure_description"],
-                diagnosis_code=created_record["diagnosis_code"],
-                diagnosis_description=created_record["diagnosis_description"],
-                medical_justification=created_record["medical_justification"],
-                priority=created_record["priority"],
-                payer_name=created_record.get("payer_name"),
-                payer_id=created_record.get("payer_id"),
-                status=created_record["status"],
-                submitted_at=created_record["submitted_at"],
-                updated_at=created_record["updated_at"],
-                provider_id=UUID(created_record["provider_id"])
+    @property
+    def repository(self) -> AuthRequestRepository:
+        return self._repository or get_auth_request_repository()
+
+    @property
+    def cache(self) -> Optional[CacheBackend]:
+        return self._cache or get_auth_request_cache()
+
+    async def _invalidate(self, request_ids: List[Any]) -> None:
+        cache = self.cache
+        if cache is not None:
+            # Outlives every entry of the generation it replaces, so an expired
+            # generation never brings back an entry filled before the write.
+            ttl = 2 * settings.AUTH_REQUEST_CACHE_TTL
+            await asyncio.gather(
+                *(
+                    cache.set(_generation_key(i), uuid.uuid4().hex.encode(), ttl)
+                    for i in request_ids
+                )
             )
+
+    async def create_auth_request(self, request: AuthRequestCreate, user: dict) -> AuthRequestResponse:
+        log_payload(logger, "Creating auth request for user", user)
+        auth_request_data = _new_record(request, _provider_id(user))
+        (code_errors,) = await asyncio.to_thread(_check_record_codes, [auth_request_data])
+        if code_errors:
+            raise ValueError("; ".join(f"{e['loc'][0]}: {e['msg']}" for e in code_errors))
+
+        try:
+            log_payload(logger, "Inserting auth request", auth_request_data)
+            with AUTH_REQUEST_DB_SECONDS.labels("create_auth_request").time():
+                created_record = await self.repository.insert(auth_request_data)
+            if not created_record:
+                raise Exception("No data returned from database")
+            log_payload(logger, "Created auth request", created_record)
+            await self._invalidate([created_record["id"]])
+            return to_auth_request_response(created_record)
         except Exception as e:
             logger.error(f"Error creating auth request: {str(e)}")
             # Print the full error details
@@ -84,107 +224,236 @@ class AuthRequestService:
             logger.error(f"Full error traceback: {traceback.format_exc()}")
             raise Exception(f"Failed to create auth request: {str(e)}")
 
-    def get_auth_requests(self, provider_id: UUID) -> List[AuthRequestResponse]:
-        try:
-            # Query Supabase with RLS enabled
-            response = (
-                supabase.table("auth_requests")
-                .select("*")
-                .eq("provider_id", str(provider_id))
-                .execute()
+    async def create_auth_requests(
+        self,
+        items: List[Dict[str, Any]],
+        user: dict,
+        idempotency_key: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+    ) -> BulkResult:
+        """Validate items one by one and insert the valid ones in multi-row chunks.
+
+        With CODE_INDEX on, the codes of all items are checked in one batch
+        lookup per field; items with unknown codes are reported as invalid.
+
+        Each item is keyed by its own "idempotency_key" or, failing that, by
+        "{idempotency_key}:{index}". Items whose key was already stored come
+        back as "existing" with the original row instead of a duplicate.
+        """
+        provider_id = _provider_id(user)
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        for index, item in enumerate(items):
+            key = item.get("idempotency_key") or (
+                f"{idempotency_key}:{index}" if idempotency_key else None
             )
+            try:
+                request = AuthRequestCreate.model_validate(item)
+            except ValidationError as e:
+                results[index] = BulkItemResult(
+                    index=index, status="invalid", errors=_validation_errors(e)
+                )
+                continue
+            pending.append((index, _new_record(request, provider_id, key)))
+        code_errors = await asyncio.to_thread(
+            _check_record_codes, [record for _, record in pending]
+        )
+        for (index, _), errors in zip(pending, code_errors):
+            if errors:
+                results[index] = BulkItemResult(index=index, status="invalid", errors=errors)
+        pending = [entry for entry, errors in zip(pending, code_errors) if not errors]
+
+        try:
+            for chunk in _chunks(pending, chunk_size or settings.AUTH_REQUEST_BULK_CHUNK_SIZE):
+                # Repeated keys within the batch are inserted once.
+                first_by_key: Dict[str, Dict[str, Any]] = {}
+                to_insert = []
+                for _, record in chunk:
+                    key = record["idempotency_key"]
+                    if key in first_by_key:
+                        continue
+                    if key:
+                        first_by_key[key] = record
+                    to_insert.append(record)
 
-            # Convert to response models
-            return [
-                AuthRequestResponse(
-                    id=UUID(record["id"]),
-                    patient_name=record["patient_name"],
-                    patient_id=record["patient_id"],
-                    procedure_code=record["procedure_code"],
-                    procedure_description=record["procedure_description"],
-                    diagnosis_code=record["diagnosis_code"],
-                    diagnosis_description=record["diagnosis_description"],
-                    medical_justification=record["medical_justification"],
-                    priority=record["priority"],
-                    payer_name=record.get("payer_name"),
-                    payer_id=record.get("payer_id"),
-                    status=record["status"],
-                    submitted_at=record["submitted_at"],
-                    updated_at=record["updated_at"],
-                    provider_id=UUID(record["provider_id"])
+                with AUTH_REQUEST_DB_SECONDS.labels("create_auth_requests").time():
+                    inserted = {
+                        row["id"]: row for row in await self.repository.insert_many(to_insert)
+                    }
+                await self._invalidate(list(inserted))
+                missing = [
+                    key for key, record in first_by_key.items() if record["id"] not in inserted
+                ]
+                existing = {}
+                if missing:
+                    with AUTH_REQUEST_DB_SECONDS.labels("create_auth_requests").time():
+                        existing = {
+                            row["idempotency_key"]: row
+                            for row in await self.repository.list_by_idempotency_keys(
+                                provider_id, missing
+                            )
+                        }
+
+                for index, record in chunk:
+                    row, status = inserted.get(record["id"]), "created"
+                    if row is None:
+                        key = record["idempotency_key"]
+                        row = inserted.get(first_by_key[key]["id"]) or existing.get(key)
+                        status = "existing"
+                    if row is None:
+                        raise Exception(f"Item {index} was neither inserted nor found")
+                    response = to_auth_request_response(row)
+                    results[index] = BulkItemResult(
+                        index=index, status=status, id=response.id, request=response
+                    )
+            return _bulk_result(results)
+        except Exception as e:
+            logger.error(f"Error creating auth requests in bulk: {str(e)}")
+            raise Exception(f"Failed to create auth requests: {str(e)}")
+
+    async def update_auth_request_statuses(
+        self,
+        request_ids: List[str],
+        status: str,
+        user: dict,
+        chunk_size: Optional[int] = None,
+    ) -> BulkResult:
+        """Set the same status on many requests with one UPDATE ... IN per chunk.
+
+        Requests the caller does not own are reported as not_found.
+        """
+        results: List[Optional[BulkItemResult]] = [None] * len(request_ids)
+        valid: List[Tuple[int, str]] = []
+        for index, request_id in enumerate(request_ids):
+            try:
+                valid.append((index, str(UUID(str(request_id)))))
+            except ValueError:
+                results[index] = BulkItemResult(
+                    index=index,
+                    status="invalid",
+                    errors=[{"loc": ["ids", index], "msg": "Invalid UUID", "type": "uuid_parsing"}],
                 )
-                for record in response.data
-            ]
+
+        values = {"status": status, "updated_at": datetime.utcnow().isoformat()}
+        owner = _owner(user)
+        try:
+            for chunk in _chunks(valid, chunk_size or settings.AUTH_REQUEST_BULK_CHUNK_SIZE):
+                ids = list(dict.fromkeys(request_id for _, request_id in chunk))
+                with AUTH_REQUEST_DB_SECONDS.labels("update_auth_request_statuses").time():
+                    records = await self.repository.update_many(ids, values, provider_id=owner)
+                updated = {record["id"]: to_auth_request_response(record) for record in records}
+                await self._invalidate(list(updated))
+                for index, request_id in chunk:
+                    response = updated.get(request_id)
+                    results[index] = BulkItemResult(
+                        index=index,
+                        status="updated" if response else "not_found",
+                        id=request_id,
+                        request=response,
+                    )
+            return _bulk_result(results)
         except Exception as e:
-            print(f"Error getting auth requests: {str(e)}")
+            logger.error(f"Error updating auth request statuses: {str(e)}")
             raise
 
-    def get_auth_request(self, request_id: UUID) -> Optional[AuthRequestResponse]:
+    async def get_auth_requests(
+        self,
+        provider_id: UUID,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[Union[AuthRequestResponse, Dict[str, Any]]], Optional[str]]:
+        """Return one page of a provider's requests, newest first, and the next cursor.
+
+        With fields set the rows are returned as plain dicts holding only
+        those columns.
+        """
         try:
-            # Query Supabase with RLS enabled
-            response = (
-                supabase.table("auth_requests")
-                .select("*")
-                .eq("id", str(request_id))
-                .execute()
+            after = decode_cursor(cursor) if cursor else None
+            with AUTH_REQUEST_DB_SECONDS.labels("get_auth_requests").time():
+                records = await self.repository.list_by_provider(
+                    str(provider_id), filters=filters, limit=limit, after=after, fields=fields
+                )
+            next_cursor = (
+                encode_cursor(records[-1]) if limit and len(records) == limit else None
             )
+            if fields:
+                return records, next_cursor
+            return [to_auth_request_response(record) for record in records], next_cursor
+        except Exception as e:
+            logger.error(f"Error getting auth requests: {str(e)}")
+            raise
 
-            if not response.data:
-                return None
+    async def get_auth_request_json(self, request_id: UUID, user: dict) -> Optional[bytes]:
+        """Return the request's JSON representation, read through the cache.
 
-            record = response.data[0]
-            return AuthRequestResponse(
-                id=UUID(record["id"]),
-                patient_name=record["patient_name"],
-                patient_id=record["patient_id"],
-                procedure_code=record["procedure_code"],
-                procedure_description=record["procedure_description"],
-                diagnosis_code=record["diagnosis_code"],
-                diagnosis_description=record["diagnosis_description"],
-                medical_justification=record["medical_justification"],
-                priority=record["priority"],
-                payer_name=record.get("payer_name"),
-                payer_id=record.get("payer_id"),
-                status=record["status"],
-                submitted_at=record["submitted_at"],
-                updated_at=record["updated_at"],
-                provider_id=UUID(record["provider_id"])
-            )
+        None if it does not exist or belongs to another provider.
+        """
+        cache = self.cache
+        try:
+            if cache is not None:
+                key = _cache_key(request_id, await cache.get(_generation_key(request_id)))
+                body = await cache.get(key)
+                if body is not None:
+                    return body
+            with AUTH_REQUEST_DB_SECONDS.labels("get_auth_request").time():
+                record = await self.repository.get(str(request_id), provider_id=_owner(user))
+            if not record:
+                return None
+            body = to_auth_request_response(record).model_dump_json().encode()
+            if cache is not None:
+                await cache.set(key, body, settings.AUTH_REQUEST_CACHE_TTL)
+            return body
         except Exception as e:
-            print(f"Error getting auth request: {str(e)}")
+            logger.error(f"Error getting auth request: {str(e)}")
             raise
 
-    def update_auth_request_status(self, request_id: UUID, status: str) -> Optional[AuthRequestResponse]:
+    async def get_auth_request(self, request_id: UUID, user: dict) -> Optional[AuthRequestResponse]:
+        body = await self.get_auth_request_json(request_id, user)
+        return AuthRequestResponse.model_validate_json(body) if body else None
+
+    async def update_auth_request_status(
+        self, request_id: UUID, status: str, user: dict
+    ) -> Optional[AuthRequestResponse]:
         try:
-            # Update in Supabase with RLS enabled
-            response = (
-                supabase.table("auth_requests")
-                .update({"status": status, "updated_at": datetime.utcnow().isoformat()})
-                .eq("id", str(request_id))
-                .execute()
-            )
+            with AUTH_REQUEST_DB_SECONDS.labels("update_auth_request_status").time():
+                record = await self.repository.update(
+                    str(request_id),
+                    {"status": status, "updated_at": datetime.utcnow().isoformat()},
+                    provider_id=_owner(user),
+                )
+            # Drop the entry even if nothing matched, so a miss is never cached stale.
+            await self._invalidate([request_id])
+            return to_auth_request_response(record) if record else None
+        except Exception as e:
+            logger.error(f"Error updating auth request status: {str(e)}")
+            raise
 
-            if not response.data:
-                return None
 
-            record = response.data[0]
-            return AuthRequestResponse(
-                id=UUID(record["id"]),
-                patient_name=record["patient_name"],
-                patient_id=record["patient_id"],
-                procedure_code=record["procedure_code"],
-                procedure_description=record["procedure_description"],
-                diagnosis_code=record["diagnosis_code"],
-                diagnosis_description=record["diagnosis_description"],
-                medical_justification=record["medical_justification"],
-                priority=record["priority"],
-                payer_name=record.get("payer_name"),
-                payer_id=record.get("payer_id"),
-                status=record["status"],
-                submitted_at=record["submitted_at"],
-                updated_at=record["updated_at"],
-                provider_id=UUID(record["provider_id"])
+_cache: Optional[CacheBackend] = None
+_cache_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_auth_request_cache() -> Optional[CacheBackend]:
+    """Return the configured lookup cache, or None if caching is disabled.
+
+    The Redis client's connections are bound to the running event loop, so
+    that backend is recreated if the loop changes.
+    """
+    global _cache, _cache_loop
+    if settings.AUTH_REQUEST_CACHE_BACKEND == "redis":
+        loop = asyncio.get_running_loop()
+        if _cache is None or _cache_loop is not loop:
+            _cache = RedisCacheBackend(
+                create_redis_client(settings.REDIS_URL),
+                prefix="prior-auth:",
+                default_ttl=settings.AUTH_REQUEST_CACHE_TTL,
             )
-        except Exception as e:
-            print(f"Error updating auth request status: {str(e)}")
-            raise 
\ No newline at end of file
+            _cache_loop = loop
+    elif settings.AUTH_REQUEST_CACHE_BACKEND == "memory" and _cache is None:
+        _cache = MemoryCacheBackend(
+            max_entries=settings.AUTH_REQUEST_CACHE_MAX_ENTRIES,
+            default_ttl=settings.AUTH_REQUEST_CACHE_TTL,
+        )
+    return _cache
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from app.services.interfaces import CacheBackend
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache with TTL, entry-count and byte-size eviction."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        default_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._size = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, expires_at)
+        self._size += len(value)
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._size > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+
+    async def delete(self, key: str) -> None:
+        self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """On-disk cache that survives restarts, evicting least recently used rows."""
+
+    def __init__(
+        self, path: str, max_entries: int = 10000, default_ttl: Optional[float] = None
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else None, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache on a Redis server, through any client with redis.asyncio's get/set/delete.
+
+    Size bounds are the server's job (maxmemory with an allkeys-lru policy).
+    """
+
+    def __init__(self, client, prefix: str = "", default_ttl: Optional[float] = None):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ttl = ttl if ttl is not None else self.default_ttl
+        await self.client.set(
+            self.prefix + key, value, px=int(ttl * 1000) if ttl else None
+        )
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+
+def create_redis_client(url: str):
+    """Connect with redis-py's asyncio client, which is only needed for this backend."""
+    try:
+        import redis.asyncio
+    except ImportError:
+        raise RuntimeError("The redis cache backend requires the 'redis' package")
+    return redis.asyncio.Redis.from_url(url)
@@ -0,0 +1,159 @@
+"""Single-flight deduplication of identical extractions.
+
+Double-clicks and client retries send the same files while the first
+extraction is still running. Requests with the same extraction_cache_key
+(image bytes, notes, model and prompt version) share one call to the
+wrapped processor, and the result is kept for a short window so a retry
+that arrives just after it finished is answered too. This works with the
+extraction cache turned off.
+
+A caller only joins a call made at its own priority or a higher one, so
+an Emergency request never waits behind a Standard call's rate-limit
+queue. The key is computed once, in a worker thread since it hashes the
+decoded images, and handed to the extraction cache.
+"""
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+
+from app.core.config import settings
+from app.core.metrics import EXTRACTION_COALESCED
+from app.models.response import FormExtractionResponse
+from app.services.cache import MemoryCacheBackend
+from app.services.extraction_cache import (
+    CachingAIProcessor,
+    extraction_cache_key,
+    is_cacheable,
+)
+from app.services.interfaces import AIModelProcessor
+from app.services.rate_limiter import DEFAULT_PRIORITY, PRIORITY_RANKS, normalize_priority
+
+
+class SingleFlight:
+    """The in-flight calls and recent results shared by every request on a loop."""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = settings.EXTRACTION_COALESCE_TTL if ttl is None else ttl
+        # (key, priority) -> the call for key made at that priority.
+        self.in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.recent = MemoryCacheBackend(
+            max_entries=max_entries or settings.EXTRACTION_COALESCE_MAX_ENTRIES,
+            default_ttl=self.ttl,
+        )
+
+    def _joinable(self, key: str, priority: str) -> Optional[asyncio.Task]:
+        """The in-flight call for key at priority or above, highest first."""
+        for other, rank in sorted(PRIORITY_RANKS.items(), key=lambda item: item[1]):
+            if rank > PRIORITY_RANKS[priority]:
+                break
+            task = self.in_flight.get((key, other))
+            if task is not None:
+                return task
+        return None
+
+    async def run(
+        self, key: str, call, priority: str = DEFAULT_PRIORITY
+    ) -> FormExtractionResponse:
+        """Return the result of call() for key, sharing it with concurrent callers.
+
+        The call runs as its own task, so a caller that disconnects does not
+        cancel it for the others.
+        """
+        priority = normalize_priority(priority)
+        recent = await self.recent.get(key)
+        if recent is not None:
+            EXTRACTION_COALESCED.labels("recent").inc()
+            response = FormExtractionResponse.model_validate_json(recent)
+            response.processing_metadata["coalesced"] = "recent"
+            return response
+
+        task = self._joinable(key, priority)
+        if task is not None:
+            EXTRACTION_COALESCED.labels("in_flight").inc()
+            response = await asyncio.shield(task)
+            response = response.model_copy(deep=True)
+            response.processing_metadata["coalesced"] = "in_flight"
+            return response
+
+        task = asyncio.ensure_future(call())
+        self.in_flight[key, priority] = task
+        task.add_done_callback(lambda done: self._finished(key, priority, done))
+        response = await asyncio.shield(task)
+        # Every caller gets its own copy, since endpoints add to processing_metadata.
+        return response.model_copy(deep=True)
+
+    def _finished(self, key: str, priority: str, task: asyncio.Task) -> None:
+        if (
+            task.cancelled()
+            or task.exception() is not None
+            or not self.ttl
+            or not is_cacheable(task.result())
+        ):
+            self.in_flight.pop((key, priority), None)
+        else:
+            asyncio.ensure_future(self._remember(key, priority, task.result()))
+
+    async def _remember(
+        self, key: str, priority: str, response: FormExtractionResponse
+    ) -> None:
+        # The finished task stays in in_flight until the result is stored, so
+        # there is no gap in which a new call could start.
+        try:
+            await self.recent.set(key, response.model_dump_json().encode("utf-8"))
+        finally:
+            self.in_flight.pop((key, priority), None)
+
+
+class CoalescingAIProcessor(AIModelProcessor):
+    """Runs identical concurrent extractions once and shares the result."""
+
+    def __init__(
+        self,
+        processor: AIModelProcessor,
+        flight: Optional[SingleFlight] = None,
+        priority: str = DEFAULT_PRIORITY,
+    ):
+        self.processor = processor
+        self._flight = flight
+        self.priority = priority
+
+    @property
+    def flight(self) -> SingleFlight:
+        return self._flight or get_single_flight()
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", "")
+
+    @property
+    def prompt_version(self) -> str:
+        return getattr(self.processor, "prompt_version", "")
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        key = await asyncio.to_thread(
+            extraction_cache_key, content, additional_context, self.model, self.prompt_version
+        )
+        call = partial(self.processor.process_content, content, additional_context)
+        if isinstance(self.processor, CachingAIProcessor):
+            call = partial(call, key=key)
+        return await self.flight.run(key, call, self.priority)
+
+
+_flight: Optional[SingleFlight] = None
+_flight_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the shared SingleFlight for the running event loop.
+
+    Its tasks belong to one loop, so a new one is created if the loop
+    changes (e.g. between test clients).
+    """
+    global _flight, _flight_loop
+    loop = asyncio.get_running_loop()
+    if _flight is None or _flight_loop is not loop:
+        _flight = SingleFlight()
+        _flight_loop = loop
+    return _flight
@@ -0,0 +1,335 @@
+"""Normalization and lookup of procedure (CPT/HCPCS) and diagnosis (ICD-10-CM) codes.
+
+Each code set is a text file with one code per line (see
+app/data/code_sets). It is compiled once into a sorted array of fixed-width
+byte strings, saved as .npy under CODE_INDEX_CACHE_DIR and memory-mapped
+on later loads, so no process parses the text file twice. Lookups are
+binary searches over that array, one numpy call per batch of codes.
+
+A code is first normalized deterministically: labels such as "CPT" or
+"ICD-10:", spaces, ICD-10 dots and CPT modifiers are dropped and letters
+upper-cased. A code that is still not in the set is fuzzy-matched:
+
+  corrected  exactly one code differs only by characters OCR confuses
+             (0/O, 1/I, 5/S, 8/B...): the value is replaced by that code
+  invalid    otherwise; codes one edit away are offered as suggestions
+
+Codes are returned in their usual written form (ICD-10 with its dot).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import itertools
+import logging
+import os
+import re
+
+from app.core.config import settings
+from app.core.metrics import CODE_CHECKS
+from app.models.response import FormExtractionResponse
+from app.services.interfaces import AIModelProcessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CODE_SET_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "code_sets"
+)
+
+# Kind -> (file name in the code set directory, format of a normalized code, name in messages)
+CODE_SETS = {
+    "procedure": ("procedure_codes.txt", r"\d{4}[0-9FTU]|[A-V]\d{4}", "CPT/HCPCS"),
+    "diagnosis": ("diagnosis_codes.txt", r"[A-Z]\d[0-9A-Z]{1,5}", "ICD-10-CM"),
+}
+
+# (section, key, code kind) of the extracted fields that hold codes.
+CODE_FIELDS = (
+    ("procedure_info", "code", "procedure"),
+    ("diagnosis_info", "primary_diagnosis", "diagnosis"),
+)
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# Characters OCR and handwriting readers mistake for one another.
+CONFUSABLE = {
+    "0": "ODQ", "O": "0DQ", "D": "0O", "Q": "0O",
+    "1": "IL7", "I": "1L", "L": "1I", "7": "1",
+    "2": "Z", "Z": "2", "5": "S", "S": "5",
+    "6": "G", "G": "6", "8": "B", "B": "8",
+}
+MAX_CONFUSABLE_VARIANTS = 4096
+
+_LABEL = re.compile(
+    r"^(?:CPT|HCPCS|ICD-?10(?:-?CM)?|DX|DIAGNOSIS|PROCEDURE)?\s*(?:CODE)?\s*[:#]?\s*"
+)
+_SEPARATORS = re.compile(r"[\s.\-]")
+_MODIFIERS = re.compile(r"^([0-9A-Z]{5})(?:[-\s]+[0-9A-Z]{2})+$")
+_FORMATS = {kind: re.compile(pattern) for kind, (_, pattern, _) in CODE_SETS.items()}
+
+
+def normalize_key(kind: str, value: str) -> str:
+    """The compact form a code is indexed by: "icd-10: m17.0" -> "M170"."""
+    key = _LABEL.sub("", value.strip().upper(), count=1)
+    if kind == "procedure":
+        # Two-character modifiers may follow the code: 29881-RT, 29881 59.
+        key = _MODIFIERS.sub(r"\1", key)
+    return _SEPARATORS.sub("", key)
+
+
+def format_code(kind: str, key: str) -> str:
+    """The usual written form of an indexed code: "M170" -> "M17.0"."""
+    if kind == "diagnosis" and len(key) > 3:
+        return f"{key[:3]}.{key[3:]}"
+    return key
+
+
+def _edits(key: str) -> List[str]:
+    """Codes one substitution, insertion, deletion or adjacent swap away."""
+    splits = [(key[:i], key[i:]) for i in range(len(key) + 1)]
+    edits = {left + right[1:] for left, right in splits if right}
+    edits.update(left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1)
+    edits.update(left + c + right[1:] for left, right in splits if right for c in ALPHABET)
+    edits.update(left + c + right for left, right in splits for c in ALPHABET)
+    edits.discard(key)
+    return sorted(edits)
+
+
+def _confusable_variants(key: str) -> List[str]:
+    """Codes that differ from key only in characters OCR confuses."""
+    options = [c + CONFUSABLE.get(c, "") for c in key]
+    count = 1
+    for chars in options:
+        count *= len(chars)
+    if count > MAX_CONFUSABLE_VARIANTS:
+        # Too many confusable characters to try every combination: one at a time.
+        variants = {
+            key[:i] + c + key[i + 1 :] for i, chars in enumerate(options) for c in chars[1:]
+        }
+    else:
+        variants = {"".join(chars) for chars in itertools.product(*options)}
+    variants.discard(key)
+    return sorted(variants)
+
+
+def compile_code_set(kind: str, path: str):
+    """Sorted, de-duplicated array of the normalized codes in a code set file."""
+    import numpy as np
+
+    code_format = _FORMATS[kind]
+    keys = []
+    with open(path, encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key = normalize_key(kind, line.split(None, 1)[0])
+            if not code_format.fullmatch(key):
+                raise ValueError(f"{path}:{number}: not a {CODE_SETS[kind][2]} code: {key!r}")
+            keys.append(key)
+    width = max((len(key) for key in keys), default=1)
+    return np.unique(np.array(keys, dtype=f"S{width}"))
+
+
+class CodeIndex:
+    """A sorted array of one kind of code, with batch lookup and fuzzy matching."""
+
+    def __init__(self, kind: str, codes):
+        self.kind = kind
+        self.codes = codes
+        self.width = codes.dtype.itemsize
+        self._format = _FORMATS[kind]
+        self._label = CODE_SETS[kind][2]
+
+    @classmethod
+    def load(cls, kind: str, path: str, cache_dir: Optional[str] = None) -> "CodeIndex":
+        """Memory-map the compiled index of path, compiling it first if needed.
+
+        The compiled file is named after the source's size and mtime, so an
+        edited code set is compiled again. Where the cache directory cannot
+        be written (read-only deploys) the array stays in memory.
+        """
+        import numpy as np
+
+        stat = os.stat(path)
+        cache_dir = cache_dir or settings.CODE_INDEX_CACHE_DIR
+        cache_path = os.path.join(cache_dir, f"{kind}-{stat.st_size}-{stat.st_mtime_ns}.npy")
+        try:
+            return cls(kind, np.load(cache_path, mmap_mode="r"))
+        except (OSError, ValueError):
+            pass
+        codes = compile_code_set(kind, path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            partial = f"{cache_path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as file:
+                np.save(file, codes)
+            os.replace(partial, cache_path)
+            codes = np.load(cache_path, mmap_mode="r")
+        except OSError as e:
+            logger.warning("Could not cache the %s code index: %s", kind, e)
+        return cls(kind, codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def contains(self, keys: List[str]):
+        """Boolean array: which normalized keys are in the index (one binary search)."""
+        import numpy as np
+
+        found = np.zeros(len(keys), dtype=bool)
+        # Keys that cannot be in the index would be truncated by the cast below.
+        probe = [
+            i for i, key in enumerate(keys) if len(key) <= self.width and key.isascii()
+        ]
+        if probe and len(self.codes):
+            values = np.array([keys[i] for i in probe], dtype=self.codes.dtype)
+            positions = np.searchsorted(self.codes, values)
+            np.minimum(positions, len(self.codes) - 1, out=positions)
+            found[probe] = self.codes[positions] == values
+        return found
+
+    def _matching(self, candidates: List[List[str]]) -> List[List[str]]:
+        """For each list of candidate keys, those in the index, with one lookup for all."""
+        flat = [key for keys in candidates for key in keys]
+        found = self.contains(flat)
+        matches, start = [], 0
+        for keys in candidates:
+            matches.append([key for key, hit in zip(keys, found[start : start + len(keys)]) if hit])
+            start += len(keys)
+        return matches
+
+    def lookup_many(self, values: Iterable[str]) -> List[Dict[str, Any]]:
+        """Check a batch of codes as written; see the module docstring for the statuses.
+
+        Returns {"input", "code", "status", "suggestions"} per value. code is
+        the normalized (or corrected) code in its written form, or None if
+        the value is not shaped like a code; a corrected code is also its
+        one suggestion.
+        """
+        values = list(values)
+        keys = [normalize_key(self.kind, value) for value in values]
+        found = self.contains(keys)
+        misses = [i for i, hit in enumerate(found) if not hit]
+        corrections = self._matching([_confusable_variants(keys[i]) for i in misses])
+        close = self._matching(
+            [[] if len(fixes) == 1 else _edits(keys[i]) for i, fixes in zip(misses, corrections)]
+        )
+
+        results = [
+            {
+                "input": value,
+                "code": format_code(self.kind, key) if self._format.fullmatch(key) else None,
+                "status": "valid",
+                "suggestions": [],
+            }
+            for value, key in zip(values, keys)
+        ]
+        for i, fixes, near in zip(misses, corrections, close):
+            result = results[i]
+            if len(fixes) == 1:
+                code = format_code(self.kind, fixes[0])
+                result.update(code=code, status="corrected", suggestions=[code])
+            else:
+                suggestions = sorted(set(fixes) | set(near))[: settings.CODE_MAX_SUGGESTIONS]
+                result.update(
+                    status="invalid",
+                    suggestions=[format_code(self.kind, key) for key in suggestions],
+                )
+        return results
+
+    def lookup(self, value: str) -> Dict[str, Any]:
+        return self.lookup_many([value])[0]
+
+    def describe(self, result: Dict[str, Any]) -> str:
+        """A message for a lookup result that is not valid."""
+        problem = "Malformed" if result["code"] is None else "Unknown"
+        message = f"{problem} {self._label} code"
+        if result["suggestions"]:
+            message += f"; did you mean {', '.join(result['suggestions'])}?"
+        return message
+
+
+# Kind -> (version of the code set file it was loaded from, index).
+_indexes: Dict[str, Tuple[str, CodeIndex]] = {}
+
+
+def code_set_path(kind: str) -> str:
+    return os.path.join(settings.CODE_SET_DIR or DEFAULT_CODE_SET_DIR, CODE_SETS[kind][0])
+
+
+def code_set_version(kind: str) -> str:
+    """The size and mtime of the kind's code set file, which change when it is edited."""
+    stat = os.stat(code_set_path(kind))
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def get_code_index(kind: str) -> CodeIndex:
+    """Return this process's index of the kind's code set, loading it on first use.
+
+    An edited code set is loaded again. Loading can compile the set, so
+    async callers run this (or check_codes) in a worker thread.
+    """
+    version = code_set_version(kind)
+    loaded = _indexes.get(kind)
+    if loaded is None or loaded[0] != version:
+        path = code_set_path(kind)
+        index = CodeIndex.load(kind, path)
+        _indexes[kind] = (version, index)
+        logger.info("Loaded %d %s codes from %s", len(index), kind, path)
+        return index
+    return loaded[1]
+
+
+def check_codes(kind: str, values: List[str]) -> List[Dict[str, Any]]:
+    """lookup_many on the kind's index, counted in code_checks_total."""
+    results = get_code_index(kind).lookup_many(values)
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    for status, count in counts.items():
+        CODE_CHECKS.labels(kind, status).inc(count)
+    return results
+
+
+class CodeCheckingProcessor(AIModelProcessor):
+    """Normalizes and checks the codes in each extraction against the code index.
+
+    Its prompt_version names the code set versions, so cached extractions
+    checked against an older set are not reused.
+    """
+
+    def __init__(self, processor: AIModelProcessor):
+        self.processor = processor
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", "")
+
+    @property
+    def prompt_version(self) -> str:
+        versions = ",".join(code_set_version(kind) for kind in CODE_SETS)
+        return f"{getattr(self.processor, 'prompt_version', '')}+codes:{versions}"
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        response = await self.processor.process_content(content, additional_context)
+        # The first check loads (and may compile) the index, off the event loop.
+        return await asyncio.to_thread(check_response_codes, response)
+
+
+def check_response_codes(response: FormExtractionResponse) -> FormExtractionResponse:
+    """Replace extracted codes by their normalized or corrected form.
+
+    processing_metadata.codes holds the lookup result of each code field
+    that has a value, keyed "section.key".
+    """
+    checks = {}
+    for section, key, kind in CODE_FIELDS:
+        values = getattr(response, section)
+        field = values.get(key)
+        if field is None or field.value is None:
+            continue
+        (result,) = check_codes(kind, [field.value])
+        if result["code"] is not None and result["code"] != field.value:
+            values[key] = field.model_copy(update={"value": result["code"]})
+        checks[f"{section}.{key}"] = result
+    response.processing_metadata["codes"] = checks
+    return response
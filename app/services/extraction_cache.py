@@ -0,0 +1,113 @@
+from typing import List, Dict, Any, Optional
+import asyncio
+import base64
+import hashlib
+import logging
+
+from app.core.config import settings
+from app.models.response import FormExtractionResponse
+from app.services.cache import MemoryCacheBackend, SQLiteCacheBackend
+from app.services.interfaces import AIModelProcessor, CacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+def extraction_cache_key(
+    content: List[Dict[str, Any]],
+    additional_context: Optional[str],
+    model: str,
+    prompt_version: str,
+) -> str:
+    """Hash the decoded image bytes, notes, model and prompt version."""
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, additional_context or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    for item in content:
+        digest.update(item["type"].encode("utf-8"))
+        if item["type"] == "image":
+            digest.update(hashlib.sha256(base64.b64decode(item["image"])).digest())
+    return digest.hexdigest()
+
+
+def is_cacheable(response: FormExtractionResponse) -> bool:
+    """Whether a response may be stored: not a degraded (stub) or partial answer."""
+    metadata = response.processing_metadata
+    return not metadata.get("degraded") and metadata.get("status") != "partial"
+
+
+class CachingAIProcessor(AIModelProcessor):
+    """Returns stored extractions for identical inputs without calling the model."""
+
+    def __init__(self, processor: AIModelProcessor, backend: CacheBackend):
+        self.processor = processor
+        self.backend = backend
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", "")
+
+    @property
+    def prompt_version(self) -> str:
+        return getattr(self.processor, "prompt_version", "")
+
+    def cache_key(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> str:
+        return extraction_cache_key(content, additional_context, self.model, self.prompt_version)
+
+    async def process_content(
+        self,
+        content: List[Dict[str, Any]],
+        additional_context: str = None,
+        key: Optional[str] = None,
+    ) -> FormExtractionResponse:
+        """Serve or store the extraction; key is cache_key() if the caller has it."""
+        if key is None:
+            # Hashing decoded images is CPU work, kept off the event loop.
+            key = await asyncio.to_thread(
+                extraction_cache_key, content, additional_context, self.model, self.prompt_version
+            )
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Extraction cache read failed: {str(e)}")
+            cached = None
+
+        if cached is not None:
+            response = FormExtractionResponse.model_validate_json(cached)
+            response.processing_metadata["cache"] = "hit"
+            return response
+
+        response = await self.processor.process_content(content, additional_context)
+        if is_cacheable(response):
+            try:
+                await self.backend.set(
+                    key, response.model_dump_json().encode("utf-8"), settings.EXTRACTION_CACHE_TTL
+                )
+            except Exception as e:
+                logger.warning(f"Extraction cache write failed: {str(e)}")
+        response.processing_metadata["cache"] = "miss"
+        return response
+
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_extraction_cache() -> Optional[CacheBackend]:
+    """Return the configured cache backend, or None if caching is disabled."""
+    global _backend
+    if _backend is None:
+        if settings.EXTRACTION_CACHE_BACKEND == "sqlite":
+            _backend = SQLiteCacheBackend(
+                settings.EXTRACTION_CACHE_PATH,
+                max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+                default_ttl=settings.EXTRACTION_CACHE_TTL,
+            )
+        elif settings.EXTRACTION_CACHE_BACKEND == "memory":
+            _backend = MemoryCacheBackend(
+                max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+                default_ttl=settings.EXTRACTION_CACHE_TTL,
+                max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+            )
+    return _backend
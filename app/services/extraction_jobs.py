@@ -0,0 +1,220 @@
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+import asyncio
+import ipaddress
+import logging
+import socket
+import uuid
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import EXTRACTION_JOBS_IN_FLIGHT
+from app.models.job import ExtractionJobResponse
+from app.services.interfaces import AIModelProcessor, JobQueueBackend
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the extraction queue is at its depth limit."""
+
+
+class CallbackURLError(ValueError):
+    """Raised for a callback_url that finished jobs will not be sent to."""
+
+
+def check_callback_url(url: str, allowed_hosts: Optional[List[str]] = None) -> str:
+    """Return the host of an http(s) callback URL whose host is allowed.
+
+    allowed_hosts defaults to JOB_CALLBACK_HOSTS; "*.example.com" allows
+    the subdomains of example.com.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise CallbackURLError("callback_url must be an http(s) URL")
+    if parts.username or parts.password:
+        raise CallbackURLError("callback_url must not contain credentials")
+    allowed = settings.JOB_CALLBACK_HOSTS if allowed_hosts is None else allowed_hosts
+    for pattern in allowed:
+        pattern = pattern.lower()
+        if host == pattern or (pattern.startswith("*.") and host.endswith(pattern[1:])):
+            return host
+    raise CallbackURLError(f"callback_url host {host} is not allowed")
+
+
+def is_public_address(address: str) -> bool:
+    """False for private, loopback, link-local, reserved and multicast addresses."""
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def resolve_host(host: str, port: int) -> List[str]:
+    """The addresses host resolves to, without blocking the event loop."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+class ExtractionJobManager:
+    """Runs queued extractions on a bounded pool of worker tasks."""
+
+    def __init__(
+        self,
+        processor_factory: Callable[[], Awaitable[AIModelProcessor]],
+        backend: JobQueueBackend,
+        workers: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        timeout: Optional[float] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        resolver: Callable[[str, int], Awaitable[List[str]]] = resolve_host,
+    ):
+        self.processor_factory = processor_factory
+        self.backend = backend
+        self.workers = workers or settings.JOB_WORKERS
+        self.max_depth = max_depth or settings.JOB_QUEUE_MAX_DEPTH
+        self.timeout = timeout or settings.JOB_TIMEOUT
+        self._http_client = http_client
+        self._resolve = resolver
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the worker tasks if they are not already running."""
+        if self._tasks and not all(task.done() for task in self._tasks):
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def submit(
+        self,
+        content: List[Dict[str, Any]],
+        additional_context: Optional[str] = None,
+        callback_url: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Queue an extraction and return its job record."""
+        if await self.backend.depth() >= self.max_depth:
+            raise QueueFullError(f"Extraction queue is full ({self.max_depth} jobs waiting)")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "submitted_at": datetime.utcnow().isoformat(),
+            "callback_url": callback_url,
+        }
+        await self.backend.enqueue(
+            job,
+            {
+                "content": content,
+                "additional_context": additional_context,
+                "metadata": metadata or {},
+            },
+        )
+        await self.start()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job, payload = await self.backend.dequeue()
+            try:
+                with EXTRACTION_JOBS_IN_FLIGHT.track_inprogress():
+                    await self._run(job, payload)
+            except Exception as e:
+                logger.error(f"Extraction job {job['job_id']} crashed: {str(e)}")
+
+    async def _run(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        started_at = datetime.utcnow()
+        submitted_at = datetime.fromisoformat(job["submitted_at"])
+        recorded = False
+        try:
+            await self.backend.update(
+                job_id,
+                status="running",
+                started_at=started_at.isoformat(),
+                queue_ms=int((started_at - submitted_at).total_seconds() * 1000),
+            )
+
+            try:
+                processor = await self.processor_factory()
+                result = await asyncio.wait_for(
+                    processor.process_content(
+                        payload["content"], payload["additional_context"]
+                    ),
+                    self.timeout,
+                )
+                result.processing_metadata.update(payload.get("metadata") or {})
+                fields = {"status": "succeeded", "result": result.model_dump(mode="json")}
+            except asyncio.TimeoutError:
+                fields = {
+                    "status": "failed",
+                    "error": f"Extraction timed out after {self.timeout} seconds",
+                }
+            except Exception as e:
+                logger.error(f"Extraction job {job_id} failed: {str(e)}")
+                fields = {"status": "failed", "error": str(e)}
+
+            finished_at = datetime.utcnow()
+            fields["finished_at"] = finished_at.isoformat()
+            fields["run_ms"] = int((finished_at - started_at).total_seconds() * 1000)
+            await self.backend.update(job_id, **fields)
+            recorded = True
+        finally:
+            if not recorded:
+                # A job left "running" would be polled forever.
+                await self._record_failure(job_id)
+
+        if job.get("callback_url"):
+            await self._notify(job["callback_url"], await self.backend.get(job_id))
+
+    async def _record_failure(self, job_id: str) -> None:
+        try:
+            await self.backend.update(
+                job_id,
+                status="failed",
+                error="Extraction job could not be completed",
+                finished_at=datetime.utcnow().isoformat(),
+            )
+        except Exception as e:
+            logger.error(f"Could not mark extraction job {job_id} failed: {str(e)}")
+
+    async def _notify(self, callback_url: str, job: Dict[str, Any]) -> None:
+        """POST the finished job to its webhook; failures are logged, not retried.
+
+        The host must still be allowed and must resolve to public addresses
+        only. The POST goes to the address that was checked, so a second DNS
+        answer cannot redirect it to an internal host.
+        """
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=settings.JOB_WEBHOOK_TIMEOUT)
+        try:
+            host = check_callback_url(callback_url)
+            parts = urlsplit(callback_url)
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            addresses = await self._resolve(host, port)
+            if not addresses or not all(is_public_address(a) for a in addresses):
+                raise CallbackURLError(f"callback_url host {host} resolves to a non-public address")
+            address = f"[{addresses[0]}]" if ":" in addresses[0] else addresses[0]
+            response = await self._http_client.post(
+                urlunsplit((parts.scheme, f"{address}:{port}", parts.path, parts.query, "")),
+                json=ExtractionJobResponse(**job).model_dump(mode="json"),
+                headers={"Host": parts.netloc},
+                extensions={"sni_hostname": host},
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['job_id']} failed: {str(e)}")
@@ -0,0 +1,103 @@
+"""The extraction prompt and output schema, built once at import.
+
+The system message is the same bytes on every call, so it forms a stable
+prefix that the provider's prompt cache can reuse. Everything that varies
+(page images, source labels, notes) goes in the user message after it.
+The output schema is derived from FormExtractionResponse; the keys inside
+each dict section are listed in SECTION_FIELDS.
+"""
+from typing import Any, Dict, Iterable, Optional, get_args, get_origin
+import json
+
+from app.models.response import FieldData, FormExtractionResponse
+
+# Bump whenever the prompt or schema changes so cached extractions are not reused.
+PROMPT_VERSION = "3"
+
+SECTION_FIELDS = {
+    "patient_info": ("name", "id"),
+    "procedure_info": ("code", "description"),
+    "diagnosis_info": ("primary_diagnosis", "symptoms", "affected_area"),
+    "insurance_info": ("provider", "policy_number"),
+}
+
+
+def _object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def _field_schema() -> Dict[str, Any]:
+    properties = FieldData.model_json_schema()["properties"]
+    return _object(
+        {
+            name: {key: value for key, value in prop.items() if key != "title"}
+            for name, prop in properties.items()
+        }
+    )
+
+
+def build_output_schema() -> Dict[str, Any]:
+    """JSON schema of the model output: each response section, minus metadata."""
+    field = _field_schema()
+    sections = {}
+    for name, info in FormExtractionResponse.model_fields.items():
+        if info.annotation is FieldData:
+            sections[name] = field
+        elif get_origin(info.annotation) is dict and get_args(info.annotation)[1] is FieldData:
+            sections[name] = _object({key: field for key in SECTION_FIELDS[name]})
+    return _object(sections)
+
+
+OUTPUT_SCHEMA = build_output_schema()
+SECTIONS = tuple(OUTPUT_SCHEMA["properties"])
+
+SYSTEM_PROMPT = (
+    "You are an expert medical form analyzer specializing in prior authorization requests. "
+    "Extract the requested information from the attached medical documents, including "
+    "handwritten notes.\n"
+    "\n"
+    "Rules:\n"
+    "1. Return ONLY one JSON object that matches the schema below, with no other text.\n"
+    "2. For each field:\n"
+    "   - value: the extracted text, or null if not found\n"
+    "   - confidence: 0.0 to 1.0, how sure you are of the value\n"
+    "   - is_missing: true if the field was not found, otherwise false\n"
+    "   - source_file: the \"Source file\" label of the page the value came from\n"
+    "3. Transcribe handwritten text exactly as written.\n"
+    "4. Additional notes from the requester, if any, follow the pages.\n"
+    "\n"
+    "JSON schema:\n" + json.dumps(OUTPUT_SCHEMA, separators=(",", ":"))
+)
+
+
+def response_format(
+    mode: str, sections: Optional[Iterable[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """The response_format for a call: "json_schema", "json_object" or "none".
+
+    With sections, the schema only asks for those sections.
+    """
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode != "json_schema":
+        return None
+    schema = OUTPUT_SCHEMA
+    if sections is not None:
+        schema = _object({name: OUTPUT_SCHEMA["properties"][name] for name in sections})
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "form_extraction", "strict": True, "schema": schema},
+    }
+
+
+def sections_request(sections: Iterable[str]) -> str:
+    """The follow-up instruction asking again for the sections that were missing."""
+    return (
+        "Your previous answer was incomplete. Return ONLY a JSON object with these "
+        "sections, following the same schema: " + ", ".join(sections)
+    )
@@ -1,13 +1,31 @@
 from fastapi import UploadFile, HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional, AsyncIterator, BinaryIO
+import asyncio
 import base64
+import os
+import tempfile
 from app.core.config import settings
+from app.services.image_preprocessor import preprocess_image_file
 from app.services.interfaces import FileHandler
+from app.services.pdf_rasterizer import count_pdf_pages, iter_pdf_pages
+from app.services.worker_pool import run_in_process
+from app.utils.helpers import MAGIC_BYTES_LENGTH, sniff_mime_type
 
 
 class ImageFileHandler(FileHandler):
+    def __init__(
+        self, streaming: Optional[bool] = None, preprocess: Optional[bool] = None
+    ):
+        self.streaming = settings.STREAMING_UPLOADS if streaming is None else streaming
+        self.preprocess = (
+            settings.IMAGE_PREPROCESSING if preprocess is None else preprocess
+        )
+
     async def validate_file(self, file: UploadFile) -> bool:
         """Validate image file type and size."""
+        if self.streaming:
+            return await self._validate_streaming(file)
+
         if file.content_type not in settings.ALLOWED_FILE_TYPES:
             raise HTTPException(
                 status_code=400, detail=f"File type {file.content_type} not allowed"
@@ -21,6 +39,12 @@ class ImageFileHandler(FileHandler):
 
     async def process_file(self, file: UploadFile) -> Dict[str, Any]:
         """Convert image to base64 and prepare for GPT."""
+        if self.preprocess:
+            return await self._process_preprocessed(file)
+
+        if self.streaming:
+            return await self._process_streaming(file)
+
         if not file.content_type.startswith("image/"):
             return None
 
@@ -28,4 +52,170 @@ class ImageFileHandler(FileHandler):
         await file.seek(0)
         base64_image = base64.b64encode(contents).decode("utf-8")
 
-        return {"type": "image", "image": base64_image, "source": file.filename}
+        return {
+            "type": "image",
+            "image": base64_image,
+            "source": file.filename,
+            "mime_type": file.content_type,
+        }
+
+    async def iter_file(self, file: UploadFile) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one item per image, or one per rasterized page for PDFs."""
+        head = await file.read(MAGIC_BYTES_LENGTH)
+        await file.seek(0)
+        if sniff_mime_type(head) != "application/pdf":
+            processed = await self.process_file(file)
+            if processed:
+                yield processed
+            return
+
+        path = await asyncio.to_thread(_copy_to_temp_file, file.file, ".pdf")
+        try:
+            try:
+                page_count = await run_in_process(count_pdf_pages, path)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Could not read PDF: {str(e)}")
+            if page_count > settings.PDF_MAX_PAGES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"PDF has {page_count} pages; the limit is {settings.PDF_MAX_PAGES}",
+                )
+
+            # Preprocessing runs in the worker that renders the page, so each
+            # page is encoded once.
+            async for page_number, (page_bytes, mime_type, stats) in iter_pdf_pages(
+                path,
+                settings.PDF_RASTER_DPI,
+                page_count,
+                settings.PDF_RENDER_PREFETCH,
+                self._preprocess_options() if self.preprocess else None,
+            ):
+                item = {
+                    "type": "image",
+                    "image": base64.b64encode(page_bytes).decode("ascii"),
+                    "source": f"{file.filename}#p{page_number}",
+                    "mime_type": mime_type,
+                }
+                if stats is not None:
+                    item["preprocess"] = stats
+                yield item
+        finally:
+            await file.seek(0)
+            os.unlink(path)
+
+    @staticmethod
+    def _preprocess_options():
+        return (
+            settings.IMAGE_MAX_EDGE,
+            settings.IMAGE_OUTPUT_FORMAT,
+            settings.IMAGE_QUALITY,
+            settings.IMAGE_GRAYSCALE_SATURATION,
+        )
+
+    async def _process_preprocessed(self, file: UploadFile) -> Optional[Dict[str, Any]]:
+        """Downscale and re-encode an image upload in the process pool.
+
+        The upload is copied in chunks to a temp file for the worker, with
+        the size cap enforced as bytes are copied, so this process never
+        holds the whole original image.
+        """
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise HTTPException(status_code=400, detail="File size too large")
+        mime_type = sniff_mime_type(await file.read(MAGIC_BYTES_LENGTH))
+        await file.seek(0)
+        if mime_type is None or not mime_type.startswith("image/"):
+            return None
+
+        path = await asyncio.to_thread(_copy_to_temp_file, file.file, "")
+        try:
+            output, mime_type, stats = await run_in_process(
+                preprocess_image_file, path, *self._preprocess_options()
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=400, detail=f"Could not read image {file.filename}: {str(e)}"
+            )
+        finally:
+            await file.seek(0)
+            os.unlink(path)
+
+        return {
+            "type": "image",
+            "image": base64.b64encode(output).decode("ascii"),
+            "source": file.filename,
+            "mime_type": mime_type,
+            "preprocess": stats,
+        }
+
+    async def _validate_streaming(self, file: UploadFile) -> bool:
+        """Check the declared size and the magic bytes without buffering the file."""
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise HTTPException(status_code=400, detail="File size too large")
+
+        mime_type = sniff_mime_type(await file.read(MAGIC_BYTES_LENGTH))
+        await file.seek(0)
+        if mime_type not in settings.ALLOWED_FILE_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File type {mime_type or file.content_type} not allowed",
+            )
+        return True
+
+    async def _process_streaming(self, file: UploadFile) -> Optional[Dict[str, Any]]:
+        """Read the upload in chunks, base64-encoding into a single buffer.
+
+        The size cap is enforced as bytes arrive, so oversized uploads are
+        rejected before they are fully read.
+        """
+        chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        mime_type = sniff_mime_type(chunk[:MAGIC_BYTES_LENGTH])
+        if mime_type is None or not mime_type.startswith("image/"):
+            await file.seek(0)
+            return None
+
+        # Preallocate the output when the size is known so it never reallocates.
+        encoded = bytearray(4 * -(-file.size // 3) if file.size else 0)
+        position = 0
+        pending = b""
+        total = 0
+        while chunk:
+            total += len(chunk)
+            if total > settings.MAX_FILE_SIZE:
+                raise HTTPException(status_code=400, detail="File size too large")
+            data = pending + chunk
+            aligned = len(data) - len(data) % 3
+            encoded_chunk = base64.b64encode(data[:aligned])
+            encoded[position : position + len(encoded_chunk)] = encoded_chunk
+            position += len(encoded_chunk)
+            pending = data[aligned:]
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        encoded_chunk = base64.b64encode(pending)
+        encoded[position : position + len(encoded_chunk)] = encoded_chunk
+        position += len(encoded_chunk)
+        del encoded[position:]
+        await file.seek(0)
+
+        return {
+            "type": "image",
+            "image": encoded.decode("ascii"),
+            "source": file.filename,
+            "mime_type": mime_type,
+        }
+
+
+def _copy_to_temp_file(source: BinaryIO, suffix: str) -> str:
+    """Copy an upload to a named temp file for worker processes, enforcing the size cap."""
+    source.seek(0)
+    total = 0
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as target:
+        try:
+            while chunk := source.read(settings.UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > settings.MAX_FILE_SIZE:
+                    raise HTTPException(status_code=400, detail="File size too large")
+                target.write(chunk)
+        except BaseException:
+            target.close()
+            os.unlink(target.name)
+            raise
+    return target.name
@@ -1,127 +1,154 @@
-from typing import List, Dict, Any
-import openai
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from app.core.config import settings
+from app.core.logging import log_payload
+from app.core.metrics import (
+    EXTRACTION_STAGE_SECONDS,
+    MODEL_CALLS_IN_FLIGHT,
+    MODEL_OUTPUT_REPAIRS,
+    MODEL_SECTION_RETRIES,
+    OPENAI_TOKENS,
+)
+from app.services.extraction_prompt import (
+    PROMPT_VERSION,
+    SECTIONS,
+    SYSTEM_PROMPT,
+    response_format,
+    sections_request,
+)
 from app.services.interfaces import AIModelProcessor
+from app.services.openai_client import AsyncOpenAIClient, OpenAIAPIError, get_openai_client
+from app.services.rate_limiter import FollowUpCall, estimate_tokens
 from app.models.response import FormExtractionResponse, FieldData
-import json
+from app.utils.json_stream import IncrementalObjectParser, parse_model_json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Routes calls sharing the prompt prefix to the same provider cache.
+PROMPT_CACHE_KEY = f"form-extraction-v{PROMPT_VERSION}"
+
+# Top-level keys of the model output that map onto FormExtractionResponse.
+STREAMED_SECTIONS = SECTIONS
+USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def _cached_tokens(usage: Dict[str, Any]) -> int:
+    """Prompt tokens served from the provider's prompt cache."""
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+
+def _add_usage(total: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    combined = {key: total.get(key, 0) + usage.get(key, 0) for key in USAGE_KEYS}
+    combined["prompt_tokens_details"] = {
+        "cached_tokens": _cached_tokens(total) + _cached_tokens(usage)
+    }
+    return combined
+
+
+def _image_part(image_b64: str, mime_type: str) -> Dict[str, Any]:
+    return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_b64}"}}
+
 
 class GPTVisionProcessor(AIModelProcessor):
-    def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
-        self.model = "gpt-4.1"
-
-    def _create_system_message(self) -> str:
-        return """You are an expert medical form analyzer specializing in prior authorization requests. 
-        Your task is to extract specific information from medical documents, including handwritten notes, and format it precisely.
-        
-        IMPORTANT FORMATTING INSTRUCTIONS:
-        1. Return ONLY valid JSON matching the exact structure below
-        2. For each field:
-           - 'value': Extract the actual value (string) or null if not found
-           - 'confidence': Score from 0.0 to 1.0 indicating extraction confidence
-           - 'is_missing': true if field not found, false if found
-           - 'source_file': Filename where the information was found
-        3. DO NOT include any explanatory text outside the JSON structure
-        4. Ensure all JSON keys exactly match the structure below
-        5. For handwritten text, carefully transcribe exactly what is written
-
-        REQUIRED JSON STRUCTURE:
-        {
-            "patient_info": {
-                "name": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
-                "id": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
-            },
-            "procedure_info": {
-                "code": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
-                "description": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
-            },
-            "diagnosis_info": {
-                "primary_diagnosis": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
-                "symptoms": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
-                "affected_area": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
-            },
-            "treatment_info": {
-                "prescribed_treatment": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
-                "treatment_type": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
-            },
-            "insurance_info": {
-                "provider": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
-                "policy_number": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
-            },
-            "medical_justification": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
-        }"""
+    def __init__(
+        self, client: Optional[AsyncOpenAIClient] = None, model: Optional[str] = None
+    ):
+        self._client = client
+        self.model = model or "gpt-4.1"
+        self.max_tokens = 4000
+        self.system_prompt = SYSTEM_PROMPT
+        self.prompt_version = PROMPT_VERSION
+        self.response_format = settings.OPENAI_RESPONSE_FORMAT
+        self.section_retries = settings.OPENAI_SECTION_RETRIES
 
-    async def process_content(
-        self, content: List[Dict[str, Any]], additional_context: str = None
-    ) -> FormExtractionResponse:
-        """Process content using GPT-4 Vision."""
-        try:
-            # Prepare the message content
-            message_content = [
-                {
-                    "type": "text",
-                    "text": self._create_system_message()
-                    + "\n\n"
-                    + (additional_context if additional_context else ""),
-                }
-            ]
-
-            # Add images
-            for item in content:
-                if item["type"] == "image":
+    @property
+    def client(self) -> AsyncOpenAIClient:
+        return self._client or get_openai_client()
+
+    def _build_request(
+        self,
+        content: List[Dict[str, Any]],
+        additional_context: str = None,
+        sections: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Build the chat completion payload for the given content.
+
+        The system message is the precomputed SYSTEM_PROMPT, identical on
+        every call so the provider can cache it; pages and notes follow it.
+        With sections, a follow-up message asks for just those sections, so
+        the rest of the request is an identical (cached) prefix.
+        """
+        message_content = []
+        # Add images, each labelled with its source so the model can cite it
+        for item in content:
+            if item["type"] == "image":
+                message_content.append(
+                    {"type": "text", "text": f"Source file: {item['source']}"}
+                )
+                message_content.append(
+                    _image_part(item["image"], item.get("mime_type", "image/jpeg"))
+                )
+            elif item["type"] == "text":
+                # A page read by the OCR pre-pass, with crops of what it could not read
+                message_content.append(
+                    {
+                        "type": "text",
+                        "text": f"Source file: {item['source']} (OCR text)\n{item['text']}",
+                    }
+                )
+                for number, crop in enumerate(item.get("crops", ()), 1):
                     message_content.append(
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{item['image']}"
-                            },
-                        }
+                        {"type": "text", "text": f"[crop {number}] of {item['source']}"}
                     )
-
-            # Call GPT-4 Vision API with exact message structure
-            openai_response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[{"role": "user", "content": message_content}],
-                max_tokens=4000,
-                temperature=0.1,
+                    message_content.append(_image_part(crop["image"], "image/jpeg"))
+        if additional_context:
+            message_content.append(
+                {"type": "text", "text": f"Additional notes: {additional_context}"}
             )
 
-            # Debug log the response
-            logger.debug(f"OpenAI API Response: {openai_response}")
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": message_content},
+        ]
+        if sections is not None:
+            messages.append({"role": "user", "content": sections_request(sections)})
 
-            # Extract the response content
-            if not hasattr(openai_response, "choices") or not openai_response.choices:
-                raise Exception("Invalid response format from OpenAI API")
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": 0.1,
+            "prompt_cache_key": PROMPT_CACHE_KEY,
+        }
+        output_format = response_format(self.response_format, sections)
+        if output_format is not None:
+            payload["response_format"] = output_format
+        return payload
 
-            response_content = openai_response.choices[0].message.content
-            logger.debug(f"Response content: {response_content}")
+    def _record_usage(self, usage: Dict[str, Any]) -> None:
+        for kind in ("prompt", "completion"):
+            tokens = usage.get(f"{kind}_tokens")
+            if tokens:
+                OPENAI_TOKENS.labels(self.model, kind).inc(tokens)
+        cached = _cached_tokens(usage)
+        if cached:
+            OPENAI_TOKENS.labels(self.model, "cached_prompt").inc(cached)
 
-            # Parse the response content as JSON
-            try:
-                extracted_data = json.loads(response_content)
-                logger.debug(f"Parsed JSON data: {extracted_data}")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse response as JSON: {response_content}")
-                raise Exception(f"Failed to parse GPT response as JSON: {str(e)}")
-
-            # Create the response object
+    def _build_response(
+        self, extracted_data: Dict[str, Any], usage: Dict[str, Any]
+    ) -> FormExtractionResponse:
+        """Create the response object from parsed model output."""
+        self._record_usage(usage)
+        with EXTRACTION_STAGE_SECONDS.labels("map_field_data").time():
             return FormExtractionResponse(
-                patient_info=self._map_field_data(
-                    extracted_data.get("patient_info", {})
-                ),
+                patient_info=self._map_field_data(extracted_data.get("patient_info", {})),
                 procedure_info=self._map_field_data(
                     extracted_data.get("procedure_info", {})
                 ),
                 diagnosis_info=self._map_field_data(
                     extracted_data.get("diagnosis_info", {})
                 ),
-                treatment_info=self._map_field_data(
-                    extracted_data.get("treatment_info", {})
-                ),
                 medical_justification=self._create_single_field_data(
                     extracted_data.get("medical_justification", {})
                 ),
@@ -130,28 +157,179 @@ class GPTVisionProcessor(AIModelProcessor):
                 ),
                 processing_metadata={
                     "model": self.model,
-                    "total_tokens": (
-                        openai_response.usage.total_tokens
-                        if hasattr(openai_response, "usage")
-                        else 0
-                    ),
-                    "completion_tokens": (
-                        openai_response.usage.completion_tokens
-                        if hasattr(openai_response, "usage")
-                        else 0
-                    ),
-                    "prompt_tokens": (
-                        openai_response.usage.prompt_tokens
-                        if hasattr(openai_response, "usage")
-                        else 0
-                    ),
+                    "total_tokens": usage.get("total_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "cached_tokens": _cached_tokens(usage),
                 },
             )
 
+    async def _complete(self, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Make one chat completion call and return (output text, usage)."""
+        with MODEL_CALLS_IN_FLIGHT.track_inprogress(), EXTRACTION_STAGE_SECONDS.labels(
+            "model_call"
+        ).time():
+            openai_response = await self.client.chat_completion(payload)
+
+        log_payload(logger, "OpenAI API response", openai_response)
+
+        # Extract the response content
+        if not openai_response.get("choices"):
+            raise Exception("Invalid response format from OpenAI API")
+
+        # A refusal under structured output comes back with no content.
+        message = openai_response["choices"][0]["message"]
+        return message.get("content") or "", openai_response.get("usage") or {}
+
+    def _parse(self, response_content: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Parse model output, keeping whatever complete sections it has."""
+        with EXTRACTION_STAGE_SECONDS.labels("parse").time():
+            try:
+                extracted_data, repair = parse_model_json(response_content)
+            except ValueError as e:
+                # The raw output is patient data; log only its size.
+                logger.error(
+                    f"Failed to parse response as JSON ({len(response_content)} chars): {str(e)}"
+                )
+                extracted_data, repair = {}, "unparseable"
+        if repair:
+            MODEL_OUTPUT_REPAIRS.labels(repair).inc()
+        return extracted_data, repair
+
+    async def _retry_sections(
+        self,
+        content: List[Dict[str, Any]],
+        additional_context: Optional[str],
+        missing: List[str],
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Ask again for just the missing sections; failures are logged, not raised.
+
+        Under a RateLimitedProcessor the retry waits for budget like any
+        other call. If it fails for any reason (rejected, timed out,
+        malformed) the sections read so far are kept.
+        """
+        payload = self._build_request(content, additional_context, sections=missing)
+        prompt = self.system_prompt + sections_request(missing) + (additional_context or "")
+        cost = estimate_tokens(content, prompt, self.max_tokens)
+        try:
+            with EXTRACTION_STAGE_SECONDS.labels("section_retry").time():
+                async with FollowUpCall(cost) as call:
+                    response_content, usage = await self._complete(payload)
+                    call.used(usage.get("total_tokens"))
+        except Exception as e:
+            logger.warning(f"Retry for missing sections failed: {str(e)}")
+            MODEL_SECTION_RETRIES.labels("failed").inc()
+            return {}, {}
+        data, _ = self._parse(response_content)
+        recovered = {name: data[name] for name in missing if name in data}
+        MODEL_SECTION_RETRIES.labels(
+            "recovered" if len(recovered) == len(missing) else "incomplete"
+        ).inc()
+        return recovered, usage
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        """Process content using GPT-4 Vision.
+
+        Output that is not clean JSON is repaired where possible, and
+        sections it lacks are asked for again (up to section_retries calls)
+        rather than failing the extraction.
+        """
+        try:
+            payload = self._build_request(content, additional_context)
+            response_content, usage = await self._complete(payload)
+            extracted_data, repair = self._parse(response_content)
+            log_payload(logger, "Parsed model output", extracted_data)
+
+            retried: List[str] = []
+            for _ in range(self.section_retries):
+                missing = [name for name in SECTIONS if name not in extracted_data]
+                if not missing:
+                    break
+                retried.extend(name for name in missing if name not in retried)
+                recovered, retry_usage = await self._retry_sections(
+                    content, additional_context, missing
+                )
+                extracted_data.update(recovered)
+                usage = _add_usage(usage, retry_usage)
+
+            if not extracted_data:
+                raise Exception("Failed to parse GPT response as JSON")
+
+            response = self._build_response(extracted_data, usage)
+            if repair:
+                response.processing_metadata["output_repair"] = repair
+            if retried:
+                response.processing_metadata["retried_sections"] = retried
+            return response
+
+        except OpenAIAPIError:
+            # Kept as is so RateLimitedProcessor can retry on its status code.
+            raise
         except Exception as e:
             logger.error(f"Error in process_content: {str(e)}")
             raise Exception(f"Error processing with GPT-4 Vision: {str(e)}")
 
+    async def stream_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream the model output, yielding each section as soon as it is complete.
+
+        Yields ("section", {"section": name, "data": ...}) events and finally
+        ("complete", FormExtractionResponse).
+        """
+        payload = self._build_request(content, additional_context)
+        payload["stream_options"] = {"include_usage": True}
+        parser = IncrementalObjectParser()
+        usage: Dict[str, Any] = {}
+        started = time.perf_counter()
+        first_section_ms = None
+
+        try:
+            # The stream interleaves model latency with incremental parsing, so
+            # it is timed as one model_call.
+            with MODEL_CALLS_IN_FLIGHT.track_inprogress(), EXTRACTION_STAGE_SECONDS.labels(
+                "model_call"
+            ).time():
+                async for chunk in self.client.stream_chat_completion(payload):
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if not delta:
+                            continue
+                        for name, value in parser.feed(delta):
+                            if name not in STREAMED_SECTIONS:
+                                continue
+                            if first_section_ms is None:
+                                first_section_ms = int((time.perf_counter() - started) * 1000)
+                            yield "section", {
+                                "section": name,
+                                "data": self._map_section(name, value),
+                            }
+            extracted_data = parser.result()
+        except OpenAIAPIError:
+            # Kept as is: the API rejected the call before streaming, so it was not billed.
+            raise
+        except Exception as e:
+            logger.error(f"Error in stream_content: {str(e)}")
+            raise Exception(f"Error streaming from GPT-4 Vision: {str(e)}")
+
+        response = self._build_response(extracted_data, usage)
+        response.processing_metadata["first_section_ms"] = first_section_ms or 0
+        response.processing_metadata["total_ms"] = int(
+            (time.perf_counter() - started) * 1000
+        )
+        yield "complete", response
+
+    def _map_section(self, name: str, value: Any) -> Any:
+        """Map one streamed section to its JSON-ready FieldData form."""
+        if name == "medical_justification":
+            return self._create_single_field_data(value).model_dump()
+        return {
+            key: field.model_dump() for key, field in self._map_field_data(value).items()
+        }
+
     def _map_field_data(self, data: Dict) -> Dict[str, FieldData]:
         """Map dictionary to FieldData objects."""
         return {
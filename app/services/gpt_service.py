@@ -1,12 +1,9 @@
 from fastapi import UploadFile
 from typing import List, Dict
 import base64
-import openai
 from app.core.config import settings
 from app.models.response import FormExtractionResponse, FieldData
 
-openai.api_key = settings.OPENAI_API_KEY
-
 
 async def encode_image_to_base64(file: UploadFile) -> str:
     """Convert image file to base64 string."""
@@ -43,6 +40,11 @@ async def process_files_with_gpt(
         user_message += f"\nAdditional context: {additional_notes}"
 
     try:
+        # Imported and keyed on first use so importing this module stays cheap
+        import openai
+
+        openai.api_key = settings.OPENAI_API_KEY
+
         # Call GPT-4 Vision API
         response = openai.ChatCompletion.create(
             model="gpt-4-vision-preview",
@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Tuple
+import io
+import os
+import time
+
+OUTPUT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def preprocess_image(
+    data: bytes,
+    max_edge: int,
+    output_format: str,
+    quality: int,
+    grayscale_saturation: int,
+) -> Tuple[bytes, str, Dict[str, Any]]:
+    """Normalize an encoded image for the vision model (runs in a worker process).
+
+    Returns (bytes, mime_type, stats); see normalize_image.
+    """
+    from PIL import Image
+
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    return normalize_image(
+        image, len(data), started, max_edge, output_format, quality, grayscale_saturation
+    )
+
+
+def preprocess_image_file(
+    path: str,
+    max_edge: int,
+    output_format: str,
+    quality: int,
+    grayscale_saturation: int,
+) -> Tuple[bytes, str, Dict[str, Any]]:
+    """preprocess_image for an upload spooled to disk, so only the worker reads it."""
+    from PIL import Image
+
+    started = time.perf_counter()
+    with Image.open(path) as image:
+        return normalize_image(
+            image,
+            os.path.getsize(path),
+            started,
+            max_edge,
+            output_format,
+            quality,
+            grayscale_saturation,
+        )
+
+
+def normalize_image(
+    image: Any,
+    bytes_in: int,
+    started: float,
+    max_edge: int,
+    output_format: str,
+    quality: int,
+    grayscale_saturation: int,
+) -> Tuple[bytes, str, Dict[str, Any]]:
+    """Normalize a decoded PIL image for the vision model and encode it once.
+
+    Applies EXIF orientation, drops colour from near-grayscale scans, caps
+    the longest edge and re-encodes. Returns (bytes, mime_type, stats).
+    """
+    from PIL import Image, ImageOps, ImageStat
+
+    original_size = image.size
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    grayscale = image.mode == "L"
+    if not grayscale:
+        sample = image.copy()
+        sample.thumbnail((256, 256))
+        saturation = ImageStat.Stat(sample.convert("HSV").getchannel("S")).mean[0]
+        if saturation < grayscale_saturation:
+            image = image.convert("L")
+            grayscale = True
+
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=output_format, quality=quality, optimize=True)
+    output = buffer.getvalue()
+
+    return (
+        output,
+        OUTPUT_MIME_TYPES[output_format],
+        {
+            "bytes_in": bytes_in,
+            "bytes_out": len(output),
+            "original_size": f"{original_size[0]}x{original_size[1]}",
+            "output_size": f"{image.size[0]}x{image.size[1]}",
+            "grayscale": grayscale,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+    )
+
+
+def summarize_preprocessing(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build processing_metadata entries from the per-item preprocessing stats."""
+    stats = {item["source"]: item["preprocess"] for item in items if "preprocess" in item}
+    if not stats:
+        return {}
+    return {
+        "preprocess_bytes_in": sum(s["bytes_in"] for s in stats.values()),
+        "preprocess_bytes_out": sum(s["bytes_out"] for s in stats.values()),
+        "preprocess_ms": round(sum(s["ms"] for s in stats.values()), 1),
+        "preprocess_images": stats,
+    }
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from fastapi import UploadFile
 from app.models.response import FormExtractionResponse
 
@@ -15,6 +15,12 @@ class FileHandler(ABC):
         """Process a single file into required format."""
         pass
 
+    async def iter_file(self, file: UploadFile) -> AsyncIterator[Dict[str, Any]]:
+        """Yield processed content items for a file (several for multi-page files)."""
+        processed = await self.process_file(file)
+        if processed:
+            yield processed
+
 
 class AIModelProcessor(ABC):
     @abstractmethod
@@ -25,8 +31,140 @@ class AIModelProcessor(ABC):
         pass
 
 
+class OCREngine(ABC):
+    @abstractmethod
+    def recognize(self, image: Any) -> List[Dict[str, Any]]:
+        """Read a PIL image into text lines, top to bottom.
+
+        Each line is {"text", "confidence" (0.0 to 1.0, its least certain
+        word), "box" (left, top, right, bottom)}. Runs in a worker process.
+        """
+        pass
+
+
 class ResponseMapper(ABC):
     @abstractmethod
     def map_to_response(self, ai_response: Any) -> FormExtractionResponse:
         """Map AI response to our response model."""
         pass
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for key, or None if absent or expired."""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store value under key, expiring after ttl seconds."""
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove key from the cache."""
+        pass
+
+
+class JobQueueBackend(ABC):
+    @abstractmethod
+    async def enqueue(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        """Store a new job record and queue its payload for a worker."""
+        pass
+
+    @abstractmethod
+    async def dequeue(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Wait for the next queued job and return (job, payload)."""
+        pass
+
+    @abstractmethod
+    async def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        pass
+
+    @abstractmethod
+    async def update(self, job_id: str, **fields: Any) -> None:
+        """Update fields of a stored job record."""
+        pass
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if unknown."""
+        pass
+
+
+class AuthRequestRepository(ABC):
+    """Data access for auth_requests rows, as plain dicts with JSON-style values."""
+
+    @abstractmethod
+    async def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a row and return it as stored."""
+        pass
+
+    @abstractmethod
+    async def list_by_provider(
+        self,
+        provider_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return a provider's rows newest first, ordered by (submitted_at, id).
+
+        filters holds equality matches on status, priority, payer_id and
+        payer_name, plus submitted_from (inclusive) and submitted_to
+        (exclusive). after is the (submitted_at, id) of the last row of the
+        previous page; fields limits the returned columns.
+        """
+        pass
+
+    @abstractmethod
+    async def get(
+        self, request_id: str, provider_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return one row, or None if it does not exist.
+
+        With provider_id, only a row of that provider is returned; None
+        matches any provider (service role callers only).
+        """
+        pass
+
+    @abstractmethod
+    async def update(
+        self, request_id: str, values: Dict[str, Any], provider_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update one row and return it, or None if it does not exist (or, with
+        provider_id, belongs to another provider)."""
+        pass
+
+    @abstractmethod
+    async def insert_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows in one statement and return the ones actually inserted.
+
+        Rows whose (provider_id, idempotency_key) already exists are skipped.
+        """
+        pass
+
+    @abstractmethod
+    async def list_by_idempotency_keys(
+        self, provider_id: str, keys: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Return a provider's rows with any of the given idempotency keys."""
+        pass
+
+    @abstractmethod
+    async def update_many(
+        self,
+        request_ids: List[str],
+        values: Dict[str, Any],
+        provider_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Apply the same values to every listed row in one statement; return the rows updated.
+
+        With provider_id, rows of other providers are left alone.
+        """
+        pass
+
+    async def aclose(self) -> None:
+        """Release pooled connections."""
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+from app.services.interfaces import JobQueueBackend
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+class MemoryJobQueue(JobQueueBackend):
+    """In-process queue; finished jobs beyond the retention limit are dropped."""
+
+    def __init__(self, retention: int = 1000):
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+        self._finished = 0
+
+    async def enqueue(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        self._jobs[job["job_id"]] = dict(job)
+        self._queue.put_nowait((job["job_id"], payload))
+
+    async def dequeue(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        job_id, payload = await self._queue.get()
+        self._jobs[job_id]["status"] = "running"
+        return dict(self._jobs[job_id]), payload
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        self._jobs[job_id].update(fields)
+        if fields.get("status") in FINISHED_STATUSES:
+            self._finished += 1
+            self._prune()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def _prune(self) -> None:
+        if self._finished <= self.retention:
+            return
+        for job_id in list(self._jobs):
+            if self._finished <= self.retention:
+                break
+            if self._jobs[job_id]["status"] in FINISHED_STATUSES:
+                del self._jobs[job_id]
+                self._finished -= 1
+
+
+class SQLiteJobQueue(JobQueueBackend):
+    """Durable stand-in for a broker; workers poll for queued rows."""
+
+    def __init__(self, path: str, poll_interval: float = 0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, record TEXT NOT NULL, "
+            "payload TEXT, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created)"
+        )
+        # Jobs that were running when the previous process exited will never
+        # finish; put them back in the queue.
+        self._conn.execute(
+            "UPDATE jobs SET status = 'queued', "
+            "record = json_set(record, '$.status', 'queued') WHERE status = 'running'"
+        )
+        self._conn.commit()
+
+    @property
+    def wakeup(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    async def enqueue(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._insert, job, payload)
+        self.wakeup.set()
+
+    async def dequeue(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        while True:
+            claimed = await asyncio.to_thread(self._claim)
+            if claimed is not None:
+                return claimed
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def depth(self) -> int:
+        return await asyncio.to_thread(self._depth)
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        await asyncio.to_thread(self._update, job_id, fields)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _insert(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, record, payload, created) VALUES (?, ?, ?, ?, ?)",
+                (job["job_id"], job["status"], json.dumps(job), json.dumps(payload), time.time()),
+            )
+            self._conn.commit()
+
+    def _claim(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id, record, payload FROM jobs WHERE status = 'queued' "
+                    "ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                record = json.loads(row[1])
+                record["status"] = "running"
+                # Another process sharing the file may have claimed it first.
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = 'running', record = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (json.dumps(record), row[0]),
+                ).rowcount
+                self._conn.commit()
+                if claimed:
+                    return record, json.loads(row[2])
+
+    def _depth(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+
+    def _update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, status FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return
+            record = json.loads(row[0])
+            record.update(fields)
+            status = record.get("status", row[1])
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, record = ?, "
+                "payload = CASE WHEN ? IN ('succeeded', 'failed') THEN NULL ELSE payload END "
+                "WHERE id = ?",
+                (status, json.dumps(record), status, job_id),
+            )
+            self._conn.commit()
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def create_job_queue() -> JobQueueBackend:
+    """Build the queue backend selected by JOB_QUEUE_BACKEND."""
+    if settings.JOB_QUEUE_BACKEND == "sqlite":
+        return SQLiteJobQueue(settings.JOB_QUEUE_PATH)
+    return MemoryJobQueue(retention=settings.JOB_RETENTION)
@@ -0,0 +1,362 @@
+"""Routing model calls across several backends.
+
+A backend is a model, an endpoint or the local stub, configured in
+MODEL_BACKENDS. Each call goes to the backend with the lowest score. The
+score is its p95 model latency (without rate-limit queueing and retry
+backoff) over its last MODEL_ROUTER_WINDOW calls, divided
+by its success rate (the expected time, counting failed attempts). Then
+MODEL_ROUTER_COST_WEIGHT seconds are added per unit of the backend's cost.
+If the call has not answered by that backend's p95, the next backend is
+raced against it (a hedged request) and the first answer wins. A failed
+call fails over to the next backend. A backend that fails
+MODEL_ROUTER_BREAKER_FAILURES times in a row has its circuit opened. It is
+skipped for MODEL_ROUTER_BREAKER_RESET seconds, after which a single trial
+call decides whether it comes back.
+"""
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+import asyncio
+import logging
+import math
+import os
+import time
+
+from app.core.config import settings
+from app.core.metrics import (
+    MODEL_BACKEND_CALLS,
+    MODEL_BACKEND_CIRCUIT_OPEN,
+    MODEL_BACKEND_SECONDS,
+    MODEL_HEDGES,
+)
+from app.models.response import FormExtractionResponse
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.interfaces import AIModelProcessor
+from app.services.openai_client import AsyncOpenAIClient, OpenAIAPIError
+from app.services.rate_limiter import DEFAULT_PRIORITY, ModelCallScheduler, RateLimitedProcessor
+from app.services.stub_processor import StubProcessor
+
+logger = logging.getLogger(__name__)
+
+# The request itself is at fault, so every other backend would reject it too.
+REQUEST_ERROR_STATUS_CODES = frozenset({400, 413, 422})
+# Lowest success rate used in scoring, so a failing backend's score stays finite.
+MIN_SUCCESS_RATE = 0.05
+
+
+class NoModelBackendError(Exception):
+    """Raised when every model backend's circuit is open."""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """Whether an error counts against the backend (and so fails over)."""
+    return not (
+        isinstance(error, OpenAIAPIError)
+        and error.status_code in REQUEST_ERROR_STATUS_CODES
+    )
+
+
+class RollingStats:
+    """Outcomes of a backend's last `window` calls."""
+
+    def __init__(self, window: int, min_samples: int):
+        # Seconds for a success, None for a failure.
+        self.outcomes: Deque[Optional[float]] = deque(maxlen=window)
+        self.min_samples = max(min_samples, 1)
+
+    def record(self, seconds: Optional[float]) -> None:
+        self.outcomes.append(seconds)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for seconds in self.outcomes if seconds is None) / len(self.outcomes)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile latency of recent successes, or None with too few."""
+        latencies = sorted(seconds for seconds in self.outcomes if seconds is not None)
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures (0 never opens).
+
+    Once `reset` seconds have passed, a single trial call is let through.
+    Its success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failures: int,
+        reset: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failures = failures
+        self.reset = reset
+        self._clock = clock
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def available(self) -> bool:
+        """Whether a call could be let through now."""
+        if self.opened_at is None:
+            return True
+        return not self.trial and self._clock() - self.opened_at >= self.reset
+
+    def allow(self) -> bool:
+        """Let a call through, reserving the trial call if the circuit is open."""
+        if not self.available():
+            return False
+        if self.opened_at is not None:
+            self.trial = True
+        return True
+
+    def record_success(self) -> None:
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self) -> None:
+        self.consecutive += 1
+        if self.trial or (self.failures and self.consecutive >= self.failures):
+            self.opened_at = self._clock()
+        self.trial = False
+
+    def release(self) -> None:
+        """Give back a trial call that ended without an outcome."""
+        self.trial = False
+
+
+class ModelBackend:
+    """One model backend and its record of recent calls, shared by all requests."""
+
+    def __init__(
+        self,
+        name: str,
+        processor: AIModelProcessor,
+        cost: float = 0.0,
+        rate_limited: bool = True,
+        scheduler: Optional[ModelCallScheduler] = None,
+        client: Optional[AsyncOpenAIClient] = None,
+    ):
+        self.name = name
+        self.processor = processor
+        self.cost = cost
+        self.rate_limited = rate_limited
+        self.scheduler = scheduler
+        self.client = client
+        self.stats = RollingStats(settings.MODEL_ROUTER_WINDOW, settings.MODEL_ROUTER_MIN_SAMPLES)
+        self.breaker = CircuitBreaker(
+            settings.MODEL_ROUTER_BREAKER_FAILURES, settings.MODEL_ROUTER_BREAKER_RESET
+        )
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", self.name)
+
+    def expected_latency(self) -> float:
+        p95 = self.stats.p95()
+        return settings.MODEL_ROUTER_DEFAULT_LATENCY if p95 is None else p95
+
+    def score(self) -> float:
+        success_rate = max(1.0 - self.stats.error_rate, MIN_SUCCESS_RATE)
+        return (
+            self.expected_latency() / success_rate
+            + settings.MODEL_ROUTER_COST_WEIGHT * self.cost
+        )
+
+    async def call(
+        self,
+        priority: str,
+        content: List[Dict[str, Any]],
+        additional_context: Optional[str],
+    ) -> FormExtractionResponse:
+        """Make one call through this backend and record its outcome.
+
+        The latency recorded is that of the model call alone: time queued
+        for rate-limit budget or backing off between retries says nothing
+        about when a hedge should start.
+        """
+        processor, limited = self.processor, None
+        if self.rate_limited:
+            processor = limited = RateLimitedProcessor(
+                self.processor, priority=priority, scheduler=self.scheduler
+            )
+        started = time.perf_counter()
+        try:
+            response = await processor.process_content(content, additional_context)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            MODEL_BACKEND_CALLS.labels(self.name, "cancelled").inc()
+            raise
+        except Exception as e:
+            if not is_backend_failure(e):
+                self.breaker.release()
+                MODEL_BACKEND_CALLS.labels(self.name, "rejected").inc()
+                raise
+            self.stats.record(None)
+            self.breaker.record_failure()
+            MODEL_BACKEND_CALLS.labels(self.name, "error").inc()
+            MODEL_BACKEND_CIRCUIT_OPEN.labels(self.name).set(1 if self.breaker.is_open else 0)
+            raise
+
+        elapsed = time.perf_counter() - started
+        if limited is not None and limited.call_seconds is not None:
+            elapsed = limited.call_seconds
+        self.stats.record(elapsed)
+        self.breaker.record_success()
+        MODEL_BACKEND_CALLS.labels(self.name, "ok").inc()
+        MODEL_BACKEND_SECONDS.labels(self.name).observe(elapsed)
+        MODEL_BACKEND_CIRCUIT_OPEN.labels(self.name).set(0)
+        return response
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+
+
+class ModelRouter(AIModelProcessor):
+    """Sends each call to the best available backend, hedging and failing over."""
+
+    def __init__(
+        self,
+        backends: List[ModelBackend],
+        priority: str = DEFAULT_PRIORITY,
+        max_hedges: Optional[int] = None,
+    ):
+        self.backends = backends
+        self.priority = priority
+        self.max_hedges = settings.MODEL_ROUTER_MAX_HEDGES if max_hedges is None else max_hedges
+
+    @property
+    def model(self) -> str:
+        return ",".join(backend.model for backend in self.backends)
+
+    @property
+    def prompt_version(self) -> str:
+        if not self.backends:
+            return ""
+        return getattr(self.backends[0].processor, "prompt_version", "")
+
+    def ranked(self) -> List[ModelBackend]:
+        """Backends that could take a call now, best score first."""
+        available = [backend for backend in self.backends if backend.breaker.available()]
+        # sorted is stable, so configuration order breaks ties.
+        return sorted(available, key=lambda backend: backend.score())
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        loop = asyncio.get_running_loop()
+        candidates = self.ranked()
+        running: Dict[asyncio.Future, ModelBackend] = {}
+        hedged = set()
+        hedge_at = 0.0
+        error: Optional[Exception] = None
+
+        def start() -> Optional[asyncio.Future]:
+            nonlocal hedge_at
+            while candidates:
+                backend = candidates.pop(0)
+                if backend.breaker.allow():
+                    task = asyncio.ensure_future(
+                        backend.call(self.priority, content, additional_context)
+                    )
+                    running[task] = backend
+                    hedge_at = loop.time() + backend.expected_latency()
+                    return task
+            return None
+
+        try:
+            if start() is None:
+                raise NoModelBackendError("Every model backend's circuit is open")
+            while running:
+                timeout = None
+                if candidates and len(hedged) < self.max_hedges:
+                    timeout = max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    task = start()
+                    if task is not None:
+                        hedged.add(task)
+                        MODEL_HEDGES.labels("started").inc()
+                    continue
+
+                for task in done:
+                    backend = running.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        if not is_backend_failure(e):
+                            raise
+                        logger.warning(f"Model backend {backend.name} failed: {str(e)}")
+                        error = e
+                        continue
+                    if task in hedged:
+                        MODEL_HEDGES.labels("won").inc()
+                    response.processing_metadata["backend"] = backend.name
+                    return response
+
+                if not running:
+                    # Every call so far failed: fail over to the next backend.
+                    start()
+            raise error or NoModelBackendError("Every model backend's circuit is open")
+        finally:
+            for task in running:
+                task.cancel()
+
+
+def build_backend(spec: Dict[str, Any]) -> ModelBackend:
+    """Create a backend from one MODEL_BACKENDS entry."""
+    kind = spec.get("type", "openai")
+    name = spec.get("name") or spec.get("model") or kind
+    cost = float(spec.get("cost", 0.0))
+    if kind == "stub":
+        processor = StubProcessor(latency=float(spec.get("latency", 0.0)))
+        return ModelBackend(name, processor, cost=cost, rate_limited=False)
+    if kind != "openai":
+        raise ValueError(f"Unknown model backend type: {kind}")
+
+    client = scheduler = None
+    if spec.get("base_url") or spec.get("api_key_env"):
+        api_key = os.getenv(spec["api_key_env"], "") if spec.get("api_key_env") else None
+        client = AsyncOpenAIClient(api_key=api_key, base_url=spec.get("base_url"))
+        # Another endpoint or account has rate limits of its own.
+        scheduler = ModelCallScheduler(rpm=int(spec.get("rpm", 0)), tpm=int(spec.get("tpm", 0)))
+    processor = GPTVisionProcessor(client=client, model=spec.get("model"))
+    return ModelBackend(name, processor, cost=cost, scheduler=scheduler, client=client)
+
+
+_backends: Optional[List[ModelBackend]] = None
+_backends_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_model_backends() -> List[ModelBackend]:
+    """Return the MODEL_BACKENDS for the running event loop.
+
+    Their clients and schedulers belong to one loop, so they are rebuilt
+    (with fresh statistics) if the loop changes.
+    """
+    global _backends, _backends_loop
+    loop = asyncio.get_running_loop()
+    if _backends is None or _backends_loop is not loop:
+        _backends = [build_backend(spec) for spec in settings.MODEL_BACKENDS]
+        _backends_loop = loop
+    return _backends
+
+
+async def close_model_backends() -> None:
+    global _backends, _backends_loop
+    for backend in _backends or []:
+        await backend.aclose()
+    _backends = None
+    _backends_loop = None
@@ -0,0 +1,298 @@
+"""Local OCR of page images, run in worker processes.
+
+analyze_page reads one page with an OCREngine and decides how it should
+reach the model. A page that is mostly readable is sent as text, with crops
+of the regions it could not read. A page that is mostly unreadable
+(handwriting, photos) is sent as the image it was. Engines are selected by
+name ("tesseract", "bitmap") or by a "module:Class" path.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import importlib
+import io
+import time
+
+from app.services.interfaces import OCREngine
+
+# Regions closer than this many line heights are cropped together.
+CROP_MERGE_LINES = 2
+CROP_PADDING = 6  # pixels
+
+
+class TesseractEngine(OCREngine):
+    """Tesseract through pytesseract, which is only needed for this engine."""
+
+    def __init__(self):
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("The tesseract OCR engine requires the 'pytesseract' package")
+        self._tesseract = pytesseract
+
+    def recognize(self, image: Any) -> List[Dict[str, Any]]:
+        data = self._tesseract.image_to_data(image, output_type=self._tesseract.Output.DICT)
+        lines: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+        for i, text in enumerate(data["text"]):
+            confidence = float(data["conf"][i])
+            if confidence < 0 or not text.strip():
+                continue
+            left, top = data["left"][i], data["top"][i]
+            box = (left, top, left + data["width"][i], top + data["height"][i])
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            line = lines.setdefault(key, {"words": [], "confidence": 1.0, "box": box})
+            line["words"].append(text)
+            line["confidence"] = min(line["confidence"], confidence / 100)
+            line["box"] = _union(line["box"], box)
+        return sorted(
+            (
+                {"text": " ".join(line["words"]), "confidence": line["confidence"], "box": line["box"]}
+                for line in lines.values()
+            ),
+            key=lambda line: (line["box"][1], line["box"][0]),
+        )
+
+
+class BitmapFontEngine(OCREngine):
+    """Pure-Python reader for text in Pillow's built-in bitmap font.
+
+    The font is monospaced, so each text run is cut into fixed cells at the
+    alignment that best fits its first few cells. Each cell is then matched
+    against the rendered glyphs. It reads clean renders such as the
+    synthetic test forms and reports anything else (handwriting, other
+    fonts, scaled scans) as low confidence. It needs no native OCR library.
+    """
+
+    ALIGNMENT_CELLS = 8  # cells scored when choosing a run's alignment
+
+    def __init__(self):
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.load_default_imagefont()
+        left, top, right, bottom = font.getbbox("M")
+        self.cell_width, self.cell_height = right - left, bottom
+        # Some glyphs overhang a column into the cell before them, so only the
+        # first cell_width - 1 columns of a cell hold its own glyph alone.
+        self.match_width = self.cell_width - 1
+        self.glyphs: Dict[int, str] = {}
+        for code in range(33, 127):
+            char = chr(code)
+            # Drawn after a space, so overhangs are not clipped.
+            cell = Image.new("L", (3 * self.cell_width, self.cell_height), 255)
+            ImageDraw.Draw(cell).text((0, 0), f" {char}", font=font, fill=0)
+            glyph = _ink(cell)[:, self.cell_width : self.cell_width + self.match_width]
+            self.glyphs.setdefault(self._mask(glyph), char)
+        self.glyphs[0] = " "
+        self._templates = [(mask, char) for mask, char in self.glyphs.items()]
+
+    def recognize(self, image: Any) -> List[Dict[str, Any]]:
+        ink = _ink(image)
+        lines = []
+        # Bridge the blank row between the dot and stem of i, j, : and the like.
+        for top, bottom in _bands(ink.any(axis=1), gap=3):
+            if bottom - top > self.cell_height:
+                # Taller than a line of text: a drawing or handwriting.
+                columns = ink[top:bottom].any(axis=0).nonzero()[0]
+                box = (int(columns[0]), top, int(columns[-1]) + 1, bottom)
+                lines.append({"text": "", "confidence": 0.0, "box": box})
+                continue
+            lines.append(self._read_line(ink, top, bottom))
+        return lines
+
+    def _read_line(self, ink, top: int, bottom: int) -> Dict[str, Any]:
+        band_top = max(0, bottom - self.cell_height)
+        columns = ink[band_top : band_top + self.cell_height].any(axis=0)
+        runs = _bands(columns, gap=2 * self.cell_width)
+        text, confidence, previous_end = "", 1.0, None
+        for start, end in runs:
+            if previous_end is not None:
+                text += " " * max(1, round((start - previous_end) / self.cell_width))
+            run_text, run_confidence = self._read_run(ink, band_top, top, start, end)
+            text += run_text
+            confidence = min(confidence, run_confidence)
+            previous_end = end
+        box = (runs[0][0], top, runs[-1][1], bottom)
+        return {"text": text.strip(), "confidence": confidence, "box": box}
+
+    def _read_run(self, ink, band_top: int, top: int, start: int, end: int) -> Tuple[str, float]:
+        # The cell top lies between the band's lowest possible start and its
+        # first inked row; the run starts up to a cell left of its first ink.
+        best = None
+        for cell_top in range(max(0, band_top - 1), top + 1):
+            for shift in range(self.cell_width):
+                cells = self._cells(ink, cell_top, start - shift, end, self.ALIGNMENT_CELLS)
+                score = sum(distance for _, _, distance in cells)
+                if best is None or score < best[0]:
+                    best = (score, cell_top, start - shift)
+        _, cell_top, left = best
+        cells = self._cells(ink, cell_top, left, end)
+        text = "".join(char for char, _, _ in cells)
+        confidence = min(confidence for _, confidence, _ in cells)
+        return text, confidence
+
+    def _cells(self, ink, top: int, left: int, end: int, limit: Optional[int] = None):
+        cells = []
+        x = left
+        while x < end and (limit is None or len(cells) < limit):
+            cell = ink[top : top + self.cell_height, max(0, x) : x + self.match_width]
+            if x < 0 or cell.shape != (self.cell_height, self.match_width):
+                cell = _pad(cell, self.cell_height, self.match_width, right=x >= 0)
+            cells.append(self._match(self._mask(cell)))
+            x += self.cell_width
+        return cells
+
+    def _match(self, mask: int) -> Tuple[str, float, int]:
+        char = self.glyphs.get(mask)
+        if char is not None:
+            return char, 1.0, 0
+        template, char = min(self._templates, key=lambda t: (mask ^ t[0]).bit_count())
+        distance = (mask ^ template).bit_count()
+        return char, 1.0 - distance / max(1, (mask | template).bit_count()), distance
+
+    @staticmethod
+    def _mask(cell) -> int:
+        import numpy as np
+
+        return int.from_bytes(np.packbits(cell.ravel()).tobytes(), "big")
+
+
+OCR_ENGINES = {"tesseract": TesseractEngine, "bitmap": BitmapFontEngine}
+_engines: Dict[str, OCREngine] = {}
+
+
+def get_engine(name: str) -> OCREngine:
+    """Return this process's instance of the named engine ("module:Class" also works)."""
+    engine = _engines.get(name)
+    if engine is None:
+        if name in OCR_ENGINES:
+            engine_class = OCR_ENGINES[name]
+        elif ":" in name:
+            module, _, attribute = name.partition(":")
+            engine_class = getattr(importlib.import_module(module), attribute)
+        else:
+            raise ValueError(f"Unknown OCR engine: {name}")
+        engine = _engines[name] = engine_class()
+    return engine
+
+
+def analyze_page(
+    image_b64: str,
+    engine_name: str,
+    min_confidence: float,
+    min_readable: float,
+    max_crop_area: float,
+) -> Dict[str, Any]:
+    """OCR one page image and choose its route (runs in a worker process).
+
+    Returns {"route": "text" or "vision", "text", "lines", "readable",
+    "crops", "ms"}. lines holds the (text, confidence) of readable lines.
+    text has them in page order with a [crop N] marker where each crop was
+    taken. crops are {"image", "size"} JPEGs of the unreadable regions.
+    """
+    from PIL import Image
+
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(base64.b64decode(image_b64)))
+    image.load()
+    lines = get_engine(engine_name).recognize(image)
+
+    readable = [line for line in lines if line["confidence"] >= min_confidence]
+    share = len(readable) / len(lines) if lines else 0.0
+    width, height = image.size
+    regions = _crop_regions(
+        [line["box"] for line in lines if line["confidence"] < min_confidence],
+        CROP_MERGE_LINES * _line_height(lines),
+        image.size,
+    )
+    crop_area = sum((r - l) * (b - t) for l, t, r, b in regions)
+    route = "text" if share >= min_readable and crop_area <= max_crop_area * width * height else "vision"
+
+    result = {
+        "route": route,
+        "text": "",
+        "lines": [(line["text"], line["confidence"]) for line in readable],
+        "readable": round(share, 3),
+        "crops": [],
+    }
+    if route == "text":
+        parts = []
+        regions_left = list(regions)
+        for line in lines:
+            if line["confidence"] >= min_confidence:
+                parts.append(line["text"])
+            elif regions_left and _contains(regions_left[0], line["box"]):
+                parts.append(f"[crop {len(result['crops']) + 1}]")
+                result["crops"].append(_encode_crop(image, regions_left.pop(0)))
+        result["text"] = "\n".join(parts)
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _ink(image):
+    """Boolean array of dark pixels."""
+    import numpy as np
+
+    return np.asarray(image.convert("L")) < 128
+
+
+def _bands(flags, gap: int = 1) -> List[Tuple[int, int]]:
+    """(start, end) of the runs of True in flags, bridging gaps shorter than gap."""
+    bands: List[Tuple[int, int]] = []
+    for index in flags.nonzero()[0]:
+        index = int(index)
+        if bands and index - bands[-1][1] < gap:
+            bands[-1] = (bands[-1][0], index + 1)
+        else:
+            bands.append((index, index + 1))
+    return bands
+
+
+def _pad(cell, height: int, width: int, right: bool):
+    import numpy as np
+
+    padded = np.zeros((height, width), dtype=bool)
+    rows, columns = cell.shape
+    if right:
+        padded[:rows, :columns] = cell
+    else:
+        padded[:rows, width - columns :] = cell
+    return padded
+
+
+def _union(a: Tuple[int, ...], b: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _contains(outer: Tuple[int, ...], inner: Tuple[int, ...]) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _line_height(lines: List[Dict[str, Any]]) -> int:
+    heights = sorted(line["box"][3] - line["box"][1] for line in lines)
+    return heights[len(heights) // 2] if heights else 0
+
+
+def _crop_regions(
+    boxes: List[Tuple[int, ...]], merge_gap: int, size: Tuple[int, int]
+) -> List[Tuple[int, int, int, int]]:
+    """Merge the boxes of unreadable lines that lie close together, padded."""
+    regions: List[Tuple[int, int, int, int]] = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        padded = (box[0] - CROP_PADDING, box[1] - CROP_PADDING, box[2] + CROP_PADDING, box[3] + CROP_PADDING)
+        if regions and padded[1] - regions[-1][3] <= merge_gap:
+            regions[-1] = _union(regions[-1], padded)
+        else:
+            regions.append(tuple(padded))
+    width, height = size
+    return [(max(0, l), max(0, t), min(width, r), min(height, b)) for l, t, r, b in regions]
+
+
+def _encode_crop(image, region: Tuple[int, int, int, int]) -> Dict[str, Any]:
+    crop = image.crop(region)
+    if crop.mode not in ("L", "RGB"):
+        crop = crop.convert("RGB")
+    buffer = io.BytesIO()
+    crop.save(buffer, format="JPEG", quality=85)
+    return {
+        "image": base64.b64encode(buffer.getvalue()).decode("ascii"),
+        "size": f"{crop.size[0]}x{crop.size[1]}",
+    }
@@ -0,0 +1,223 @@
+"""OCR pre-pass that skips or shrinks vision calls for typed forms.
+
+Each page is read locally (see app/services/ocr.py) in the process pool.
+"Label: value" lines matching FIELD_RULES fill FieldData directly; codes
+must also match their format (CPT, ICD-10, policy and member numbers).
+What reaches the model depends on how much could be read:
+
+  rules   every field was found and every page read cleanly: no model call
+  text    readable pages are sent as OCR text plus crops of what was not
+          readable; other pages as images
+  vision  nothing was readable: the images are sent as before
+
+Fields found by the rules are merged into the model's answer, replacing
+model values that are missing or less confident.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import re
+
+from app.core.config import settings
+from app.core.metrics import EXTRACTION_STAGE_SECONDS, OCR_PREPASS_ROUTES
+from app.models.response import FieldData, FormExtractionResponse
+from app.services.extraction_prompt import SECTION_FIELDS
+from app.services.interfaces import AIModelProcessor
+from app.services.ocr import analyze_page
+from app.services.parallel_extraction import DICT_SECTIONS, merge_field_data
+from app.services.worker_pool import run_in_process
+
+CPT_PATTERN = r"\d{4}[0-9FTU]"
+ICD10_PATTERN = r"[A-TV-Z]\d[0-9A-Z](?:\.[0-9A-Z]{1,4})?"
+IDENTIFIER_PATTERN = r"[A-Z0-9][A-Z0-9-]{3,24}"
+
+# (section, key, label, value format or None for free text), tried in order
+# on each "Label: value" line. medical_justification has no key.
+FIELD_RULES = (
+    ("patient_info", "name", r"patient(?:'s)?\s+name", None),
+    ("patient_info", "id", r"(?:member|patient|subscriber)\s+id", IDENTIFIER_PATTERN),
+    ("procedure_info", "code", r"cpt(?:\s+code)?|procedure\s+code", CPT_PATTERN),
+    ("procedure_info", "description", r"procedure(?:\s+description)?", None),
+    (
+        "diagnosis_info",
+        "primary_diagnosis",
+        r"icd-?10(?:\s+code)?|diagnosis(?:\s+code)?|primary\s+diagnosis",
+        ICD10_PATTERN,
+    ),
+    ("diagnosis_info", "symptoms", r"symptoms", None),
+    ("diagnosis_info", "affected_area", r"affected\s+area", None),
+    ("insurance_info", "provider", r"insurance(?:\s+provider)?|payer", None),
+    ("insurance_info", "policy_number", r"policy\s+(?:number|no\.?|#)", IDENTIFIER_PATTERN),
+    ("medical_justification", None, r"(?:medical|clinical)\s+justification", None),
+)
+
+_RULES = [
+    (
+        section,
+        key,
+        re.compile(rf"^\s*(?:{label})\s*:\s*(.*?)\s*$", re.IGNORECASE),
+        re.compile(value_format) if value_format else None,
+    )
+    for section, key, label, value_format in FIELD_RULES
+]
+
+FieldKey = Tuple[str, Optional[str]]
+
+
+def extract_fields(
+    pages: List[Tuple[str, List[Tuple[str, float]]]]
+) -> Dict[FieldKey, FieldData]:
+    """Fill FieldData from the (source, [(line, confidence)]) of each page.
+
+    A labelled line with no value counts as a field found to be missing.
+    Where a field appears twice, the more confident line wins.
+    """
+    fields: Dict[FieldKey, FieldData] = {}
+    for source, lines in pages:
+        for text, confidence in lines:
+            for section, key, label, value_format in _RULES:
+                match = label.match(text)
+                if not match:
+                    continue
+                value = match.group(1) or None
+                if value is not None and value_format is not None:
+                    value = value.upper().replace(" ", "")
+                    if not value_format.fullmatch(value):
+                        continue
+                field = FieldData(
+                    value=value,
+                    confidence=round(confidence, 3),
+                    is_missing=value is None,
+                    source_file=source,
+                )
+                current = fields.get((section, key))
+                if current is None or field.confidence > current.confidence:
+                    fields[(section, key)] = field
+                break
+    return fields
+
+
+def _missing(source: str) -> FieldData:
+    return FieldData(value=None, confidence=0.0, is_missing=True, source_file=source)
+
+
+def build_rules_response(
+    fields: Dict[FieldKey, FieldData], metadata: Dict[str, Any]
+) -> FormExtractionResponse:
+    """Build the whole response from rule fields (all are expected to be present)."""
+    return FormExtractionResponse(
+        **{
+            section: {key: fields.get((section, key), _missing("")) for key in keys}
+            for section, keys in SECTION_FIELDS.items()
+        },
+        medical_justification=fields.get(("medical_justification", None), _missing("")),
+        processing_metadata=metadata,
+    )
+
+
+def merge_rule_fields(
+    response: FormExtractionResponse, fields: Dict[FieldKey, FieldData]
+) -> FormExtractionResponse:
+    """Replace model fields that are missing or less confident than the rule's."""
+    for (section, key), field in fields.items():
+        if section == "medical_justification":
+            response.medical_justification = merge_field_data(
+                [response.medical_justification, field]
+            )
+        elif section in DICT_SECTIONS:
+            values = getattr(response, section)
+            current = values.get(key)
+            values[key] = field if current is None else merge_field_data([current, field])
+    return response
+
+
+class OcrPrepassProcessor(AIModelProcessor):
+    """Reads typed pages locally before, or instead of, calling the model."""
+
+    def __init__(self, processor: AIModelProcessor, engine: Optional[str] = None):
+        self.processor = processor
+        self.engine = engine or settings.OCR_ENGINE
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", "")
+
+    @property
+    def prompt_version(self) -> str:
+        # The engine and thresholds decide which pages the rules answer.
+        return (
+            f"{getattr(self.processor, 'prompt_version', '')}+ocr:{self.engine}"
+            f":{settings.OCR_MIN_CONFIDENCE}:{settings.OCR_MIN_READABLE}"
+            f":{settings.OCR_MAX_CROP_AREA}"
+        )
+
+    async def _analyze(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if item["type"] != "image":
+            return None
+        return await run_in_process(
+            analyze_page,
+            item["image"],
+            self.engine,
+            settings.OCR_MIN_CONFIDENCE,
+            settings.OCR_MIN_READABLE,
+            settings.OCR_MAX_CROP_AREA,
+        )
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        with EXTRACTION_STAGE_SECONDS.labels("ocr").time():
+            pages = await asyncio.gather(*(self._analyze(item) for item in content))
+        fields = extract_fields(
+            [
+                (item["source"], page["lines"])
+                for item, page in zip(content, pages)
+                if page is not None
+            ]
+        )
+        text_pages = [page for page in pages if page is not None and page["route"] == "text"]
+        ocr = {
+            "engine": self.engine,
+            "text_pages": len(text_pages),
+            "crops": sum(len(page["crops"]) for page in text_pages),
+            "rule_fields": len(fields),
+            "ms": round(sum(page["ms"] for page in pages if page is not None), 1),
+        }
+
+        # Notes from the requester can change the answer, so they always go to the model.
+        if (
+            len(text_pages) == len(content)
+            and not ocr["crops"]
+            and not additional_context
+            and all((section, key) in fields for section, key, _, _ in FIELD_RULES)
+        ):
+            ocr["route"] = "rules"
+            OCR_PREPASS_ROUTES.labels("rules").inc()
+            return build_rules_response(
+                fields,
+                {
+                    "model": f"ocr:{self.engine}",
+                    "total_tokens": 0,
+                    "completion_tokens": 0,
+                    "prompt_tokens": 0,
+                    "cached_tokens": 0,
+                    "ocr": ocr,
+                },
+            )
+
+        ocr["route"] = "text" if text_pages else "vision"
+        OCR_PREPASS_ROUTES.labels(ocr["route"]).inc()
+        model_content = [
+            item
+            if page is None or page["route"] != "text"
+            else {
+                "type": "text",
+                "text": page["text"],
+                "source": item["source"],
+                "crops": page["crops"],
+            }
+            for item, page in zip(content, pages)
+        ]
+        response = await self.processor.process_content(model_content, additional_context)
+        response = merge_rule_fields(response, fields)
+        response.processing_metadata["ocr"] = ocr
+        return response
@@ -0,0 +1,135 @@
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import json
+import logging
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAIAPIError(Exception):
+    """Raised when the OpenAI API returns a non-success response."""
+
+    def __init__(
+        self, status_code: int, message: str, retry_after: Optional[float] = None
+    ):
+        super().__init__(f"OpenAI API error {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AsyncOpenAIClient:
+    """Thin async client for the OpenAI REST API on a pooled httpx client."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key if api_key is not None else settings.OPENAI_API_KEY
+        self.base_url = (base_url or settings.OPENAI_API_BASE).rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+            timeout=httpx.Timeout(
+                timeout or settings.OPENAI_TIMEOUT,
+                connect=settings.OPENAI_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            transport=transport,
+        )
+
+    async def chat_completion(
+        self, payload: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """POST a chat completion request and return the decoded JSON body."""
+        request_timeout = (
+            httpx.Timeout(timeout, connect=settings.OPENAI_CONNECT_TIMEOUT)
+            if timeout
+            else httpx.USE_CLIENT_DEFAULT
+        )
+        response = await self._client.post(
+            "/chat/completions", json=payload, timeout=request_timeout
+        )
+        if response.status_code >= 400:
+            raise OpenAIAPIError(
+                response.status_code,
+                response.text,
+                retry_after=_parse_retry_after(response.headers.get("retry-after")),
+            )
+        return response.json()
+
+    async def stream_chat_completion(
+        self, payload: Dict[str, Any], timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming chat completion request and yield each decoded chunk."""
+        request_timeout = (
+            httpx.Timeout(timeout, connect=settings.OPENAI_CONNECT_TIMEOUT)
+            if timeout
+            else httpx.USE_CLIENT_DEFAULT
+        )
+        async with self._client.stream(
+            "POST",
+            "/chat/completions",
+            json={**payload, "stream": True},
+            timeout=request_timeout,
+        ) as response:
+            if response.status_code >= 400:
+                body = await response.aread()
+                raise OpenAIAPIError(
+                    response.status_code,
+                    body.decode("utf-8", "replace"),
+                    retry_after=_parse_retry_after(response.headers.get("retry-after")),
+                )
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                yield json.loads(data)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+_client: Optional[AsyncOpenAIClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_openai_client() -> AsyncOpenAIClient:
+    """Return the shared client for the running event loop.
+
+    Pooled connections are bound to the loop that opened them, so a new
+    client is created if the loop changes (e.g. between test clients).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = AsyncOpenAIClient()
+        _client_loop = loop
+    return _client
+
+
+async def close_openai_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
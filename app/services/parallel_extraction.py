@@ -0,0 +1,135 @@
+from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.models.response import FormExtractionResponse, FieldData
+from app.services.interfaces import AIModelProcessor
+
+logger = logging.getLogger(__name__)
+
+DICT_SECTIONS = ("patient_info", "procedure_info", "diagnosis_info", "insurance_info")
+SUMMED_METADATA = ("total_tokens", "completion_tokens", "prompt_tokens", "cached_tokens")
+
+
+def source_document(item: Dict[str, Any]) -> str:
+    """Return the uploaded file an item came from ("chart.pdf#p3" -> "chart.pdf")."""
+    return str(item.get("source", "")).split("#", 1)[0]
+
+
+def chunk_content(
+    content: List[Dict[str, Any]], chunk_size: int
+) -> List[List[Dict[str, Any]]]:
+    """Group items by source document, splitting long documents into page chunks."""
+    documents: Dict[str, List[Dict[str, Any]]] = {}
+    for item in content:
+        documents.setdefault(source_document(item), []).append(item)
+    return [
+        items[start : start + chunk_size]
+        for items in documents.values()
+        for start in range(0, len(items), chunk_size)
+    ]
+
+
+def _better(candidate: FieldData, current: Optional[FieldData]) -> bool:
+    if current is None:
+        return True
+    if current.is_missing != candidate.is_missing:
+        return current.is_missing
+    return candidate.confidence > current.confidence
+
+
+def merge_field_data(fields: List[FieldData]) -> FieldData:
+    """Pick the found value with the highest confidence, keeping its source_file."""
+    best = None
+    for field in fields:
+        if _better(field, best):
+            best = field
+    return best
+
+
+def merge_extractions(responses: List[FormExtractionResponse]) -> FormExtractionResponse:
+    """Combine per-chunk extractions field by field."""
+    sections = {}
+    for section in DICT_SECTIONS:
+        candidates: Dict[str, List[FieldData]] = {}
+        for response in responses:
+            for key, field in getattr(response, section).items():
+                candidates.setdefault(key, []).append(field)
+        sections[section] = {
+            key: merge_field_data(fields) for key, fields in candidates.items()
+        }
+
+    metadata: Dict[str, Any] = dict(responses[0].processing_metadata)
+    for key in SUMMED_METADATA:
+        metadata[key] = sum(r.processing_metadata.get(key, 0) for r in responses)
+    if any(r.processing_metadata.get("degraded") for r in responses):
+        metadata["degraded"] = True
+
+    return FormExtractionResponse(
+        medical_justification=merge_field_data(
+            [r.medical_justification for r in responses]
+        ),
+        processing_metadata=metadata,
+        **sections,
+    )
+
+
+class ParallelExtractionProcessor(AIModelProcessor):
+    """Fans extraction out per document or page chunk and merges the results."""
+
+    def __init__(
+        self,
+        processor: AIModelProcessor,
+        chunk_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.processor = processor
+        self.chunk_size = chunk_size or settings.EXTRACTION_CHUNK_SIZE
+        self.max_concurrency = max_concurrency or settings.EXTRACTION_MAX_CONCURRENCY
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", "")
+
+    @property
+    def prompt_version(self) -> str:
+        # Chunks are extracted separately, so the chunk size changes the answer.
+        return f"{getattr(self.processor, 'prompt_version', '')}+chunks:{self.chunk_size}"
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        chunks = chunk_content(content, self.chunk_size)
+        if len(chunks) <= 1:
+            return await self.processor.process_content(content, additional_context)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def extract(chunk: List[Dict[str, Any]]) -> FormExtractionResponse:
+            async with semaphore:
+                return await self.processor.process_content(chunk, additional_context)
+
+        results = await asyncio.gather(
+            *(extract(chunk) for chunk in chunks), return_exceptions=True
+        )
+        responses = [r for r in results if isinstance(r, FormExtractionResponse)]
+        failures = [r for r in results if isinstance(r, BaseException)]
+        for failure in failures:
+            logger.warning(f"Extraction chunk failed: {str(failure)}")
+        if not responses:
+            raise failures[0]
+
+        merged = merge_extractions(responses)
+        merged.processing_metadata["chunks"] = len(chunks)
+        merged.processing_metadata["failed_chunks"] = len(failures)
+        if failures:
+            # Fields on the failed pages are missing because they were never read.
+            merged.processing_metadata["status"] = "partial"
+            merged.processing_metadata["missing_sources"] = [
+                item["source"]
+                for chunk, result in zip(chunks, results)
+                if isinstance(result, BaseException)
+                for item in chunk
+            ]
+        return merged
@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import io
+import time
+
+from app.services.image_preprocessor import normalize_image
+from app.services.worker_pool import run_in_process
+
+
+def count_pdf_pages(path: str) -> int:
+    """Return the number of pages in a PDF (runs in a worker process)."""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def render_pdf_page(
+    path: str, page_index: int, dpi: int, preprocess: Optional[Tuple[int, str, int, int]] = None
+) -> Tuple[bytes, str, Optional[Dict[str, Any]]]:
+    """Rasterize one PDF page (runs in a worker process).
+
+    Returns (bytes, mime_type, stats). With preprocess, the
+    (max_edge, output_format, quality, grayscale_saturation) of
+    normalize_image, the rendered bitmap is normalized and encoded once
+    and stats are its preprocessing stats (bytes_in is the bitmap size).
+    Otherwise the page is a JPEG and stats is None.
+    """
+    import pypdfium2 as pdfium
+
+    started = time.perf_counter()
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page = pdf[page_index]
+        image = page.render(scale=dpi / 72).to_pil()
+        page.close()
+    finally:
+        pdf.close()
+
+    if preprocess is not None:
+        bytes_in = image.size[0] * image.size[1] * len(image.getbands())
+        return normalize_image(image, bytes_in, started, *preprocess)
+
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue(), "image/jpeg", None
+
+
+async def iter_pdf_pages(
+    path: str,
+    dpi: int,
+    page_count: int,
+    prefetch: int,
+    preprocess: Optional[Tuple[int, str, int, int]] = None,
+) -> AsyncIterator[Tuple[int, Tuple[bytes, str, Optional[Dict[str, Any]]]]]:
+    """Yield (page_number, render_pdf_page result) in order.
+
+    At most prefetch pages are rendered ahead of the consumer.
+    """
+    pending = deque()
+    next_index = 0
+    try:
+        while next_index < page_count or pending:
+            while next_index < page_count and len(pending) < prefetch:
+                pending.append(
+                    asyncio.ensure_future(
+                        run_in_process(render_pdf_page, path, next_index, dpi, preprocess)
+                    )
+                )
+                next_index += 1
+            page_number = next_index - len(pending) + 1
+            yield page_number, await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
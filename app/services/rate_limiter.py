@@ -0,0 +1,401 @@
+"""Client-side rate limiting and retries for model calls.
+
+OpenAI enforces requests-per-minute and tokens-per-minute limits per
+account; going over them costs a 429 and a retry-after wait, during which
+every other request is rejected too. ModelCallScheduler keeps calls within
+both budgets with token buckets, estimating a call's token cost before it
+is sent and charging any reported usage beyond the estimate afterwards.
+Callers waiting for budget are served by priority (Emergency before Urgent
+before Standard), first come first served within a priority.
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import random
+import time
+
+from app.core.config import settings
+from app.core.metrics import MODEL_CALLS_QUEUED, MODEL_QUEUE_WAIT_SECONDS, OPENAI_RETRIES
+from app.models.response import FormExtractionResponse
+from app.services.interfaces import AIModelProcessor
+from app.services.openai_client import OpenAIAPIError
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_RANKS = {"Emergency": 0, "Urgent": 1, "Standard": 2}
+DEFAULT_PRIORITY = "Standard"
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Vision input is billed per 512px tile after the image is scaled to fit
+# 2048x2048 and then to a shortest side of 768px.
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+# The most tiles an image can cover after scaling (768x2048, 2x4 tiles);
+# used when an item carries no size.
+UNKNOWN_IMAGE_TOKENS = IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * 8
+CHARS_PER_TOKEN = 4
+
+
+def image_tokens(width: int, height: int) -> int:
+    """Estimate the input tokens for one image sent at high detail."""
+    if max(width, height) > 2048:
+        scale = 2048 / max(width, height)
+        width, height = width * scale, height * scale
+    if min(width, height) > 768:
+        scale = 768 / min(width, height)
+        width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+
+def _item_image_tokens(item: Dict[str, Any]) -> int:
+    return _size_tokens((item.get("preprocess") or {}).get("output_size", ""))
+
+
+def _size_tokens(size: str) -> int:
+    try:
+        width, height = (int(part) for part in size.split("x"))
+    except ValueError:
+        return UNKNOWN_IMAGE_TOKENS
+    return image_tokens(width, height)
+
+
+def estimate_tokens(
+    content: List[Dict[str, Any]], prompt: str = "", max_tokens: int = 0
+) -> int:
+    """Estimate what a call counts against the TPM limit.
+
+    OpenAI counts the prompt plus max_tokens when a request is admitted,
+    so the completion budget is included in full. Image sizes come from
+    the preprocessing stats of each item, or of each OCR crop.
+    """
+    text_chars = len(prompt)
+    tokens = max_tokens
+    for item in content:
+        if item["type"] == "image":
+            text_chars += len("Source file: ") + len(str(item.get("source", "")))
+            tokens += _item_image_tokens(item)
+        elif item["type"] == "text":
+            text_chars += len("Source file:  (OCR text)\n") + len(str(item.get("source", "")))
+            text_chars += len(item["text"])
+            tokens += sum(_size_tokens(crop["size"]) for crop in item.get("crops", ()))
+    return tokens + math.ceil(text_chars / CHARS_PER_TOKEN)
+
+
+def estimate_call_tokens(
+    processor: AIModelProcessor, content: List[Dict[str, Any]], additional_context: str = None
+) -> int:
+    """estimate_tokens for one GPTVisionProcessor call."""
+    prompt = processor.system_prompt + (additional_context or "")
+    return estimate_tokens(content, prompt, processor.max_tokens)
+
+
+def normalize_priority(priority: Optional[str]) -> str:
+    """Map unknown or missing priorities to Standard."""
+    return priority if priority in PRIORITY_RANKS else DEFAULT_PRIORITY
+
+
+class TokenBucket:
+    """Refills at `rate` per second up to `capacity`.
+
+    The level may go negative when a charge exceeds what is left (a late
+    usage correction, or a call larger than the bucket); later callers then
+    wait for it to refill.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (capped at a full bucket)."""
+        self._refill()
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ModelCallScheduler:
+    """Admits model calls within RPM and TPM budgets, highest priority first.
+
+    Limits are per `period` seconds (a minute for OpenAI's RPM and TPM)
+    and a zero limit disables that budget. Buckets hold `burst` seconds of
+    budget and refill with the rest of the limit over the period, so no
+    window of that length admits more than the limit. Waiters are released
+    by a timer set for when the head of the queue can next be admitted;
+    lower priorities queue behind it.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        burst: Optional[float] = None,
+        period: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        rpm = settings.OPENAI_RPM_LIMIT if rpm is None else rpm
+        tpm = settings.OPENAI_TPM_LIMIT if tpm is None else tpm
+        burst = settings.OPENAI_RATE_BURST if burst is None else burst
+        self.requests = self._bucket(rpm, burst, period, clock, minimum=1.0) if rpm else None
+        self.tokens = self._bucket(tpm, burst, period, clock) if tpm else None
+        self._clock = clock
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @staticmethod
+    def _bucket(
+        limit: int,
+        burst: float,
+        period: float,
+        clock: Callable[[], float],
+        minimum: float = 0.0,
+    ) -> TokenBucket:
+        capacity = max(minimum, limit * burst / period)
+        # Bursts over half the period would leave too little to refill with.
+        refill = max(limit - capacity, limit / 2)
+        return TokenBucket(refill / period, capacity, clock)
+
+    def _wait_time(self, cost: int) -> float:
+        wait = self._paused_until - self._clock()
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(cost))
+        return wait
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():  # cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._wait_time(cost)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(cost)
+            future.set_result(None)
+
+    async def acquire(self, cost: int, priority: str = DEFAULT_PRIORITY) -> None:
+        """Wait until a call estimated at `cost` tokens fits the budgets."""
+        priority = normalize_priority(priority)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters, (PRIORITY_RANKS[priority], next(self._sequence), cost, future)
+        )
+        started = time.perf_counter()
+        MODEL_CALLS_QUEUED.inc()
+        try:
+            self._dispatch()
+            await future
+        finally:
+            MODEL_CALLS_QUEUED.dec()
+            MODEL_QUEUE_WAIT_SECONDS.labels(priority).observe(time.perf_counter() - started)
+            if future.cancelled():
+                self._dispatch()
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token budget once a call's real usage is known.
+
+        A rejected call (actual 0) is refunded in full. Usage above the
+        estimate is charged; usage below it is not refunded, because the API
+        charged the prompt plus max_tokens when it admitted the call.
+        """
+        if self.tokens is None:
+            return
+        if actual == 0:
+            self.tokens.give(estimated)
+            self._dispatch()
+        elif actual > estimated:
+            self.tokens.take(actual - estimated)
+
+    def pause(self, seconds: float) -> None:
+        """Admit nothing for `seconds`, e.g. after the API answered 429."""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+        self._dispatch()
+
+
+_scheduler: Optional[ModelCallScheduler] = None
+_scheduler_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_model_scheduler() -> ModelCallScheduler:
+    """Return the shared scheduler for the running event loop.
+
+    Its timers and futures belong to one loop, so a new scheduler is
+    created if the loop changes (e.g. between test clients).
+    """
+    global _scheduler, _scheduler_loop
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        _scheduler = ModelCallScheduler()
+        _scheduler_loop = loop
+    return _scheduler
+
+
+def retry_delay(error: OpenAIAPIError, attempt: int) -> float:
+    """Honour retry-after; otherwise exponential backoff with full jitter."""
+    if error.retry_after is not None:
+        delay = error.retry_after
+    else:
+        delay = random.uniform(0, settings.OPENAI_RETRY_BACKOFF * 2**attempt)
+    return min(delay, settings.OPENAI_RETRY_MAX_WAIT)
+
+
+# Scheduler and priority of the RateLimitedProcessor call running in this
+# context, for the follow-up calls a processor makes on its own.
+_current_call: ContextVar[Optional[Tuple[ModelCallScheduler, str]]] = ContextVar(
+    "current_model_call", default=None
+)
+
+
+class FollowUpCall:
+    """Admits an extra model call made within a rate-limited call.
+
+    A processor that calls the model again on its own (e.g. to ask for
+    missing sections) wraps that call in `async with FollowUpCall(cost) as
+    call:` and reports the tokens used with call.used(). The call then
+    waits for budget like any other, at the same priority; outside a
+    RateLimitedProcessor it is not limited. Failures are settled as in
+    RateLimitedProcessor, but not retried.
+    """
+
+    def __init__(self, cost: int):
+        self.cost = cost
+        self.tokens: Optional[int] = None
+        self._admission: Optional[Tuple[ModelCallScheduler, str]] = None
+
+    def used(self, tokens: Optional[int]) -> None:
+        self.tokens = tokens
+
+    async def __aenter__(self) -> "FollowUpCall":
+        self._admission = _current_call.get()
+        if self._admission is not None:
+            scheduler, priority = self._admission
+            await scheduler.acquire(self.cost, priority)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if self._admission is None:
+            return False
+        scheduler, _ = self._admission
+        if exc is None:
+            scheduler.settle(self.cost, self.tokens or self.cost)
+        elif isinstance(exc, OpenAIAPIError):
+            scheduler.settle(self.cost, 0)
+            if exc.status_code == 429:
+                scheduler.pause(retry_delay(exc, 0))
+        return False
+
+
+class RateLimitedProcessor(AIModelProcessor):
+    """Schedules each call to the wrapped GPTVisionProcessor and retries 429/5xx.
+
+    A 429 pauses the whole scheduler for the retry-after, since the limit it
+    reports is shared by every call from this process. Follow-up calls the
+    processor makes are admitted through FollowUpCall. call_seconds is the
+    duration of the attempt that answered, without queueing or backoff.
+    """
+
+    def __init__(
+        self,
+        processor: AIModelProcessor,
+        priority: str = DEFAULT_PRIORITY,
+        scheduler: Optional[ModelCallScheduler] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.processor = processor
+        self.priority = priority
+        self._scheduler = scheduler
+        self.max_retries = settings.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        self.call_seconds: Optional[float] = None
+
+    @property
+    def scheduler(self) -> ModelCallScheduler:
+        return self._scheduler or get_model_scheduler()
+
+    @property
+    def model(self) -> str:
+        return getattr(self.processor, "model", "")
+
+    @property
+    def prompt_version(self) -> str:
+        return getattr(self.processor, "prompt_version", "")
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        scheduler = self.scheduler
+        cost = estimate_call_tokens(self.processor, content, additional_context)
+        admission = _current_call.set((scheduler, self.priority))
+        try:
+            return await self._call(scheduler, cost, content, additional_context)
+        finally:
+            _current_call.reset(admission)
+
+    async def _call(
+        self,
+        scheduler: ModelCallScheduler,
+        cost: int,
+        content: List[Dict[str, Any]],
+        additional_context: Optional[str],
+    ) -> FormExtractionResponse:
+        attempt = 0
+        while True:
+            await scheduler.acquire(cost, self.priority)
+            started = time.perf_counter()
+            try:
+                response = await self.processor.process_content(content, additional_context)
+            except OpenAIAPIError as e:
+                # Rejected calls are not billed against the limit.
+                scheduler.settle(cost, 0)
+                if e.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    raise
+                delay = retry_delay(e, attempt)
+                attempt += 1
+                OPENAI_RETRIES.labels(str(e.status_code)).inc()
+                logger.warning(
+                    f"OpenAI returned {e.status_code}; retry {attempt} in {delay:.1f}s"
+                )
+                if e.status_code == 429:
+                    scheduler.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            self.call_seconds = time.perf_counter() - started
+            scheduler.settle(cost, response.processing_metadata.get("total_tokens") or cost)
+            return response
@@ -0,0 +1,44 @@
+from typing import Any, Dict, List
+import asyncio
+
+from app.models.response import FieldData, FormExtractionResponse
+from app.services.extraction_prompt import PROMPT_VERSION, SECTION_FIELDS
+from app.services.interfaces import AIModelProcessor
+
+
+class StubProcessor(AIModelProcessor):
+    """A local model backend that answers every call the same way.
+
+    It reports every field as missing, after a fixed latency, without
+    leaving the process. It is meant for tests and local runs. Its answers
+    are marked processing_metadata.degraded, so they are never cached and
+    clients can tell them from a real extraction.
+    """
+
+    def __init__(self, latency: float = 0.0, model: str = "stub"):
+        self.latency = latency
+        self.model = model
+        self.prompt_version = PROMPT_VERSION
+
+    async def process_content(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> FormExtractionResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        source = content[0].get("source", "") if content else ""
+        missing = FieldData(value=None, confidence=0.0, is_missing=True, source_file=source)
+        sections = {
+            name: {key: missing for key in keys} for name, keys in SECTION_FIELDS.items()
+        }
+        return FormExtractionResponse(
+            **sections,
+            medical_justification=missing,
+            processing_metadata={
+                "model": self.model,
+                "total_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "degraded": True,
+            },
+        )
@@ -0,0 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import multiprocessing
+
+from app.core.config import settings
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared pool for CPU-bound work kept off the event loop."""
+    global _executor
+    if _executor is None:
+        # Forking a process that already runs threads (uvicorn, httpx) is unsafe.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.WORKER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def run_in_process(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a picklable function in the process pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), fn, *args)
+
+
+def shutdown_process_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
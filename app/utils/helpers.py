@@ -0,0 +1,37 @@
+from typing import Optional
+import hashlib
+
+# Leading bytes of the file formats we accept, checked in order.
+MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+# Enough leading bytes to recognise every format above, including WebP.
+MAGIC_BYTES_LENGTH = 12
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """Detect a file's MIME type from its leading bytes."""
+    for magic, mime_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
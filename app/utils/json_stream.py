@@ -0,0 +1,111 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+
+class IncrementalObjectParser:
+    """Emits top-level members of a JSON object as soon as each value is complete.
+
+    Feed it model output as it streams in; text before the opening brace
+    (prose, a code fence) is ignored. With skip_invalid, members whose
+    value is not valid JSON are counted in `skipped` instead of raising.
+    """
+
+    def __init__(self, skip_invalid: bool = False):
+        self.skip_invalid = skip_invalid
+        self.skipped = 0
+        self._text = ""
+        self._position = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume more text and return the (key, value) pairs completed by it."""
+        self._text += chunk
+        text = self._text
+        completed = []
+        while self._position < len(text) and not self.finished:
+            char = text[self._position]
+            if self._start is None:
+                if char == "{":
+                    self._start = self._position
+                    self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start : self._position + 1])
+                        self._key_start = None
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = self._position
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_member(completed)
+                    self.finished = True
+            elif self._depth == 1:
+                if char == ":" and self._key is not None:
+                    self._value_start = self._position + 1
+                elif char == ",":
+                    self._complete_member(completed)
+            self._position += 1
+        return completed
+
+    def _complete_member(self, completed: List[Tuple[str, Any]]) -> None:
+        if self._key is not None and self._value_start is not None:
+            raw = self._text[self._value_start : self._position]
+            try:
+                completed.append((self._key, json.loads(raw)))
+            except ValueError:
+                if not self.skip_invalid:
+                    raise
+                self.skipped += 1
+        self._key = None
+        self._value_start = None
+
+    def result(self) -> Any:
+        """Return the whole object; raises ValueError if it has not been closed."""
+        if not self.finished:
+            raise ValueError("JSON object is incomplete")
+        return json.loads(self._text[self._start : self._position])
+
+
+def parse_model_json(text: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Parse the JSON object in a model's output, salvaging what it can.
+
+    Returns (object, repair). repair is None for clean JSON, "extracted"
+    when prose or a code fence surrounded a complete object, and "partial"
+    when the object was cut off or malformed and only its complete
+    top-level members were kept. Raises ValueError if nothing was found.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        pass
+    else:
+        if isinstance(data, dict):
+            return data, None
+
+    parser = IncrementalObjectParser(skip_invalid=True)
+    members = parser.feed(text)
+    if parser.finished and not parser.skipped:
+        try:
+            return parser.result(), "extracted"
+        except ValueError:
+            pass
+    if not members:
+        raise ValueError("No JSON object found in model output")
+    return dict(members), "partial"
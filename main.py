@@ -1,13 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1.endpoints import form_extraction, auth_requests
+from fastapi.responses import Response
+from app.api.v1.endpoints import form_extraction, auth_requests, extraction_jobs
 from app.core.config import settings
-from starlette.requests import Request
+from app.core.logging import RequestIdMiddleware, configure_logging
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.core.security import close_jwt_verifier
+from app.database.repositories import close_auth_request_repository
+from app.services.model_router import close_model_backends
+from app.services.openai_client import close_openai_client
+from app.services.worker_pool import shutdown_process_pool
+
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients (OpenAI, model backends, PostgREST, Supabase, JWKS, process pool) are
+    # created on first use rather than here, so a cold start only pays for what it serves.
+    yield
+    await extraction_jobs.shutdown_job_manager()
+    await close_model_backends()
+    await close_openai_client()
+    await close_auth_request_repository()
+    await close_jwt_verifier()
+    shutdown_process_pool()
+
 
 app = FastAPI(
     title="Prior Auth Copilot API",
     description="API for automated medical prior authorization form filling",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -21,13 +46,18 @@ app.add_middleware(
 
 # Include routers
 app.include_router(form_extraction.router, prefix="/api/v1", tags=["form-extraction"])
+app.include_router(extraction_jobs.router, prefix="/api/v1", tags=["extraction-jobs"])
 app.include_router(auth_requests.router, prefix="/api/v1/auth-requests", tags=["authorization-requests"])
 
-@app.middleware("http")
-async def log_headers(request: Request, call_next):
-    print("Incoming headers:", dict(request.headers))
-    response = await call_next(request)
-    return response
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# Outermost, so every log line of a request, including middleware's, carries its id
+app.add_middleware(RequestIdMiddleware)
 
 if __name__ == "__main__":
     import uvicorn
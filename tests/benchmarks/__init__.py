@@ -0,0 +1,4 @@
+"""Benchmark scripts, run with ``python -m tests.benchmarks.<name>``.
+
+They are not collected by pytest; each prints a JSON report to stdout.
+"""
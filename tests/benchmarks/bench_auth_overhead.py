@@ -0,0 +1,121 @@
+"""Per-request auth overhead: remote Supabase user lookup vs local JWT checks.
+
+"remote" calls a stub /auth/v1/user endpoint that answers after --latency
+seconds, standing in for the supabase.auth.get_user round trip.
+"cold" verifies a token the verifier has not seen (signature and claims
+checked; JWKS already loaded), "warm" repeats a token that is already in
+the claims cache.
+Usage: python -m tests.benchmarks.bench_auth_overhead
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.security import JWTVerifier
+from tests.stubs.server import BackgroundServer
+
+SECRET = "bench-jwt-secret-with-at-least-32-characters"
+ISSUER = "https://bench.supabase.co/auth/v1"
+
+
+def _stub_app(latency, jwks):
+    async def user(request):
+        await asyncio.sleep(latency)
+        return JSONResponse({"id": "user-1", "role": "authenticated"})
+
+    async def keys(request):
+        return JSONResponse({"keys": jwks})
+
+    return Starlette(
+        routes=[
+            Route("/auth/v1/user", user),
+            Route("/auth/v1/.well-known/jwks.json", keys),
+        ]
+    )
+
+
+def _claims(i):
+    return {
+        "sub": f"user-{i}",
+        "aud": "authenticated",
+        "iss": ISSUER,
+        "role": "authenticated",
+        "exp": int(time.time()) + 3600,
+    }
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "p50_us": round(statistics.median(samples) * 1e6, 1),
+        "p95_us": round(samples[int(len(samples) * 0.95) - 1] * 1e6, 1),
+    }
+
+
+async def _time_each(calls):
+    samples = []
+    for call in calls:
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples)
+
+
+async def _run(args, base_url, private_key):
+    verifier = JWTVerifier(
+        jwt_secret=SECRET,
+        jwks_url=f"{base_url}/auth/v1/.well-known/jwks.json",
+        audience="authenticated",
+        issuer=ISSUER,
+    )
+    await verifier.refresh_keys()
+    hs_tokens = [jwt.encode(_claims(i), SECRET, algorithm="HS256") for i in range(args.requests)]
+    rs_tokens = [
+        jwt.encode(_claims(i), private_key, algorithm="RS256", headers={"kid": "bench"})
+        for i in range(args.requests)
+    ]
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        results["remote_get_user"] = await _time_each(
+            lambda: client.get("/auth/v1/user", headers={"Authorization": f"Bearer {hs_tokens[0]}"})
+            for _ in range(args.requests)
+        )
+    results["local_cold_hs256"] = await _time_each(
+        lambda token=token: verifier.verify(token) for token in hs_tokens
+    )
+    results["local_cold_rs256"] = await _time_each(
+        lambda token=token: verifier.verify(token) for token in rs_tokens
+    )
+    results["local_warm"] = await _time_each(
+        lambda: verifier.verify(hs_tokens[0]) for _ in range(args.requests)
+    )
+    await verifier.aclose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update({"kid": "bench", "alg": "RS256", "use": "sig"})
+
+    with BackgroundServer(_stub_app(args.latency, [jwk])) as server:
+        results = asyncio.run(_run(args, server.url, private_key))
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Auth request create/status throughput: one request per item vs the bulk endpoints.
+
+Drives the API in-process against a temporary SQLite database. Every
+repository call first sleeps --db-latency seconds, standing in for the
+Supabase round trip the single-item path pays once per item.
+Usage: python -m tests.benchmarks.bench_auth_request_bulk
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import auth_requests
+from app.database.repositories import SQLAlchemyAuthRequestRepository
+from app.services.auth_request_service import AuthRequestService
+from app.services.interfaces import AuthRequestRepository
+from main import app
+
+PROVIDER_ID = "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11"
+
+
+class LatencyRepository(AuthRequestRepository):
+    def __init__(self, repository, latency):
+        self.repository = repository
+        self.latency = latency
+
+    async def _call(self, name, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await getattr(self.repository, name)(*args, **kwargs)
+
+    async def insert(self, record):
+        return await self._call("insert", record)
+
+    async def list_by_provider(self, provider_id, **kwargs):
+        return await self._call("list_by_provider", provider_id, **kwargs)
+
+    async def get(self, request_id):
+        return await self._call("get", request_id)
+
+    async def update(self, request_id, values):
+        return await self._call("update", request_id, values)
+
+    async def insert_many(self, records):
+        return await self._call("insert_many", records)
+
+    async def list_by_idempotency_keys(self, provider_id, keys):
+        return await self._call("list_by_idempotency_keys", provider_id, keys)
+
+    async def update_many(self, request_ids, values):
+        return await self._call("update_many", request_ids, values)
+
+
+def _item(i):
+    return {
+        "patient_name": f"Patient {i}",
+        "patient_id": f"P-{i}",
+        "procedure_code": "70553",
+        "procedure_description": "MRI brain",
+        "diagnosis_code": "G43.909",
+        "diagnosis_description": "Migraine",
+        "medical_justification": "Persistent headaches despite treatment",
+        "provider_id": PROVIDER_ID,
+    }
+
+
+def _rate(count, seconds):
+    return {"seconds": round(seconds, 3), "items_per_s": round(count / seconds, 1)}
+
+
+def _run(client, args):
+    items = [_item(i) for i in range(args.items)]
+    results = {}
+
+    started = time.perf_counter()
+    single_ids = [client.post("/api/v1/auth-requests/", json=item).json()["id"] for item in items]
+    results["create_single"] = _rate(args.items, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    bulk_ids = []
+    for start in range(0, args.items, args.batch):
+        response = client.post(
+            "/api/v1/auth-requests/bulk",
+            json={"requests": items[start : start + args.batch]},
+            headers={"Idempotency-Key": f"bench-{start}"},
+        )
+        bulk_ids += [r["id"] for r in response.json()["results"]]
+    results["create_bulk"] = _rate(args.items, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for request_id in single_ids:
+        client.put(f"/api/v1/auth-requests/{request_id}/status", params={"status": "APPROVED"})
+    results["status_single"] = _rate(args.items, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for start in range(0, args.items, args.batch):
+        client.put(
+            "/api/v1/auth-requests/bulk/status",
+            json={"ids": bulk_ids[start : start + args.batch], "status": "APPROVED"},
+        )
+    results["status_bulk"] = _rate(args.items, time.perf_counter() - started)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SQLAlchemyAuthRequestRepository(
+            f"sqlite:///{os.path.join(directory, 'auth.sqlite3')}"
+        )
+        service = AuthRequestService(LatencyRepository(repository, args.db_latency))
+        app.dependency_overrides[auth_requests.get_auth_request_service] = lambda: service
+        app.dependency_overrides[auth_requests.get_current_user] = lambda: {"id": PROVIDER_ID}
+        try:
+            with TestClient(app) as client:
+                results = _run(client, args)
+        finally:
+            app.dependency_overrides.clear()
+            asyncio.run(repository.aclose())
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
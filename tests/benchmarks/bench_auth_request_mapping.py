@@ -0,0 +1,138 @@
+"""CPU cost of turning 10k auth request rows into a JSON list response.
+
+"field_by_field" is the previous path: AuthRequestResponse(...) built from
+each row's fields, then FastAPI's response_model serialization. "mapper"
+uses to_auth_request_response (one model_validate per row) and
+"constructed" uses model_construct, both serialized the same way.
+"direct" renders the rows straight to JSON, as the list endpoint now does.
+The map_only_* entries time building the models alone.
+Usage: python -m tests.benchmarks.bench_auth_request_mapping
+"""
+from datetime import datetime, timedelta
+from typing import List
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.auth_request import AuthRequestResponse
+from app.services.auth_request_service import PROJECTABLE_FIELDS, to_auth_request_response
+
+FIELDS = tuple(AuthRequestResponse.model_fields)
+
+
+def _rows(count):
+    base = datetime(2024, 1, 1)
+    provider_id = str(uuid.uuid4())
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "patient_name": f"Patient {i}",
+            "patient_id": f"P-{i}",
+            "procedure_code": "70553",
+            "procedure_description": "MRI brain with and without contrast",
+            "diagnosis_code": "G43.909",
+            "diagnosis_description": "Migraine, unspecified",
+            "medical_justification": "Persistent headaches despite treatment. " * 5,
+            "priority": "Standard",
+            "payer_name": "Aetna",
+            "payer_id": "AETNA",
+            "status": "PENDING",
+            "submitted_at": (base + timedelta(minutes=i)).isoformat() + "+00:00",
+            "updated_at": (base + timedelta(minutes=i)).isoformat() + "+00:00",
+            "provider_id": provider_id,
+        }
+        for i in range(count)
+    ]
+
+
+def _constructed_model(record):
+    values = {name: record.get(name) for name in FIELDS}
+    for name in ("id", "provider_id"):
+        values[name] = uuid.UUID(values[name])
+    for name in ("submitted_at", "updated_at"):
+        values[name] = datetime.fromisoformat(values[name])
+    return AuthRequestResponse.model_construct(**values)
+
+
+def _field_by_field_model(record):
+    return AuthRequestResponse(
+        id=uuid.UUID(record["id"]),
+        patient_name=record["patient_name"],
+        patient_id=record["patient_id"],
+        procedure_code=record["procedure_code"],
+        procedure_description=record["procedure_description"],
+        diagnosis_code=record["diagnosis_code"],
+        diagnosis_description=record["diagnosis_description"],
+        medical_justification=record["medical_justification"],
+        priority=record["priority"],
+        payer_name=record.get("payer_name"),
+        payer_id=record.get("payer_id"),
+        status=record["status"],
+        submitted_at=record["submitted_at"],
+        updated_at=record["updated_at"],
+        provider_id=uuid.UUID(record["provider_id"]),
+    )
+
+
+def _through_response_model(models) -> bytes:
+    field = create_response_field(name="Response", type_=List[AuthRequestResponse])
+    content = asyncio.run(serialize_response(field=field, response_content=models))
+    return JSONResponse(content=content).body
+
+
+def _median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    paths = {
+        "map_only_field_by_field": lambda: [_field_by_field_model(r) for r in rows],
+        "map_only_constructed": lambda: [_constructed_model(r) for r in rows],
+        "map_only_mapper": lambda: [to_auth_request_response(r) for r in rows],
+        "field_by_field": lambda: _through_response_model(
+            [_field_by_field_model(r) for r in rows]
+        ),
+        "constructed": lambda: _through_response_model([_constructed_model(r) for r in rows]),
+        "mapper": lambda: _through_response_model([to_auth_request_response(r) for r in rows]),
+        "direct": lambda: JSONResponse(
+            content=[{name: r[name] for name in PROJECTABLE_FIELDS} for r in rows]
+        ).body,
+    }
+    assert json.loads(paths["mapper"]())[0]["id"] == json.loads(paths["direct"]())[0]["id"]
+
+    results = {name: _median_ms(fn, args.repeats) for name, fn in paths.items()}
+    print(
+        json.dumps(
+            {
+                "config": vars(args),
+                "median_ms": results,
+                "speedup_vs_field_by_field": {
+                    name: round(results["field_by_field"] / results[name], 1)
+                    for name in ("constructed", "mapper", "direct")
+                },
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""GET /auth-requests page latency as the page depth grows, keyset vs OFFSET.
+
+Seeds --rows synthetic requests for one provider in a temporary SQLite
+database (plus noise from other providers) and times one --page-size page
+at several depths through SQLAlchemyAuthRequestRepository, next to the
+same page fetched with LIMIT/OFFSET.
+Usage: python -m tests.benchmarks.bench_auth_request_pagination
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import insert, select
+
+from app.database.repositories import SQLAlchemyAuthRequestRepository
+from app.services.auth_request_service import PROJECTABLE_FIELDS
+
+PROVIDER_ID = uuid.uuid4()
+BATCH = 5000
+
+
+def _seed(repository, rows):
+    table = repository.model.__table__
+    base = datetime(2020, 1, 1)
+    providers = [PROVIDER_ID] + [uuid.uuid4() for _ in range(4)]
+    with repository.engine.begin() as conn:
+        for start in range(0, rows * 2, BATCH):
+            conn.execute(
+                insert(table),
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "patient_name": f"Patient {i}",
+                        "patient_id": f"P-{i}",
+                        "procedure_code": "70553",
+                        "procedure_description": "MRI brain with and without contrast",
+                        "diagnosis_code": "G43.909",
+                        "diagnosis_description": "Migraine, unspecified",
+                        "medical_justification": "Persistent headaches despite treatment. " * 20,
+                        "priority": "Urgent" if i % 7 == 0 else "Standard",
+                        "payer_id": f"PAYER-{i % 12}",
+                        "status": "PENDING" if i % 4 else "APPROVED",
+                        # Half the rows belong to the benchmarked provider.
+                        "provider_id": PROVIDER_ID if i % 2 == 0 else providers[1 + i % 4],
+                        "submitted_at": base + timedelta(minutes=i // 2),
+                        "updated_at": base,
+                    }
+                    for i in range(start, min(start + BATCH, rows * 2))
+                ],
+            )
+
+
+def _cursor_at(repository, depth):
+    """The (submitted_at, id) of the row just before depth, found untimed."""
+    model = repository.model
+    if depth == 0:
+        return None
+    with repository.engine.connect() as conn:
+        row = conn.execute(
+            select(model.submitted_at, model.id)
+            .where(model.provider_id == PROVIDER_ID)
+            .order_by(model.submitted_at.desc(), model.id.desc())
+            .offset(depth - 1)
+            .limit(1)
+        ).one()
+    return row.submitted_at.isoformat(), str(row.id)
+
+
+def _offset_page(repository, depth, page_size):
+    model = repository.model
+    with repository.engine.connect() as conn:
+        return conn.execute(
+            select(model)
+            .where(model.provider_id == PROVIDER_ID)
+            .order_by(model.submitted_at.desc(), model.id.desc())
+            .offset(depth)
+            .limit(page_size)
+        ).all()
+
+
+def _median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SQLAlchemyAuthRequestRepository(
+            f"sqlite:///{os.path.join(directory, 'auth.sqlite3')}"
+        )
+        _seed(repository, args.rows)
+        depths = [0, 1_000, 10_000, args.rows // 2, args.rows - args.page_size]
+
+        def keyset(after):
+            # Call the blocking half directly so thread hand-off is not timed.
+            return lambda: repository._list_by_provider(
+                str(PROVIDER_ID), {}, args.page_size, after, None
+            )
+
+        results = []
+        for depth in depths:
+            after = _cursor_at(repository, depth)
+            page = asyncio.run(
+                repository.list_by_provider(str(PROVIDER_ID), limit=args.page_size, after=after)
+            )
+            results.append(
+                {
+                    "depth": depth,
+                    "rows": len(page),
+                    "keyset_ms": _median_ms(keyset(after), args.repeats),
+                    "offset_ms": _median_ms(
+                        lambda: _offset_page(repository, depth, args.page_size), args.repeats
+                    ),
+                }
+            )
+
+        summary_fields = [name for name in PROJECTABLE_FIELDS if name != "medical_justification"]
+        full = asyncio.run(repository.list_by_provider(str(PROVIDER_ID), limit=args.page_size))
+        projected = asyncio.run(
+            repository.list_by_provider(
+                str(PROVIDER_ID), limit=args.page_size, fields=["id", "submitted_at", "status"]
+            )
+        )
+        projection = {
+            "full_page_bytes": len(json.dumps(full)),
+            "without_justification_bytes": len(
+                json.dumps([{k: row[k] for k in summary_fields} for row in full])
+            ),
+            "id_status_page_bytes": len(json.dumps(projected)),
+        }
+        asyncio.run(repository.aclose())
+
+    print(
+        json.dumps(
+            {"config": vars(args), "results": results, "projection": projection}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
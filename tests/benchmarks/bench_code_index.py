@@ -0,0 +1,99 @@
+"""Loading and batch lookups of the code index.
+
+A synthetic ICD-10-CM-shaped code set of --codes codes (the real set has
+about 74,000) is written to a temporary directory. Reports:
+  load      compiling the text file (first load) and memory-mapping the
+            compiled index (every later load, e.g. each cold start)
+  lookup    checking --batch codes, some of them misread (--misread), with
+            one lookup_many call and with one lookup call per code
+  misses    the fuzzy matching share of the batch time
+
+Usage: python -m tests.benchmarks.bench_code_index
+"""
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from app.services.code_index import CONFUSABLE, CodeIndex, format_code
+from tests.benchmarks.harness import percentile
+
+
+def _code_set(count, rng):
+    codes = set()
+    while len(codes) < count:
+        length = rng.choice((3, 4, 5, 6, 7))
+        tail = "".join(rng.choice(string.digits + "X") for _ in range(length - 3))
+        codes.add(rng.choice("ABCDEFGHIJKLMNOPQRSTVWXYZ") + rng.choice(string.digits) + rng.choice(string.digits) + tail)
+    return sorted(codes)
+
+
+def _misread(code, rng):
+    positions = [i for i, c in enumerate(code) if c in CONFUSABLE]
+    if not positions:
+        return code + "9"
+    i = rng.choice(positions)
+    return code[:i] + rng.choice(CONFUSABLE[code[i]]) + code[i + 1 :]
+
+
+def _time(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return round(percentile(samples, 50) * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--codes", type=int, default=74000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--misread", type=float, default=0.02, help="share of misread codes")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    codes = _code_set(args.codes, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "diagnosis_codes.txt")
+        with open(path, "w") as file:
+            file.writelines(f"{code}    Description of {code}\n" for code in codes)
+        cache_dir = os.path.join(directory, "cache")
+
+        started = time.perf_counter()
+        index = CodeIndex.load("diagnosis", path, cache_dir)
+        compile_ms = (time.perf_counter() - started) * 1000
+        mmap_ms = _time(lambda: CodeIndex.load("diagnosis", path, cache_dir), args.repeats)
+
+        batch = [format_code("diagnosis", code) for code in rng.choices(codes, k=args.batch)]
+        misread = set(rng.sample(range(args.batch), int(args.batch * args.misread)))
+        clean = list(batch)
+        for i in misread:
+            batch[i] = _misread(batch[i], rng)
+
+        results = index.lookup_many(batch)
+        statuses = {}
+        for result in results:
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+
+        report = {
+            "codes": len(index),
+            "index_bytes": index.codes.nbytes,
+            "load_ms": {"compile": round(compile_ms, 2), "mmap": mmap_ms},
+            "lookup_ms": {
+                "batch": _time(lambda: index.lookup_many(batch), args.repeats),
+                "batch_without_misreads": _time(lambda: index.lookup_many(clean), args.repeats),
+                "per_code": _time(lambda: [index.lookup(value) for value in batch], args.repeats),
+            },
+            "statuses": statuses,
+        }
+    print(json.dumps({"config": vars(args), "results": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
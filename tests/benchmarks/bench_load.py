@@ -0,0 +1,213 @@
+"""Load test: extraction and auth request CRUD at increasing concurrency.
+
+The app runs in-process (httpx ASGITransport) against local stand-ins for
+OpenAI (tests/stubs/openai_server.py) and Supabase PostgREST
+(tests/stubs/postgrest_server.py), each with configurable latency and
+error rate. Every scenario is run at each --concurrency level and reports
+RPS, p50/p95/p99 latency, errors and peak RSS as JSON; pass --output to
+also write it to a file for tracking regressions.
+
+Scenarios: "extraction" (POST /extract-form-data/ with one JPEG page; the
+extraction cache is disabled so every request reaches the model) and
+"auth_create", "auth_get", "auth_list", "auth_update_status" ("auth_requests"
+selects all four). GET by id goes through the read-through cache as it
+does in production.
+Usage: python -m tests.benchmarks.bench_load --scenario all --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import time
+
+import httpx
+
+from tests.benchmarks.harness import run_load
+from tests.stubs.openai_server import StubOpenAIServer
+from tests.stubs.postgrest_server import StubPostgRESTServer
+
+PROVIDER_ID = "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11"
+AUTH_SCENARIOS = ("auth_create", "auth_get", "auth_list", "auth_update_status")
+SEED_ROWS = 200
+
+
+def _jpeg(width=1240, height=1754) -> bytes:
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(80, height - 80, 40):
+        draw.line((80, y, width - 80, y), fill=(60, 60, 60), width=2)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _item(i, record_bytes):
+    return {
+        "patient_name": f"Patient {i}",
+        "patient_id": f"P-{i}",
+        "procedure_code": "70553",
+        "procedure_description": "MRI brain",
+        "diagnosis_code": "G43.909",
+        "diagnosis_description": "Migraine",
+        "medical_justification": "x" * record_bytes,
+        "provider_id": PROVIDER_ID,
+    }
+
+
+class Scenarios:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.jpeg = _jpeg()
+        self.ids = []
+
+    async def seed(self) -> None:
+        """Create rows for the read and update scenarios (not timed).
+
+        Keyed bulk inserts are retried on 5xx, so seeding survives --db-error-rate.
+        """
+        response = await self.client.post(
+            "/api/v1/auth-requests/bulk",
+            json={"requests": [_item(i, self.args.record_bytes) for i in range(SEED_ROWS)]},
+            headers={"Idempotency-Key": "bench-seed"},
+        )
+        response.raise_for_status()
+        self.ids = [result["id"] for result in response.json()["results"]]
+
+    async def extraction(self, i) -> bool:
+        response = await self.client.post(
+            "/api/v1/extract-form-data/",
+            files=[("files", (f"form-{i}.jpg", self.jpeg, "image/jpeg"))],
+        )
+        return response.status_code == 200
+
+    async def auth_create(self, i) -> bool:
+        response = await self.client.post(
+            "/api/v1/auth-requests/", json=_item(i, self.args.record_bytes)
+        )
+        return response.status_code == 200
+
+    async def auth_get(self, i) -> bool:
+        response = await self.client.get(f"/api/v1/auth-requests/{random.choice(self.ids)}")
+        return response.status_code == 200
+
+    async def auth_list(self, i) -> bool:
+        response = await self.client.get(
+            "/api/v1/auth-requests/", params={"provider_id": PROVIDER_ID, "limit": 50}
+        )
+        return response.status_code == 200
+
+    async def auth_update_status(self, i) -> bool:
+        response = await self.client.put(
+            f"/api/v1/auth-requests/{random.choice(self.ids)}/status",
+            params={"status": random.choice(("APPROVED", "DENIED", "PENDING"))},
+        )
+        return response.status_code == 200
+
+
+async def _run(app, args, scenarios):
+    from app.database.repositories import close_auth_request_repository
+    from app.services.openai_client import close_openai_client
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        runner = Scenarios(client, args)
+        if any(name in AUTH_SCENARIOS for name in scenarios):
+            await runner.seed()
+        for name in scenarios:
+            call = getattr(runner, name)
+            results[name] = {}
+            for concurrency in args.concurrency:
+                requests = max(args.requests, concurrency)
+                results[name][str(concurrency)] = await run_load(call, concurrency, requests)
+    await close_openai_client()
+    await close_auth_request_repository()
+    return results
+
+
+def _parse_levels(value):
+    return [int(level) for level in value.split(",") if level]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenario",
+        choices=("all", "extraction", "auth_requests") + AUTH_SCENARIOS,
+        default="all",
+    )
+    parser.add_argument("--concurrency", type=_parse_levels, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="per scenario and level")
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-payload-bytes", type=int, default=0)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--record-bytes", type=int, default=256)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.scenario == "all":
+        scenarios = ("extraction",) + AUTH_SCENARIOS
+    elif args.scenario == "auth_requests":
+        scenarios = AUTH_SCENARIOS
+    else:
+        scenarios = (args.scenario,)
+
+    openai_stub = StubOpenAIServer(
+        latency=args.openai_latency,
+        error_rate=args.openai_error_rate,
+        payload_bytes=args.openai_payload_bytes,
+    )
+    db_stub = StubPostgRESTServer(latency=args.db_latency, error_rate=args.db_error_rate)
+    with openai_stub, db_stub:
+        # Point the app at the stand-ins before anything reads the settings.
+        os.environ.update(
+            {
+                "SUPABASE_URL": db_stub.url,
+                "SUPABASE_ANON_KEY": "bench-anon-key",
+                "SUPABASE_SERVICE_KEY": "bench-service-key",
+                "LOG_LEVEL": "WARNING",
+            }
+        )
+        from app.api.v1.endpoints import auth_requests
+        from app.core.config import settings
+        from app.services.worker_pool import shutdown_process_pool
+        from main import app
+
+        settings.OPENAI_API_BASE = openai_stub.base_url
+        settings.OPENAI_API_KEY = "bench"
+        settings.AUTH_REQUEST_BACKEND = "supabase"
+        settings.EXTRACTION_CACHE_BACKEND = "none"
+        app.dependency_overrides[auth_requests.get_current_user] = lambda: {"id": PROVIDER_ID}
+        started = time.time()
+        try:
+            results = asyncio.run(_run(app, args, scenarios))
+        finally:
+            app.dependency_overrides.clear()
+            shutdown_process_pool()
+
+    report = {
+        "started_at": started,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {**vars(args), "scenario": list(scenarios)},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
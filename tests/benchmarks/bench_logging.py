@@ -0,0 +1,163 @@
+"""Requests/sec of create + fetch auth request traffic under each logging setup.
+
+"legacy" reproduces the previous behaviour: root logger at DEBUG with a
+synchronous stream handler, every payload written, and every request's
+header dict printed. The other modes use configure_logging (queued
+handler, payloads sampled at LOG_PAYLOAD_SAMPLE_RATE and redacted).
+Output goes to a temporary file; each write first sleeps --write-latency
+seconds, standing in for a terminal or container log pipe that is slower
+than a local file.
+Usage: python -m tests.benchmarks.bench_logging
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+
+from app.api.v1.endpoints import auth_requests
+from app.core import logging as app_logging
+from app.core.logging import configure_logging, stop_logging
+from app.database.repositories import SQLAlchemyAuthRequestRepository
+from app.services.auth_request_service import AuthRequestService
+from main import app
+
+MODES = ("legacy", "text", "json", "json_debug_sampled")
+PROVIDER_ID = "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11"
+ITEM = {
+    "patient_name": "Mary Doe",
+    "patient_id": "P-1",
+    "procedure_code": "70553",
+    "procedure_description": "MRI brain",
+    "diagnosis_code": "G43.909",
+    "diagnosis_description": "Migraine",
+    "medical_justification": "Persistent headaches despite treatment. " * 5,
+    "provider_id": PROVIDER_ID,
+}
+
+
+class SlowStream:
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class PrintHeaders:
+    """The old print-every-header-dict middleware, as plain ASGI."""
+
+    def __init__(self, app, stream):
+        self.app = app
+        self.stream = stream
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+            print("Incoming headers:", headers, file=self.stream, flush=True)
+        await self.app(scope, receive, send)
+
+
+def _configure(mode, stream):
+    handler = logging.StreamHandler(stream)
+    if mode == "legacy":
+        stop_logging()
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+        root.addHandler(handler)
+        root.setLevel(logging.DEBUG)
+        app_logging.settings.LOG_PAYLOAD_SAMPLE_RATE = 1.0
+        return PrintHeaders(app, stream)
+
+    level, log_format = {
+        "text": ("INFO", "text"),
+        "json": ("INFO", "json"),
+        "json_debug_sampled": ("DEBUG", "json"),
+    }[mode]
+    app_logging.settings.LOG_PAYLOAD_SAMPLE_RATE = 0.01
+    configure_logging(level=level, log_format=log_format, handler=handler)
+    return app
+
+
+async def _requests_per_s(asgi_app, args):
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(args.warmup):
+            await client.post("/api/v1/auth-requests/", json=ITEM)
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            created = (await client.post("/api/v1/auth-requests/", json=ITEM)).json()
+            await client.get(f"/api/v1/auth-requests/{created['id']}")
+        return args.requests * 2 / (time.perf_counter() - started)
+
+
+def _run(mode, args, stream):
+    asgi_app = _configure(mode, stream)
+    try:
+        return asyncio.run(_requests_per_s(asgi_app, args))
+    finally:
+        stop_logging()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--write-latency", type=float, default=0.0002)
+    args = parser.parse_args()
+
+    results, log_bytes = {}, {}
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SQLAlchemyAuthRequestRepository(
+            f"sqlite:///{os.path.join(directory, 'auth.sqlite3')}"
+        )
+        service = AuthRequestService(repository)
+        app.dependency_overrides[auth_requests.get_auth_request_service] = lambda: service
+        app.dependency_overrides[auth_requests.get_current_user] = lambda: {
+            "id": PROVIDER_ID,
+            "email": "dr@example.com",
+        }
+        try:
+            # Interleave rounds so database growth affects every mode alike.
+            for _ in range(args.rounds):
+                for mode in MODES:
+                    with open(os.path.join(directory, f"{mode}.log"), "w") as file:
+                        stream = SlowStream(file, args.write_latency)
+                        with contextlib.redirect_stdout(stream):
+                            rate = _run(mode, args, stream)
+                    results[mode] = max(results.get(mode, 0), rate)
+                    log_bytes[mode] = os.path.getsize(os.path.join(directory, f"{mode}.log"))
+        finally:
+            app.dependency_overrides.clear()
+            asyncio.run(repository.aclose())
+
+    print(
+        json.dumps(
+            {
+                "config": vars(args),
+                "requests_per_s": {mode: round(rate, 1) for mode, rate in results.items()},
+                "log_bytes_per_round": log_bytes,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
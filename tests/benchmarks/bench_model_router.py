@@ -0,0 +1,119 @@
+"""Tail latency of one backend vs the model router with hedged requests.
+
+Each simulated backend answers after a log-normal latency with median
+--median seconds, and --tail-share of its calls stall for --tail-factor
+times as long (a slow replica, a long queue upstream). A third backend
+also fails --error-rate of its calls.
+
+Modes:
+  single       every call goes to the first backend
+  router       ModelRouter over all backends, failover only (no hedging)
+  hedged       ModelRouter with one hedge once a call passes the backend's p95
+
+The router warms up on --warmup calls so it has p95s to work from. Reports
+p50/p95/p99 latency, failures and backend calls per request as JSON.
+Usage: python -m tests.benchmarks.bench_model_router
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.services.model_router import ModelBackend, ModelRouter
+from app.services.openai_client import OpenAIAPIError
+from app.services.stub_processor import StubProcessor
+from tests.benchmarks.harness import percentile
+
+MODES = ("single", "router", "hedged")
+CONTENT = [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+
+
+class SimulatedBackend(StubProcessor):
+    def __init__(self, rng, args, error_rate=0.0):
+        super().__init__(model="simulated")
+        self.rng = rng
+        self.args = args
+        self.error_rate = error_rate
+        self.calls = 0
+
+    async def process_content(self, content, additional_context=None):
+        self.calls += 1
+        latency = self.args.median * self.rng.lognormvariate(0, 0.25)
+        if self.rng.random() < self.args.tail_share:
+            latency *= self.args.tail_factor
+        await asyncio.sleep(latency)
+        if self.rng.random() < self.error_rate:
+            raise OpenAIAPIError(503, "unavailable")
+        return await super().process_content(content, additional_context)
+
+
+async def _run_mode(mode, args):
+    rng = random.Random(args.seed)
+    processors = [
+        SimulatedBackend(rng, args),
+        SimulatedBackend(rng, args),
+        SimulatedBackend(rng, args, error_rate=args.error_rate),
+    ]
+    backends = [
+        ModelBackend(f"backend-{i}", processor, rate_limited=False)
+        for i, processor in enumerate(processors)
+    ]
+    if mode == "single":
+        backends = backends[:1]
+    router = ModelRouter(backends, max_hedges=1 if mode == "hedged" else 0)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async def request(record):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await router.process_content(CONTENT)
+            except Exception:
+                failures += record
+                return
+            if record:
+                latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(request(False) for _ in range(args.warmup)))
+    calls_before = sum(p.calls for p in processors)
+    await asyncio.gather(*(request(True) for _ in range(args.requests)))
+    calls = sum(p.calls for p in processors) - calls_before
+
+    return {
+        "succeeded": len(latencies),
+        "failed": failures,
+        "calls_per_request": round(calls / args.requests, 3),
+        "latency_ms": {
+            q: round(percentile(latencies, int(q[1:])) * 1000, 1)
+            for q in ("p50", "p95", "p99")
+        },
+    }
+
+
+async def _run(args):
+    return {mode: await _run_mode(mode, args) for mode in args.modes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=list(MODES))
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--median", type=float, default=0.05, help="seconds")
+    parser.add_argument("--tail-share", type=float, default=0.05)
+    parser.add_argument("--tail-factor", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args))
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Model calls and latency with and without the OCR pre-pass.
+
+A synthetic corpus of typed payer forms (tests/stubs/forms.py) is
+extracted against the stub model server. The corpus mix:
+  complete     every field typed
+  incomplete   one field left off the form
+  note         typed, plus a handwritten reviewer note
+  handwritten  a page covered in handwriting
+Each request is one page, sent at --concurrency.
+
+Modes:
+  vision   GPTVisionProcessor on the page images, as without the pre-pass
+  ocr      OcrPrepassProcessor (bitmap engine, process pool) in front of it
+
+Reports model calls made and avoided, the prompt tokens sent (estimated
+from image sizes and text as for rate limiting), p50/p95 latency, the
+route taken per form kind and how many fields answered by the rules
+alone match the form.
+Usage: python -m tests.benchmarks.bench_ocr_prepass
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.core.config import settings
+from app.services.extraction_prompt import SYSTEM_PROMPT
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.interfaces import AIModelProcessor
+from app.services.ocr_prepass import OcrPrepassProcessor
+from app.services.openai_client import AsyncOpenAIClient
+from app.services.rate_limiter import estimate_tokens
+from app.services.worker_pool import run_in_process, shutdown_process_pool
+from tests.benchmarks.harness import percentile
+from tests.stubs.forms import FORM_VALUES, PAGE_SIZE, render_form
+from tests.stubs.openai_server import StubOpenAIServer
+
+MODES = ("vision", "ocr")
+KINDS = (("complete", 0.5), ("incomplete", 0.2), ("note", 0.15), ("handwritten", 0.15))
+# Form label -> (section, key) of the field it fills.
+LABEL_FIELDS = {
+    "Patient Name": ("patient_info", "name"),
+    "Member ID": ("patient_info", "id"),
+    "CPT Code": ("procedure_info", "code"),
+    "Procedure": ("procedure_info", "description"),
+    "ICD-10 Code": ("diagnosis_info", "primary_diagnosis"),
+    "Symptoms": ("diagnosis_info", "symptoms"),
+    "Affected Area": ("diagnosis_info", "affected_area"),
+    "Insurance Provider": ("insurance_info", "provider"),
+    "Policy Number": ("insurance_info", "policy_number"),
+}
+
+
+class CountingProcessor(AIModelProcessor):
+    """Counts the calls that reach the model and their estimated prompt tokens."""
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    async def process_content(self, content, additional_context=None):
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(content, SYSTEM_PROMPT)
+        return await self.processor.process_content(content, additional_context)
+
+
+def _form(kind, index, rng):
+    values = dict(FORM_VALUES)
+    values["Member ID"] = f"P{100000 + index}"
+    values["CPT Code"] = str(rng.choice([29881, 27447, 73721, 99213]))
+    if kind == "incomplete":
+        del values[rng.choice(list(LABEL_FIELDS))]
+    image = render_form(
+        values,
+        handwritten_note=kind == "note",
+        handwritten_page=kind == "handwritten",
+        seed=index,
+    )
+    return values, image
+
+
+def _corpus(count, seed):
+    rng = random.Random(seed)
+    names = [name for name, _ in KINDS]
+    weights = [weight for _, weight in KINDS]
+    corpus = []
+    for index, kind in enumerate(rng.choices(names, weights, k=count)):
+        values, image = _form(kind, index, rng)
+        item = {
+            "type": "image",
+            "image": image,
+            "source": f"form-{index}.jpg",
+            "mime_type": "image/jpeg",
+            "preprocess": {"output_size": f"{PAGE_SIZE[0]}x{PAGE_SIZE[1]}"},
+        }
+        corpus.append((kind, values, item))
+    return corpus
+
+
+def _correct_fields(response, values):
+    correct = 0
+    for label, (section, key) in LABEL_FIELDS.items():
+        field = getattr(response, section).get(key)
+        if label in values and field is not None and field.value == values[label]:
+            correct += 1
+    return correct
+
+
+async def _run_mode(mode, corpus, args):
+    with StubOpenAIServer(latency=args.latency) as server:
+        client = AsyncOpenAIClient(api_key="bench", base_url=server.base_url)
+        model = CountingProcessor(GPTVisionProcessor(client=client))
+        processor = model if mode == "vision" else OcrPrepassProcessor(model, engine="bitmap")
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        route_latencies = {}
+        routes = {kind: {} for kind, _ in KINDS}
+        correct = expected = 0
+
+        async def request(kind, values, item):
+            nonlocal correct, expected
+            async with semaphore:
+                started = time.perf_counter()
+                response = await processor.process_content([item])
+                elapsed = time.perf_counter() - started
+            route = response.processing_metadata.get("ocr", {}).get("route", "vision")
+            latencies.append(elapsed)
+            route_latencies.setdefault(route, []).append(elapsed)
+            routes[kind][route] = routes[kind].get(route, 0) + 1
+            if route == "rules":
+                correct += _correct_fields(response, values)
+                expected += sum(1 for label in LABEL_FIELDS if label in values)
+
+        try:
+            if mode == "ocr":
+                # Start the workers and load the engine outside the timings.
+                await asyncio.gather(
+                    *(run_in_process(_warm) for _ in range(settings.WORKER_PROCESSES))
+                )
+            await asyncio.gather(*(request(*entry) for entry in corpus))
+        finally:
+            await client.aclose()
+
+    result = {
+        "model_calls": model.calls,
+        "model_calls_avoided": len(corpus) - model.calls,
+        "estimated_prompt_tokens": model.prompt_tokens,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+        },
+        "p50_ms_by_route": {
+            route: round(percentile(samples, 50) * 1000, 1)
+            for route, samples in route_latencies.items()
+        },
+        "routes": routes,
+    }
+    if mode == "ocr":
+        result["rules_fields_correct"] = f"{correct}/{expected}"
+    return result
+
+
+def _warm():
+    from app.services.ocr import get_engine
+
+    get_engine("bitmap")
+
+
+async def _run(args):
+    corpus = _corpus(args.forms, args.seed)
+    try:
+        return {mode: await _run_mode(mode, corpus, args) for mode in args.modes}
+    finally:
+        shutdown_process_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=list(MODES))
+    parser.add_argument("--forms", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=1.0, help="model seconds per call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args))
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
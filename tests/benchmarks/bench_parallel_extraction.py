@@ -0,0 +1,70 @@
+"""End-to-end extraction time for 1, 5 and 20 pages, single call vs fan-out.
+
+Runs GPTVisionProcessor against the local stub model server. Each call
+takes --latency seconds plus --latency-per-image for every page it carries.
+Usage: python -m tests.benchmarks.bench_parallel_extraction
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.openai_client import AsyncOpenAIClient
+from app.services.parallel_extraction import ParallelExtractionProcessor
+from tests.stubs.openai_server import StubOpenAIServer
+
+
+def _pages(count):
+    return [
+        {"type": "image", "image": "aGVsbG8=", "source": f"chart.pdf#p{i}", "mime_type": "image/jpeg"}
+        for i in range(1, count + 1)
+    ]
+
+
+async def _time(processor, content) -> float:
+    started = time.perf_counter()
+    await processor.process_content(content)
+    return time.perf_counter() - started
+
+
+async def _run(args, base_url):
+    client = AsyncOpenAIClient(api_key="bench", base_url=base_url)
+    single = GPTVisionProcessor(client=client)
+    fanout = ParallelExtractionProcessor(
+        single, chunk_size=args.chunk_size, max_concurrency=args.concurrency
+    )
+    results = []
+    try:
+        for count in (1, 5, 20):
+            content = _pages(count)
+            single_s = await _time(single, content)
+            fanout_s = await _time(fanout, content)
+            results.append(
+                {
+                    "pages": count,
+                    "single_call_s": round(single_s, 3),
+                    "fanout_s": round(fanout_s, 3),
+                    "speedup": round(single_s / fanout_s, 2),
+                }
+            )
+    finally:
+        await client.aclose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--latency-per-image", type=float, default=0.1)
+    parser.add_argument("--chunk-size", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubOpenAIServer(args.latency, latency_per_image=args.latency_per_image) as server:
+        results = asyncio.run(_run(args, server.base_url))
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
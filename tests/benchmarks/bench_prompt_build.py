@@ -0,0 +1,193 @@
+"""Cost of building the extraction request, and prompt tokens with prompt caching.
+
+Compares the previous request layout (the prompt rebuilt per call inside
+the user message, ahead of the notes) with the current one (a precomputed
+system message first, pages and notes after it):
+- build_us: time to build the payload for --pages pages of --image-kb each
+- prompt_chars / stable_prefix_chars: prompt text, and how much of it is
+  byte-identical between two requests with different pages and notes
+- prompt_tokens / cached_tokens: totals over --calls sequential calls to
+  the stub model server, which reports a repeated system message of 1024+
+  tokens as cached like the real API does (cached tokens are billed at a
+  discount and are faster to process)
+Usage: python -m tests.benchmarks.bench_prompt_build
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.openai_client import AsyncOpenAIClient
+from tests.stubs.openai_server import StubOpenAIServer
+
+
+class LegacyProcessor(GPTVisionProcessor):
+    """The request layout before the prompt was precomputed."""
+
+    def _create_system_message(self) -> str:
+        return """You are an expert medical form analyzer specializing in prior authorization requests. 
+        Your task is to extract specific information from medical documents, including handwritten notes, and format it precisely.
+        
+        IMPORTANT FORMATTING INSTRUCTIONS:
+        1. Return ONLY valid JSON matching the exact structure below
+        2. For each field:
+           - 'value': Extract the actual value (string) or null if not found
+           - 'confidence': Score from 0.0 to 1.0 indicating extraction confidence
+           - 'is_missing': true if field not found, false if found
+           - 'source_file': Filename where the information was found
+        3. DO NOT include any explanatory text outside the JSON structure
+        4. Ensure all JSON keys exactly match the structure below
+        5. For handwritten text, carefully transcribe exactly what is written
+
+        REQUIRED JSON STRUCTURE:
+        {
+            "patient_info": {
+                "name": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
+                "id": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
+            },
+            "procedure_info": {
+                "code": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
+                "description": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
+            },
+            "diagnosis_info": {
+                "primary_diagnosis": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
+                "symptoms": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
+                "affected_area": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
+            },
+            "treatment_info": {
+                "prescribed_treatment": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
+                "treatment_type": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
+            },
+            "insurance_info": {
+                "provider": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"},
+                "policy_number": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
+            },
+            "medical_justification": {"value": "string or null", "confidence": 0.95, "is_missing": false, "source_file": "string"}
+        }"""
+
+    def _build_request(
+        self, content: List[Dict[str, Any]], additional_context: str = None
+    ) -> Dict[str, Any]:
+        """Build the chat completion payload for the given content."""
+        # Prepare the message content
+        message_content = [
+            {
+                "type": "text",
+                "text": self._create_system_message()
+                + "\n\n"
+                + (additional_context if additional_context else ""),
+            }
+        ]
+
+        # Add images, each labelled with its source so the model can cite it
+        for item in content:
+            if item["type"] == "image":
+                message_content.append(
+                    {"type": "text", "text": f"Source file: {item['source']}"}
+                )
+                message_content.append(
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{item.get('mime_type', 'image/jpeg')};base64,{item['image']}"
+                        },
+                    }
+                )
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": message_content}],
+            "max_tokens": self.max_tokens,
+            "temperature": 0.1,
+        }
+
+
+def _pages(count, image_kb, seed):
+    return [
+        {
+            "type": "image",
+            "image": base64.b64encode(os.urandom(image_kb * 1024)).decode(),
+            "source": f"chart-{seed}.pdf#p{i}",
+            "mime_type": "image/jpeg",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def _text(payload):
+    """The prompt text of a payload, in the order it is sent."""
+    parts = []
+    for message in payload["messages"]:
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(part["text"] for part in content if part["type"] == "text")
+    return "\n".join(parts)
+
+
+def _stable_prefix(a, b):
+    a, b = json.dumps(a["messages"]), json.dumps(b["messages"])
+    length = 0
+    while length < min(len(a), len(b)) and a[length] == b[length]:
+        length += 1
+    return length
+
+
+def _build_us(processor, content, notes, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        processor._build_request(content, notes)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+async def _token_usage(processor_cls, base_url, calls, content):
+    client = AsyncOpenAIClient(api_key="bench", base_url=base_url)
+    processor = processor_cls(client=client)
+    prompt = cached = 0
+    try:
+        for i in range(calls):
+            response = await processor.process_content(content, f"request {i}")
+            prompt += response.processing_metadata["prompt_tokens"]
+            cached += response.processing_metadata.get("cached_tokens", 0)
+    finally:
+        await client.aclose()
+    return prompt, cached
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--image-kb", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    first = _pages(args.pages, args.image_kb, 1)
+    second = _pages(args.pages, args.image_kb, 2)
+    results = {}
+    with StubOpenAIServer(prompt_caching=True) as server:
+        for name, cls in (("legacy", LegacyProcessor), ("current", GPTVisionProcessor)):
+            processor = cls()
+            a = processor._build_request(first, "patient is diabetic")
+            b = processor._build_request(second, None)
+            prompt_tokens, cached_tokens = asyncio.run(
+                _token_usage(cls, server.base_url, args.calls, first)
+            )
+            results[name] = {
+                "build_us": round(_build_us(processor, first, "notes", args.repeat), 1),
+                "prompt_chars": len(_text(a)),
+                "stable_prefix_chars": _stable_prefix(a, b),
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "uncached_tokens": prompt_tokens - cached_tokens,
+            }
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Simulated burst against a rate-limited model: retries alone vs the scheduler.
+
+The stub model server enforces RPM/TPM budgets over a sliding --window of
+seconds and answers calls over budget with 429 + retry-after. Requests
+arrive open-loop at --arrival-rate per second, faster than the budget
+admits, with a 10% Emergency / 20% Urgent / 70% Standard priority mix.
+
+Modes:
+  no_retry     plain GPTVisionProcessor; every 429 is a failed request
+  retry_only   RateLimitedProcessor with budgets disabled; 429s are retried
+               after retry-after, but nothing stops the next wave overshooting
+  scheduled    RateLimitedProcessor with the scheduler's budgets set to the
+               server's limits (per --window instead of per minute), so calls
+               wait client-side by priority
+
+Reports successes, 429s seen by the server and latency per priority as JSON.
+Usage: python -m tests.benchmarks.bench_rate_limiting
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.openai_client import AsyncOpenAIClient
+from app.services.rate_limiter import ModelCallScheduler, RateLimitedProcessor
+from tests.benchmarks.harness import percentile
+from tests.stubs.openai_server import StubOpenAIServer
+
+MODES = ("no_retry", "retry_only", "scheduled")
+PRIORITY_MIX = (("Emergency", 0.1), ("Urgent", 0.2), ("Standard", 0.7))
+# A scanned letter-size page after preprocessing (about 1105 image tokens).
+CONTENT = [
+    {
+        "type": "image",
+        "image": "aGVsbG8=",
+        "source": "form.jpg",
+        "mime_type": "image/jpeg",
+        "preprocess": {"output_size": "1240x1754"},
+    }
+]
+
+
+def _priorities(count, seed):
+    rng = random.Random(seed)
+    names = [name for name, _ in PRIORITY_MIX]
+    weights = [weight for _, weight in PRIORITY_MIX]
+    return rng.choices(names, weights, k=count)
+
+
+def _scheduler(mode, args):
+    if mode == "retry_only":
+        return ModelCallScheduler(rpm=0, tpm=0)
+    return ModelCallScheduler(
+        rpm=args.rpm_limit,
+        tpm=args.tpm_limit,
+        burst=args.burst * args.window,
+        period=args.window,
+    )
+
+
+async def _run_mode(mode, args):
+    scheduler = _scheduler(mode, args)
+    with StubOpenAIServer(
+        latency=args.latency,
+        rpm_limit=args.rpm_limit,
+        tpm_limit=args.tpm_limit,
+        window=args.window,
+    ) as server:
+        client = AsyncOpenAIClient(api_key="bench", base_url=server.base_url)
+        latencies = {name: [] for name, _ in PRIORITY_MIX}
+        failures = 0
+
+        async def request(priority):
+            nonlocal failures
+            started = time.perf_counter()
+            processor = GPTVisionProcessor(client=client)
+            if mode != "no_retry":
+                processor = RateLimitedProcessor(
+                    processor, priority=priority, scheduler=scheduler
+                )
+            try:
+                await processor.process_content(CONTENT)
+            except Exception:
+                failures += 1
+                return
+            latencies[priority].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        tasks = []
+        try:
+            for priority in _priorities(args.requests, args.seed):
+                tasks.append(asyncio.create_task(request(priority)))
+                await asyncio.sleep(1 / args.arrival_rate)
+            await asyncio.gather(*tasks)
+        finally:
+            await client.aclose()
+        elapsed = time.perf_counter() - started
+
+    return {
+        "succeeded": args.requests - failures,
+        "failed": failures,
+        "server_429s": server.rate_limited,
+        "makespan_s": round(elapsed, 2),
+        "latency_ms": {
+            name: {
+                "count": len(samples),
+                "p50": round(percentile(samples, 50) * 1000, 1),
+                "p95": round(percentile(samples, 95) * 1000, 1),
+            }
+            for name, samples in latencies.items()
+        },
+    }
+
+
+async def _run(args):
+    return {mode: await _run_mode(mode, args) for mode in args.modes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=list(MODES))
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--arrival-rate", type=float, default=30.0, help="requests per second")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--window", type=float, default=1.0, help="seconds the limits apply to")
+    parser.add_argument("--rpm-limit", type=int, default=20, help="requests per window")
+    parser.add_argument("--tpm-limit", type=int, default=60000, help="tokens per window")
+    parser.add_argument(
+        "--burst", type=float, default=0.25, help="share of a window's budget spent at once"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args))
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Cold start: time from `import main` to the first response, in fresh interpreters.
+
+Each run is a new Python process, as on a serverless cold start. Reports
+the median import time, import-to-first-response time, and which heavy
+client libraries were already loaded once `main` was imported.
+Usage: python -m tests.benchmarks.bench_startup [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Libraries only some requests need; none should load during import.
+DEFERRED_MODULES = ("supabase", "sqlalchemy", "openai", "jwt", "cryptography", "PIL", "pypdfium2")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+loaded = [name for name in {deferred!r} if name in sys.modules]
+from starlette.testclient import TestClient
+with TestClient(main.app) as client:
+    status = client.get("/docs").status_code
+    responded = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (responded - started) * 1000,
+    "status": status,
+    "loaded_at_import": loaded,
+}}))
+"""
+
+
+def measure_startup(env=None) -> dict:
+    """Run one cold start in a subprocess and return its measurements."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(deferred=DEFERRED_MODULES)],
+        cwd=root,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure_startup({"LOG_LEVEL": "WARNING"}) for _ in range(args.runs)]
+    print(
+        json.dumps(
+            {
+                "config": vars(args),
+                "median_import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+                "median_first_response_ms": round(
+                    statistics.median(r["first_response_ms"] for r in runs), 1
+                ),
+                "loaded_at_import": runs[-1]["loaded_at_import"],
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Time-to-first-field: SSE streaming endpoint vs the blocking endpoint.
+
+Both endpoints are served by uvicorn on a local port (TestClient buffers
+streamed bodies) against the stub model server, which spreads --latency
+seconds of generation evenly over the streamed output.
+Usage: python -m tests.benchmarks.bench_streaming_extraction
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+
+import httpx
+from PIL import Image
+
+from app.core.config import settings
+from tests.stubs.openai_server import StubOpenAIServer
+from tests.stubs.server import BackgroundServer
+
+
+def _upload():
+    buffer = io.BytesIO()
+    Image.new("L", (200, 200), 255).save(buffer, format="PNG")
+    return [("files", ("form.png", buffer.getvalue(), "image/png"))]
+
+
+def _blocking(client) -> dict:
+    started = time.perf_counter()
+    response = client.post("/api/v1/extract-form-data/", files=_upload())
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return {"first_field_s": elapsed, "total_s": elapsed}
+
+
+def _streaming(client) -> dict:
+    started = time.perf_counter()
+    first_field = None
+    with client.stream("POST", "/api/v1/extract-form-data/stream", files=_upload()) as response:
+        for line in response.iter_lines():
+            if line == "event: section" and first_field is None:
+                first_field = time.perf_counter() - started
+            if line == "event: error":
+                raise RuntimeError("stream reported an error")
+    return {"first_field_s": first_field, "total_s": time.perf_counter() - started}
+
+
+def _summary(samples) -> dict:
+    return {
+        key: round(statistics.median(sample[key] for sample in samples), 3)
+        for key in ("first_field_s", "total_s")
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubOpenAIServer(args.latency) as server:
+        settings.OPENAI_API_BASE = server.base_url
+        settings.EXTRACTION_CACHE_BACKEND = "none"
+        from main import app
+
+        with BackgroundServer(app, lifespan="on") as api, httpx.Client(
+            base_url=api.url, timeout=60
+        ) as client:
+            blocking = _summary([_blocking(client) for _ in range(args.runs)])
+            streaming = _summary([_streaming(client) for _ in range(args.runs)])
+
+    print(
+        json.dumps(
+            {
+                "config": vars(args),
+                "blocking": blocking,
+                "streaming": streaming,
+                "first_field_speedup": round(
+                    blocking["first_field_s"] / streaming["first_field_s"], 2
+                ),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Peak RSS of validating and encoding many 10 MB uploads in parallel.
+
+The uploads are real (noise) JPEGs, so the default configuration,
+preprocessing included, is measured. Each mode runs in a fresh subprocess
+so its peak RSS is measured in isolation. Usage: python -m tests.benchmarks.bench_upload_memory [--uploads N]
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+UPLOAD_SIZE = 10 * 1024 * 1024 - 1024
+
+
+def _jpeg_payload(target: int) -> bytes:
+    """A noise JPEG of just under target bytes (noise barely compresses)."""
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    side = 2000
+    while True:
+        pixels = np.random.default_rng(0).integers(0, 256, (side, side, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=95)
+        size = buffer.tell()
+        if size <= target and size > target * 0.95:
+            return buffer.getvalue()
+        side = int(side * (target * 0.975 / size) ** 0.5)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _run(mode: str, uploads: int) -> dict:
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+
+    from app.services.file_handler import ImageFileHandler
+
+    payload = _jpeg_payload(UPLOAD_SIZE)
+    upload_size = len(payload)
+    files = []
+    for i in range(uploads):
+        # Starlette spools multipart uploads over 1 MB to disk; mimic that.
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        spooled.write(payload)
+        spooled.seek(0)
+        files.append(
+            UploadFile(
+                spooled,
+                size=len(payload),
+                filename=f"scan{i}.jpg",
+                headers=Headers({"content-type": "image/jpeg"}),
+            )
+        )
+    del payload
+
+    handler = ImageFileHandler(streaming=mode == "streaming")
+    baseline = _peak_rss_mb()
+
+    async def ingest(file):
+        await handler.validate_file(file)
+        item = await handler.process_file(file)
+        # Hold the encoded item until every upload is processed, as the endpoint does.
+        await asyncio.sleep(0.1)
+        return len(item["image"])
+
+    started = time.perf_counter()
+    encoded = await asyncio.gather(*(ingest(f) for f in files))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "uploads": uploads,
+        "upload_mb": round(upload_size / 1024 / 1024, 2),
+        "encoded_mb_total": round(sum(encoded) / 1024 / 1024, 1),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "peak_rss_growth_mb": round(_peak_rss_mb() - baseline, 1),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--mode", choices=["buffered", "streaming"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(_run(args.mode, args.uploads))))
+        return
+
+    results = {}
+    for mode in ("buffered", "streaming"):
+        output = subprocess.run(
+            [sys.executable, "-m", "tests.benchmarks.bench_upload_memory",
+             "--mode", mode, "--uploads", str(args.uploads)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    buffered = results["buffered"]["peak_rss_growth_mb"]
+    streaming = results["streaming"]["peak_rss_growth_mb"]
+    results["peak_rss_reduction_pct"] = (
+        round(100 * (buffered - streaming) / buffered, 1) if buffered else 0.0
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Closed-loop load generator and summary statistics for the benchmark scenarios.
+
+run_load keeps `concurrency` calls in flight until `requests` have been
+made and returns a summary: RPS, p50/p95/p99 latency, error count and the
+process's peak RSS while the step ran.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import os
+import resource
+import threading
+import time
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of samples (q in 0..100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def _current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+class PeakMemory:
+    """Samples RSS on a background thread and keeps the peak.
+
+    Falls back to ru_maxrss (the peak for the whole process so far) where
+    /proc is not available.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            rss = _current_rss_mb()
+            if rss is None:
+                return
+            self.peak_mb = max(self.peak_mb, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakMemory":
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        if not self.peak_mb:
+            # ru_maxrss is reported in kilobytes on Linux.
+            self.peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(
+    latencies: List[float], errors: int, elapsed: float, peak_mb: float
+) -> Dict[str, Any]:
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_mb, 1),
+    }
+
+
+async def run_load(
+    call: Callable[[int], Awaitable[bool]], concurrency: int, requests: int
+) -> Dict[str, Any]:
+    """Run call(i) for i in range(requests) with `concurrency` in flight.
+
+    call returns True on success; False or an exception counts as an error.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal errors, next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                ok = await call(index)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    with PeakMemory() as memory:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed, memory.peak_mb)
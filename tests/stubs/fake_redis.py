@@ -0,0 +1,32 @@
+"""In-process stand-in for the subset of redis.asyncio.Redis the cache uses."""
+from typing import Dict, Optional, Tuple
+import time
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self.commands = []
+
+    async def get(self, name: str) -> Optional[bytes]:
+        self.commands.append(("GET", name))
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    async def set(
+        self, name: str, value: bytes, ex: Optional[float] = None, px: Optional[int] = None
+    ) -> bool:
+        self.commands.append(("SET", name))
+        ttl = px / 1000 if px is not None else ex
+        self._data[name] = (value, time.monotonic() + ttl if ttl else None)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        self.commands.append(("DEL",) + names)
+        return sum(self._data.pop(name, None) is not None for name in names)
@@ -0,0 +1,73 @@
+"""Synthetic prior authorization forms for OCR tests and benchmarks.
+
+render_form draws a typed payer form in Pillow's built-in bitmap font, one
+"Label: value" line per field. Optionally it adds handwritten-looking
+scribbles (random strokes that no OCR engine reads), either in a note
+region or across the whole page.
+"""
+from typing import Dict, Optional
+import base64
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+FORM_VALUES = {
+    "Patient Name": "Mary Doe",
+    "Member ID": "P123456",
+    "CPT Code": "29881",
+    "Procedure": "Knee Arthroscopy",
+    "ICD-10 Code": "M17.0",
+    "Symptoms": "Knee pain and swelling",
+    "Affected Area": "Left knee",
+    "Insurance Provider": "Blue Cross Blue Shield",
+    "Policy Number": "BCBS123456",
+    "Medical Justification": "Failed 12 weeks of conservative treatment",
+}
+
+PAGE_SIZE = (1240, 1754)
+
+
+def _scribble(draw: ImageDraw.ImageDraw, rng: random.Random, box) -> None:
+    left, top, right, bottom = box
+    for _ in range(40):
+        x, y = rng.randint(left, right), rng.randint(top, bottom)
+        points = [(x, y)]
+        for _ in range(6):
+            x = min(right, max(left, x + rng.randint(-30, 30)))
+            y = min(bottom, max(top, y + rng.randint(-12, 12)))
+            points.append((x, y))
+        draw.line(points, fill=0, width=2)
+
+
+def render_form(
+    values: Optional[Dict[str, str]] = None,
+    handwritten_note: bool = False,
+    handwritten_page: bool = False,
+    seed: int = 0,
+    quality: int = 90,
+) -> str:
+    """Return a base64 JPEG of a form with the given "Label": value lines."""
+    values = FORM_VALUES if values is None else values
+    rng = random.Random(seed)
+    font = ImageFont.load_default_imagefont()
+    image = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(image)
+
+    y = 80
+    draw.text((100, y), "PRIOR AUTHORIZATION REQUEST", font=font, fill=0)
+    y += 48
+    for label, value in values.items():
+        draw.text((100, y), f"{label}: {value}", font=font, fill=0)
+        y += 32
+    if handwritten_note:
+        draw.text((100, y + 16), "Reviewer notes", font=font, fill=0)
+        _scribble(draw, rng, (100, y + 40, 900, y + 160))
+    if handwritten_page:
+        _scribble(draw, rng, (60, 60, PAGE_SIZE[0] - 60, PAGE_SIZE[1] - 60))
+        for _ in range(10):
+            _scribble(draw, rng, (60, 60, PAGE_SIZE[0] - 60, PAGE_SIZE[1] - 60))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
@@ -0,0 +1,220 @@
+"""Local stand-in for the OpenAI chat completions API."""
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import asyncio
+import json
+import math
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from tests.stubs.server import BackgroundServer
+
+SAMPLE_EXTRACTION = {
+    "patient_info": {
+        "name": {"value": "Mary Doe", "confidence": 0.95, "is_missing": False, "source_file": "form.png"},
+        "id": {"value": "P123456", "confidence": 0.9, "is_missing": False, "source_file": "form.png"},
+    },
+    "procedure_info": {
+        "code": {"value": "29881", "confidence": 0.9, "is_missing": False, "source_file": "form.png"},
+        "description": {"value": "Knee Arthroscopy", "confidence": 0.85, "is_missing": False, "source_file": "form.png"},
+    },
+    "diagnosis_info": {
+        "primary_diagnosis": {"value": "M17.0", "confidence": 0.9, "is_missing": False, "source_file": "form.png"},
+    },
+    "insurance_info": {
+        "provider": {"value": "Blue Cross Blue Shield", "confidence": 0.9, "is_missing": False, "source_file": "form.png"},
+        "policy_number": {"value": "BCBS123", "confidence": 0.8, "is_missing": False, "source_file": "form.png"},
+    },
+    "medical_justification": {"value": "Failed conservative treatment", "confidence": 0.7, "is_missing": False, "source_file": "form.png"},
+}
+
+
+class StubOpenAIServer:
+    """Serves canned chat completions on a local port after a fixed latency.
+
+    latency_per_image adds time for every image in the request, mimicking
+    how vision-model latency grows with page count. error_rate is the share
+    of calls answered with a 503, and payload_bytes pads the model output
+    with an extra key of that size.
+
+    rpm_limit and tpm_limit reject calls over budget with a 429 and a
+    retry-after, like the real API. Budgets are counted over a sliding
+    `window` of seconds (60 for per-minute limits; shorter to compress a
+    simulation). A call is charged its text at 4 characters per token,
+    tokens_per_image per image and its max_tokens; rejected calls are free.
+
+    With prompt_caching, usage is counted the same way instead of the fixed
+    1000 + 200, and a system message seen before is reported as cached in
+    128-token steps once it reaches 1024 tokens, as the real API does.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        content: Optional[Dict[str, Any]] = None,
+        latency_per_image: float = 0.0,
+        error_rate: float = 0.0,
+        payload_bytes: int = 0,
+        seed: int = 0,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        window: float = 60.0,
+        tokens_per_image: int = 1105,
+        prompt_caching: bool = False,
+    ):
+        self.latency = latency
+        self.latency_per_image = latency_per_image
+        self.error_rate = error_rate
+        self.content = content if content is not None else SAMPLE_EXTRACTION
+        if payload_bytes:
+            self.content = {**self.content, "padding": "x" * payload_bytes}
+        self._random = random.Random(seed)
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.window = window
+        self.tokens_per_image = tokens_per_image
+        self.prompt_caching = prompt_caching
+        self._cached_prefixes = set()
+        self._admitted: Deque[Tuple[float, int]] = deque()
+        self.rate_limited = 0
+        self.requests = []
+        self._server: Optional[BackgroundServer] = None
+        self.base_url = ""
+
+    def _prompt_tokens(self, body: Dict[str, Any], images: int) -> int:
+        text = 0
+        for message in body["messages"]:
+            if isinstance(message["content"], str):
+                text += len(message["content"])
+            else:
+                text += sum(len(p["text"]) for p in message["content"] if p["type"] == "text")
+        return math.ceil(text / 4) + images * self.tokens_per_image
+
+    def _cost(self, body: Dict[str, Any], images: int) -> int:
+        return self._prompt_tokens(body, images) + body.get("max_tokens", 0)
+
+    def _usage(self, body: Dict[str, Any], images: int) -> Dict[str, Any]:
+        if not self.prompt_caching:
+            return {"prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200}
+        prompt_tokens = self._prompt_tokens(body, images)
+        cached = 0
+        system = body["messages"][0]
+        if system["role"] == "system" and isinstance(system["content"], str):
+            prefix_tokens = math.ceil(len(system["content"]) / 4)
+            if prefix_tokens >= 1024 and system["content"] in self._cached_prefixes:
+                cached = prefix_tokens // 128 * 128
+            self._cached_prefixes.add(system["content"])
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 200,
+            "total_tokens": prompt_tokens + 200,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def _admit(self, cost: int) -> Optional[float]:
+        """Record the call if it fits both budgets, else return seconds to wait."""
+        now = time.monotonic()
+        while self._admitted and self._admitted[0][0] <= now - self.window:
+            self._admitted.popleft()
+        used = sum(tokens for _, tokens in self._admitted)
+        over_rpm = self.rpm_limit and len(self._admitted) + 1 > self.rpm_limit
+        over_tpm = self.tpm_limit and used + cost > self.tpm_limit
+        if not (over_rpm or over_tpm):
+            self._admitted.append((now, cost))
+            return None
+        # Wait until enough of the window has expired for this call to fit.
+        freed_requests, freed_tokens = len(self._admitted), used
+        for admitted_at, tokens in self._admitted:
+            freed_requests -= 1
+            freed_tokens -= tokens
+            fits_rpm = not self.rpm_limit or freed_requests + 1 <= self.rpm_limit
+            fits_tpm = not self.tpm_limit or freed_tokens + cost <= self.tpm_limit
+            if fits_rpm and fits_tpm:
+                return max(0.001, admitted_at + self.window - now)
+        return self.window
+
+    async def _chat_completions(self, request: Request) -> JSONResponse:
+        body = await request.json()
+        self.requests.append(body)
+        images = sum(
+            1
+            for message in body["messages"]
+            if isinstance(message["content"], list)
+            for part in message["content"]
+            if part["type"] == "image_url"
+        )
+        latency = self.latency + self.latency_per_image * images
+        if self.rpm_limit or self.tpm_limit:
+            retry_after = self._admit(self._cost(body, images))
+            if retry_after is not None:
+                self.rate_limited += 1
+                return JSONResponse(
+                    {"error": {"message": "Rate limit reached", "type": "requests"}},
+                    status_code=429,
+                    headers={"retry-after": f"{retry_after:.3f}"},
+                )
+        if self.error_rate and self._random.random() < self.error_rate:
+            await asyncio.sleep(latency)
+            return JSONResponse(
+                {"error": {"message": "The server is overloaded", "type": "server_error"}},
+                status_code=503,
+            )
+        if body.get("stream"):
+            return StreamingResponse(
+                self._stream(
+                    latency,
+                    self._usage(body, images)
+                    if body.get("stream_options", {}).get("include_usage")
+                    else None,
+                ),
+                media_type="text/event-stream",
+            )
+        await asyncio.sleep(latency)
+        return JSONResponse(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": json.dumps(self.content)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": self._usage(body, images),
+            }
+        )
+
+    async def _stream(self, latency: float, usage: Optional[Dict[str, Any]]):
+        """Emit the content in small deltas spread evenly over the latency."""
+        text = json.dumps(self.content, indent=2)
+        pieces = [text[i : i + 16] for i in range(0, len(text), 16)]
+        for piece in pieces:
+            await asyncio.sleep(latency / len(pieces))
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        if usage is not None:
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def start(self) -> str:
+        app = Starlette(routes=[Route("/v1/chat/completions", self._chat_completions, methods=["POST"])])
+        self._server = BackgroundServer(app)
+        self.base_url = self._server.start() + "/v1"
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+
+    def __enter__(self) -> "StubOpenAIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,178 @@
+"""Local stand-in for Supabase's PostgREST API, enough for the auth_requests table.
+
+Understands the requests PostgRESTAuthRequestRepository sends: eq/in/lt/
+lte/gte filters, the keyset or=(...) filter, order, limit and select, single
+and multi-row inserts (with on_conflict + ignore-duplicates) and PATCH.
+Rows live in memory.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import random
+import re
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from tests.stubs.server import BackgroundServer
+
+_KEYSET = re.compile(r'^\(submitted_at\.lt\."(?P<ts>[^"]+)",id\.lt\.(?P<id>[^)]+)\)$')
+
+
+def _split_in(value: str) -> List[str]:
+    """Parse the body of an in.(...) filter, honouring quoted values."""
+    items, current, quoted, escaped = [], "", False, False
+    for char in value[len("in.(") : -1]:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            items.append(current)
+            current = ""
+        else:
+            current += char
+    if current or items:
+        items.append(current)
+    return items
+
+
+def _matches(row: Dict[str, Any], column: str, condition: str) -> bool:
+    value = row.get(column)
+    if condition.startswith("in."):
+        return str(value) in _split_in(condition)
+    operator, _, operand = condition.partition(".")
+    if operator == "eq":
+        return str(value) == operand
+    if value is None:
+        return False
+    if operator == "lt":
+        return str(value) < operand
+    if operator == "lte":
+        return str(value) <= operand
+    if operator == "gte":
+        return str(value) >= operand
+    raise ValueError(f"Unsupported filter {column}={condition}")
+
+
+class StubPostgRESTServer:
+    """Serves /rest/v1/auth_requests after a fixed latency.
+
+    error_rate is the share of requests answered with 503 before touching
+    the data, which the repository retries.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self._random = random.Random(seed)
+        self._server: Optional[BackgroundServer] = None
+        self.url = ""
+
+    def _select(self, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows = list(self.rows.values())
+        for column, condition in params:
+            if column in ("select", "order", "limit", "on_conflict"):
+                continue
+            if column == "or":
+                match = _KEYSET.match(condition)
+                if match is None:
+                    raise ValueError(f"Unsupported or filter {condition}")
+                rows = [
+                    row
+                    for row in rows
+                    if row["submitted_at"] < match["ts"]
+                    or (row["submitted_at"] == match["ts"] and row["id"] < match["id"])
+                ]
+                continue
+            rows = [row for row in rows if _matches(row, column, condition)]
+        return rows
+
+    @staticmethod
+    def _shape(rows: List[Dict[str, Any]], params: Dict[str, str]) -> List[Dict[str, Any]]:
+        for part in reversed((params.get("order") or "").split(",")):
+            if part:
+                column, _, direction = part.partition(".")
+                rows.sort(key=lambda row: str(row.get(column)), reverse=direction == "desc")
+        if params.get("limit"):
+            rows = rows[: int(params["limit"])]
+        select = params.get("select", "*")
+        if select != "*":
+            columns = select.split(",")
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return rows
+
+    def _insert(self, records: List[Dict[str, Any]], ignore_duplicates: bool) -> List[Dict[str, Any]]:
+        inserted = []
+        keys = {
+            (row["provider_id"], row.get("idempotency_key"))
+            for row in self.rows.values()
+            if row.get("idempotency_key")
+        }
+        for record in records:
+            key = (record["provider_id"], record.get("idempotency_key"))
+            if record.get("idempotency_key") and key in keys:
+                if ignore_duplicates:
+                    continue
+                raise ValueError("duplicate key value violates unique constraint")
+            keys.add(key)
+            self.rows[record["id"]] = dict(record)
+            inserted.append(dict(record))
+        return inserted
+
+    async def _auth_requests(self, request: Request) -> Response:
+        self.requests.append((request.method, str(request.url.query)))
+        await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return JSONResponse({"message": "Service Unavailable"}, status_code=503)
+
+        params = list(request.query_params.multi_items())
+        try:
+            if request.method == "GET":
+                rows = self._shape(self._select(params), dict(params))
+            elif request.method == "POST":
+                body = json.loads(await request.body())
+                records = body if isinstance(body, list) else [body]
+                prefer = request.headers.get("prefer", "")
+                rows = self._insert(records, "resolution=ignore-duplicates" in prefer)
+            else:
+                values = json.loads(await request.body())
+                rows = self._select(params)
+                for row in rows:
+                    row.update(values)
+                rows = [dict(row) for row in rows]
+        except ValueError as e:
+            return JSONResponse({"message": str(e)}, status_code=400)
+        return JSONResponse(rows, status_code=201 if request.method == "POST" else 200)
+
+    def start(self) -> str:
+        app = Starlette(
+            routes=[
+                Route(
+                    "/rest/v1/auth_requests",
+                    self._auth_requests,
+                    methods=["GET", "POST", "PATCH"],
+                )
+            ]
+        )
+        self._server = BackgroundServer(app)
+        self.url = self._server.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+
+    def __enter__(self) -> "StubPostgRESTServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
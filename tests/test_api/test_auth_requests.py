@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.api.v1.endpoints import auth_requests
+from app.database.repositories import SQLAlchemyAuthRequestRepository
+from app.services.auth_request_service import AuthRequestService
+from app.services.cache import MemoryCacheBackend
+
+PROVIDER_ID = "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11"
+
+
+def payload(i):
+    return {
+        "patient_name": f"Patient {i}",
+        "patient_id": f"P-{i}",
+        "procedure_code": "70553",
+        "procedure_description": "MRI brain",
+        "diagnosis_code": "G43.909",
+        "diagnosis_description": "Migraine",
+        "medical_justification": "Persistent headaches",
+        "priority": "Urgent" if i % 2 else "Standard",
+        "provider_id": PROVIDER_ID,
+    }
+
+
+@pytest.fixture
+def client(tmp_path):
+    repository = SQLAlchemyAuthRequestRepository(f"sqlite:///{tmp_path / 'auth.sqlite3'}")
+    service = AuthRequestService(repository, MemoryCacheBackend())
+    app.dependency_overrides[auth_requests.get_auth_request_service] = lambda: service
+    app.dependency_overrides[auth_requests.get_current_user] = lambda: {"id": PROVIDER_ID}
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+    asyncio.run(repository.aclose())
+
+
+def test_list_pages_with_cursor_header(client):
+    for i in range(5):
+        assert client.post("/api/v1/auth-requests/", json=payload(i)).status_code == 200
+
+    first = client.get("/api/v1/auth-requests/", params={"provider_id": PROVIDER_ID, "limit": 3})
+    assert first.status_code == 200
+    assert len(first.json()) == 3
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get(
+        "/api/v1/auth-requests/",
+        params={"provider_id": PROVIDER_ID, "limit": 3, "cursor": cursor},
+    )
+    assert len(second.json()) == 2
+    assert "X-Next-Cursor" not in second.headers
+    ids = {row["id"] for row in first.json() + second.json()}
+    assert len(ids) == 5
+
+
+def test_list_projection_and_filters(client):
+    for i in range(4):
+        client.post("/api/v1/auth-requests/", json=payload(i))
+
+    response = client.get(
+        "/api/v1/auth-requests/",
+        params={"provider_id": PROVIDER_ID, "priority": "Urgent", "fields": "patient_name"},
+    )
+
+    assert response.status_code == 200
+    rows = response.json()
+    assert sorted(row["patient_name"] for row in rows) == ["Patient 1", "Patient 3"]
+    assert all(set(row) == {"id", "patient_name", "submitted_at"} for row in rows)
+
+
+def test_list_rejects_unknown_fields_and_bad_cursor(client):
+    params = {"provider_id": PROVIDER_ID}
+    assert client.get("/api/v1/auth-requests/", params={**params, "fields": "ssn"}).status_code == 400
+    assert client.get("/api/v1/auth-requests/", params={**params, "cursor": "bogus"}).status_code == 400
+    assert client.get("/api/v1/auth-requests/", params={**params, "limit": 0}).status_code == 422
+
+
+def test_bulk_create_and_status_update(client):
+    items = [payload(i) for i in range(3)] + [{"patient_name": "incomplete"}]
+    headers = {"Idempotency-Key": "upload-7"}
+
+    created = client.post("/api/v1/auth-requests/bulk", json={"requests": items}, headers=headers)
+    retried = client.post("/api/v1/auth-requests/bulk", json={"requests": items}, headers=headers)
+
+    assert created.status_code == 200
+    assert created.json()["counts"] == {"created": 3, "invalid": 1}
+    assert retried.json()["counts"] == {"existing": 3, "invalid": 1}
+
+    ids = [r["id"] for r in created.json()["results"][:3]]
+    updated = client.put("/api/v1/auth-requests/bulk/status", json={"ids": ids, "status": "DENIED"})
+    assert updated.json()["counts"] == {"updated": 3}
+    assert client.get(f"/api/v1/auth-requests/{ids[0]}").json()["status"] == "DENIED"
+
+
+def test_list_rows_match_single_item_representation(client):
+    created = client.post("/api/v1/auth-requests/", json=payload(1)).json()
+
+    listed = client.get("/api/v1/auth-requests/", params={"provider_id": PROVIDER_ID}).json()
+
+    assert listed == [created]
+    assert client.get(f"/api/v1/auth-requests/{created['id']}").json() == created
+
+
+def test_get_supports_etag_revalidation(client):
+    created = client.post("/api/v1/auth-requests/", json=payload(1)).json()
+    url = f"/api/v1/auth-requests/{created['id']}"
+
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    unchanged = client.get(url, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+
+    client.put(f"{url}/status", params={"status": "APPROVED"})
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["status"] == "APPROVED"
+    assert changed.headers["ETag"] != etag
+
+
+def test_metrics_endpoint_reports_routes_and_storage_calls(client):
+    created = client.post("/api/v1/auth-requests/", json=payload(0)).json()
+    client.get(f"/api/v1/auth-requests/{created['id']}")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'auth_request_db_seconds_count{method="create_auth_request"}' in response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/api/v1/auth-requests/{request_id}",status="200"}'
+    ) in response.text
+    assert "http_requests_in_flight 1" in response.text
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+from app.api.v1.endpoints.extraction_jobs import get_job_manager
+from app.models.response import FormExtractionResponse, FieldData
+from app.services.extraction_jobs import ExtractionJobManager
+from app.services.interfaces import AIModelProcessor
+from app.services.job_queue import MemoryJobQueue
+
+
+class StubProcessor(AIModelProcessor):
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def process_content(self, content, additional_context=None):
+        await asyncio.sleep(self.delay)
+        field = FieldData(value="x", confidence=0.9, is_missing=False, source_file=content[0]["source"])
+        return FormExtractionResponse(
+            patient_info={"name": field},
+            procedure_info={},
+            diagnosis_info={},
+            medical_justification=field,
+            insurance_info={},
+            processing_metadata={"model": "stub"},
+        )
+
+
+def png_upload():
+    buffer = io.BytesIO()
+    Image.new("L", (50, 50)).save(buffer, format="PNG")
+    return [("files", ("form.png", buffer.getvalue(), "image/png"))]
+
+
+@pytest.fixture
+def client_with_manager():
+    managers = {}
+
+    def use(delay=0.0, **kwargs):
+        processor = StubProcessor(delay)
+
+        async def factory():
+            return processor
+
+        managers["manager"] = ExtractionJobManager(factory, MemoryJobQueue(), **kwargs)
+        app.dependency_overrides[get_job_manager] = lambda: managers["manager"]
+        return TestClient(app)
+
+    yield use
+    app.dependency_overrides.pop(get_job_manager, None)
+
+
+def test_submit_and_poll(client_with_manager):
+    with client_with_manager() as client:
+        response = client.post("/api/v1/extract-jobs/", files=png_upload())
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(100):
+            job = client.get(f"/api/v1/extract-jobs/{job_id}").json()
+            if job["status"] == "succeeded":
+                break
+            time.sleep(0.02)
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["patient_info"]["name"]["source_file"] == "form.png"
+    assert job["run_ms"] is not None
+
+
+def test_full_queue_returns_429(client_with_manager):
+    with client_with_manager(delay=5, workers=1, max_depth=1) as client:
+        client.post("/api/v1/extract-jobs/", files=png_upload())
+        client.post("/api/v1/extract-jobs/", files=png_upload())
+        response = client.post("/api/v1/extract-jobs/", files=png_upload())
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+def test_unknown_job_returns_404(client_with_manager):
+    with client_with_manager() as client:
+        assert client.get("/api/v1/extract-jobs/missing").status_code == 404
+
+
+def test_callback_url_outside_the_allowlist_is_rejected(client_with_manager):
+    with client_with_manager() as client:
+        response = client.post(
+            "/api/v1/extract-jobs/",
+            files=png_upload(),
+            params={"callback_url": "http://127.0.0.1:8000/internal"},
+        )
+    assert response.status_code == 400
+    assert "not allowed" in response.json()["detail"]
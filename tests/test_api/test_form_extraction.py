@@ -1,6 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
 from main import app
+from app.api.v1.endpoints import form_extraction
+from app.services.openai_client import OpenAIAPIError
+from app.services.stub_processor import StubProcessor
 import io
 import json
 from PIL import Image
@@ -106,3 +109,75 @@ def test_field_data_structure(sample_image):
         assert "source_file" in field
         assert isinstance(field["confidence"], (int, float))
         assert isinstance(field["is_missing"], bool)
+
+
+class _Streamer:
+    """Streams one section and then fails with `error`, or fails at once if `rejected`."""
+
+    system_prompt = ""
+    max_tokens = 100
+
+    def __init__(self, error, rejected):
+        self.error = error
+        self.rejected = rejected
+
+    async def stream_content(self, content, additional_context=None):
+        if not self.rejected:
+            yield "section", {"section": "patient_info", "data": {}}
+        raise self.error
+
+
+class _RecordingScheduler:
+    def __init__(self):
+        self.settled = []
+
+    async def acquire(self, cost, priority="Standard"):
+        pass
+
+    def settle(self, estimated, actual):
+        self.settled.append((estimated, actual))
+
+
+@pytest.mark.parametrize(
+    "error, rejected, refunded",
+    [
+        (OpenAIAPIError(429, "rate limited"), True, True),
+        (Exception("connection reset"), False, False),
+    ],
+)
+def test_stream_refunds_budget_only_when_rejected(
+    monkeypatch, sample_image, error, rejected, refunded
+):
+    scheduler = _RecordingScheduler()
+    monkeypatch.setattr(form_extraction, "get_model_scheduler", lambda: scheduler)
+    monkeypatch.setitem(
+        app.dependency_overrides,
+        form_extraction.get_streaming_processor,
+        lambda: _Streamer(error, rejected),
+    )
+
+    files = [("files", ("test_image.png", sample_image, "image/png"))]
+    response = client.post("/api/v1/extract-form-data/stream", files=files)
+    assert response.status_code == 200
+    assert "event: error" in response.text
+
+    ((estimated, actual),) = scheduler.settled
+    assert actual == (0 if refunded else estimated)
+
+
+def test_partial_extraction_is_flagged_in_a_header(monkeypatch, sample_image):
+    class Partial(StubProcessor):
+        async def process_content(self, content, additional_context=None):
+            response = await super().process_content(content, additional_context)
+            response.processing_metadata.update(status="partial", missing_sources=["b.pdf#p2"])
+            return response
+
+    monkeypatch.setitem(
+        app.dependency_overrides, form_extraction.get_ai_processor, lambda: Partial()
+    )
+    files = [("files", ("test_image.png", sample_image, "image/png"))]
+    response = client.post("/api/v1/extract-form-data/", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["X-Extraction-Status"] == "partial"
+    assert response.json()["processing_metadata"]["missing_sources"] == ["b.pdf#p2"]
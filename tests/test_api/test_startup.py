@@ -0,0 +1,15 @@
+import os
+
+from tests.benchmarks.bench_startup import measure_startup
+
+
+def test_cold_start_defers_clients_and_stays_within_budget():
+    # Missing credentials must not break import; they only matter on first use.
+    result = measure_startup(
+        {"SUPABASE_URL": "", "SUPABASE_ANON_KEY": "", "LOG_LEVEL": "WARNING"}
+    )
+
+    assert result["status"] == 200
+    assert result["loaded_at_import"] == []
+    budget_ms = float(os.getenv("STARTUP_BUDGET_MS", "5000"))
+    assert result["first_response_ms"] < budget_ms, result
@@ -0,0 +1,128 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.database.repositories import SQLAlchemyAuthRequestRepository
+from app.models.auth_request import AuthRequestCreate
+from app.services.auth_request_service import AuthRequestService
+from app.services.cache import MemoryCacheBackend, RedisCacheBackend
+from tests.stubs.fake_redis import FakeRedis
+
+PROVIDER_ID = str(uuid.uuid4())
+USER = {"id": PROVIDER_ID}
+REQUEST = AuthRequestCreate(
+    patient_name="Mary Doe",
+    patient_id="P-100",
+    procedure_code="70553",
+    procedure_description="MRI brain",
+    diagnosis_code="G43.909",
+    diagnosis_description="Migraine",
+    medical_justification="Persistent headaches",
+    provider_id=PROVIDER_ID,
+)
+
+
+class CountingRepository(SQLAlchemyAuthRequestRepository):
+    gets = 0
+
+    async def get(self, request_id, provider_id=None):
+        self.gets += 1
+        return await super().get(request_id, provider_id)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def service(request, tmp_path):
+    repository = CountingRepository(f"sqlite:///{tmp_path / 'auth.sqlite3'}")
+    cache = (
+        MemoryCacheBackend(max_entries=100)
+        if request.param == "memory"
+        else RedisCacheBackend(FakeRedis(), prefix="test:")
+    )
+    yield AuthRequestService(repository, cache=cache)
+    asyncio.run(repository.aclose())
+
+
+@pytest.mark.asyncio
+async def test_lookups_read_through_the_cache(service):
+    created = await service.create_auth_request(REQUEST, USER)
+
+    first = await service.get_auth_request_json(created.id, USER)
+    second = await service.get_auth_request_json(created.id, USER)
+
+    assert first == second
+    assert service.repository.gets == 1
+    assert (await service.get_auth_request(created.id, USER)) == created
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_cached_lookups(service):
+    created = await service.create_auth_request(REQUEST, USER)
+    await service.get_auth_request(created.id, USER)
+
+    await service.update_auth_request_status(created.id, "APPROVED", USER)
+    assert (await service.get_auth_request(created.id, USER)).status == "APPROVED"
+
+    await service.update_auth_request_statuses([str(created.id)], "DENIED", USER)
+    assert (await service.get_auth_request(created.id, USER)).status == "DENIED"
+    assert service.repository.gets == 3
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl(service, monkeypatch):
+    monkeypatch.setattr("app.services.auth_request_service.settings.AUTH_REQUEST_CACHE_TTL", 0.05)
+    created = await service.create_auth_request(REQUEST, USER)
+
+    await service.get_auth_request(created.id, USER)
+    await asyncio.sleep(0.1)
+    await service.get_auth_request(created.id, USER)
+
+    assert service.repository.gets == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_requests_are_not_cached(service):
+    missing = uuid.uuid4()
+    assert await service.get_auth_request_json(missing, USER) is None
+    assert await service.get_auth_request_json(missing, USER) is None
+    assert service.repository.gets == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_sets_expiry_in_milliseconds():
+    client = FakeRedis()
+    backend = RedisCacheBackend(client, prefix="p:", default_ttl=30)
+
+    await backend.set("k", b"v")
+    await backend.set("k2", b"v", ttl=0.25)
+
+    assert await backend.get("k") == b"v"
+    await asyncio.sleep(0.3)
+    assert await backend.get("k2") is None
+    await backend.delete("k")
+    assert await backend.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_a_fill_racing_a_write_does_not_cache_the_old_row(service):
+    created = await service.create_auth_request(REQUEST, USER)
+    repository = service.repository
+    read, release = asyncio.Event(), asyncio.Event()
+    get = repository.get
+
+    async def slow_get(request_id):
+        record = await get(request_id)
+        read.set()
+        await release.wait()
+        return record
+
+    # The reader misses and reads the row, then the write lands before it fills.
+    repository.get = slow_get
+    reader = asyncio.create_task(service.get_auth_request(created.id, USER))
+    await read.wait()
+    await service.update_auth_request_status(created.id, "APPROVED", USER)
+    release.set()
+    assert (await reader).status == "PENDING"
+
+    repository.get = get
+    assert (await service.get_auth_request(created.id, USER)).status == "APPROVED"
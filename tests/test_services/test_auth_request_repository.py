@@ -0,0 +1,375 @@
+from datetime import datetime, timedelta
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+
+from app.database.repositories import (
+    PostgRESTAuthRequestRepository,
+    RepositoryError,
+    SQLAlchemyAuthRequestRepository,
+)
+from app.models.auth_request import AuthRequestCreate
+from app.services.auth_request_service import (
+    AuthRequestService,
+    decode_cursor,
+    parse_fields,
+    to_auth_request_response,
+)
+
+PROVIDER_ID = str(uuid.uuid4())
+
+
+def make_request(**overrides):
+    values = {
+        "patient_name": "Mary Doe",
+        "patient_id": "P-100",
+        "procedure_code": "70553",
+        "procedure_description": "MRI brain with and without contrast",
+        "diagnosis_code": "G43.909",
+        "diagnosis_description": "Migraine, unspecified",
+        "medical_justification": "Persistent headaches despite treatment",
+        "provider_id": PROVIDER_ID,
+    }
+    values.update(overrides)
+    return AuthRequestCreate(**values)
+
+
+@pytest.fixture
+def service(tmp_path):
+    repository = SQLAlchemyAuthRequestRepository(f"sqlite:///{tmp_path / 'auth.sqlite3'}")
+    yield AuthRequestService(repository)
+    asyncio.run(repository.aclose())
+
+
+@pytest.mark.asyncio
+async def test_service_round_trip_on_sqlite(service):
+    user = {"id": PROVIDER_ID}
+    created = await service.create_auth_request(make_request(), user)
+    await service.create_auth_request(make_request(patient_name="John Roe"), user)
+    await service.create_auth_request(make_request(), {"id": str(uuid.uuid4())})
+
+    assert created.status == "PENDING"
+    assert str(created.provider_id) == PROVIDER_ID
+    assert (await service.get_auth_request(created.id, user)).patient_name == "Mary Doe"
+    requests, next_cursor = await service.get_auth_requests(uuid.UUID(PROVIDER_ID))
+    assert len(requests) == 2 and next_cursor is None
+
+    updated = await service.update_auth_request_status(created.id, "APPROVED", user)
+    assert updated.status == "APPROVED"
+    assert updated.updated_at >= created.updated_at
+    assert await service.get_auth_request(uuid.uuid4(), user) is None
+    assert await service.update_auth_request_status(uuid.uuid4(), "DENIED", user) is None
+
+
+@pytest.mark.asyncio
+async def test_providers_cannot_read_or_change_each_others_requests(service):
+    owner = {"id": PROVIDER_ID}
+    other = {"id": str(uuid.uuid4()), "role": "authenticated"}
+    created = await service.create_auth_request(make_request(), owner)
+
+    assert await service.get_auth_request(created.id, other) is None
+    assert await service.update_auth_request_status(created.id, "APPROVED", other) is None
+    result = await service.update_auth_request_statuses([str(created.id)], "DENIED", other)
+    assert [r.status for r in result.results] == ["not_found"]
+
+    assert (await service.get_auth_request(created.id, owner)).status == "PENDING"
+    admin = {"id": str(uuid.uuid4()), "role": "service_role"}
+    assert (await service.update_auth_request_status(created.id, "APPROVED", admin)).status == "APPROVED"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_calls_overlap(service):
+    user = {"id": PROVIDER_ID}
+    created = await asyncio.gather(
+        *(service.create_auth_request(make_request(patient_id=f"P-{i}"), user) for i in range(10))
+    )
+    assert len({request.id for request in created}) == 10
+
+
+def postgrest_repository(handler, monkeypatch, max_retries=3):
+    monkeypatch.setattr("app.database.repositories.settings.SUPABASE_RETRY_BACKOFF", 0)
+    return PostgRESTAuthRequestRepository(
+        "https://example.supabase.co",
+        "service-key",
+        max_retries=max_retries,
+        transport=httpx.MockTransport(handler),
+    )
+
+
+@pytest.mark.asyncio
+async def test_postgrest_retries_reads_with_backoff(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, text="unavailable")
+        return httpx.Response(200, json=[{"id": "abc"}])
+
+    repository = postgrest_repository(handler, monkeypatch)
+    try:
+        assert await repository.get("abc") == {"id": "abc"}
+    finally:
+        await repository.aclose()
+
+    assert len(calls) == 3
+    assert calls[0].url.path == "/rest/v1/auth_requests"
+    assert calls[0].url.params["id"] == "eq.abc"
+    assert calls[0].headers["apikey"] == "service-key"
+    assert calls[0].headers["authorization"] == "Bearer service-key"
+
+
+@pytest.mark.asyncio
+async def test_postgrest_gives_up_after_max_retries(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, text="slow down")
+
+    repository = postgrest_repository(handler, monkeypatch, max_retries=2)
+    try:
+        with pytest.raises(RepositoryError) as error:
+            await repository.list_by_provider(PROVIDER_ID)
+    finally:
+        await repository.aclose()
+
+    assert error.value.status_code == 429
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_postgrest_does_not_retry_inserts_after_sending(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(503, text="unavailable")
+
+    repository = postgrest_repository(handler, monkeypatch)
+    try:
+        with pytest.raises(RepositoryError):
+            await repository.insert({"patient_name": "Mary Doe"})
+    finally:
+        await repository.aclose()
+
+    # The refused connection is retried; the 503 may have written the row, so it is not.
+    assert len(calls) == 2
+    assert calls[1].method == "POST"
+    assert calls[1].headers["prefer"] == "return=representation"
+    assert json.loads(calls[1].content) == {"patient_name": "Mary Doe"}
+
+
+async def seed(repository, count, provider_id=PROVIDER_ID):
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        record = {
+            "id": str(uuid.uuid4()),
+            "patient_name": f"Patient {i}",
+            "patient_id": f"P-{i}",
+            "procedure_code": "70553",
+            "procedure_description": "MRI brain",
+            "diagnosis_code": "G43.909",
+            "diagnosis_description": "Migraine",
+            "medical_justification": "x" * 200,
+            "priority": "Urgent" if i % 3 == 0 else "Standard",
+            "payer_id": "AETNA" if i % 2 else "CIGNA",
+            "status": "APPROVED" if i % 5 == 0 else "PENDING",
+            "provider_id": provider_id,
+            # Pairs of rows share a timestamp so the id tie-breaker is exercised.
+            "submitted_at": (base + timedelta(hours=i // 2)).isoformat(),
+            "updated_at": base.isoformat(),
+        }
+        await repository.insert(record)
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_every_row_once(service):
+    await seed(service.repository, 25)
+    await seed(service.repository, 3, provider_id=str(uuid.uuid4()))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await service.get_auth_requests(
+            uuid.UUID(PROVIDER_ID), limit=7, cursor=cursor
+        )
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 25
+    assert len({request.id for request in seen}) == 25
+    keys = [(request.submitted_at, str(request.id)) for request in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_filters_and_projection(service):
+    await seed(service.repository, 30)
+
+    page, cursor = await service.get_auth_requests(
+        uuid.UUID(PROVIDER_ID),
+        filters={
+            "status": "PENDING",
+            "payer_id": "AETNA",
+            "submitted_from": "2024-01-01T03:00:00",
+            "submitted_to": "2024-01-01T10:00:00+00:00",
+        },
+        limit=50,
+        fields=parse_fields("patient_name,status"),
+    )
+
+    assert cursor is None
+    assert page and all(set(row) == {"id", "patient_name", "status", "submitted_at"} for row in page)
+    assert all(row["status"] == "PENDING" for row in page)
+    assert all("2024-01-01T03:00:00" <= row["submitted_at"] < "2024-01-01T10:00:00" for row in page)
+    # Odd rows 7..19 are AETNA; 15 is APPROVED.
+    assert sorted(row["patient_name"] for row in page) == sorted(
+        f"Patient {i}" for i in (7, 9, 11, 13, 17, 19)
+    )
+
+
+def test_invalid_cursor_and_fields_are_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        parse_fields("patient_name,password")
+
+
+@pytest.mark.asyncio
+async def test_postgrest_list_builds_keyset_query(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=[])
+
+    repository = postgrest_repository(handler, monkeypatch)
+    try:
+        await repository.list_by_provider(
+            PROVIDER_ID,
+            filters={"status": "PENDING", "submitted_from": "2024-01-01T00:00:00"},
+            limit=20,
+            after=("2024-02-01T00:00:00", "abc"),
+            fields=["id", "submitted_at", "status"],
+        )
+    finally:
+        await repository.aclose()
+
+    params = calls[0].url.params
+    assert params["select"] == "id,submitted_at,status"
+    assert params["order"] == "submitted_at.desc,id.desc"
+    assert params["status"] == "eq.PENDING"
+    assert params.get_list("submitted_at") == [
+        "gte.2024-01-01T00:00:00",
+        "lte.2024-02-01T00:00:00",
+    ]
+    assert params["or"] == '(submitted_at.lt."2024-02-01T00:00:00",id.lt.abc)'
+    assert params["limit"] == "20"
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_is_idempotent_and_validates_per_item(service):
+    user = {"id": PROVIDER_ID}
+    items = [make_request(patient_id=f"P-{i}").model_dump(mode="json") for i in range(5)]
+    items[2] = {"patient_name": "Missing fields"}
+    items[4]["idempotency_key"] = "intake-42"
+    items.append(dict(items[4]))  # same key twice in one batch
+
+    first = await service.create_auth_requests(items, user, idempotency_key="batch-1", chunk_size=2)
+    assert [r.status for r in first.results] == [
+        "created", "created", "invalid", "created", "created", "existing"
+    ]
+    assert first.results[2].errors[0]["loc"] == ["patient_id"]
+    assert "input" not in first.results[2].errors[0]
+    assert first.results[5].id == first.results[4].id
+
+    retry = await service.create_auth_requests(items, user, idempotency_key="batch-1", chunk_size=2)
+    assert retry.counts == {"existing": 5, "invalid": 1}
+    assert [r.id for r in retry.results] == [r.id for r in first.results]
+
+    stored, _ = await service.get_auth_requests(uuid.UUID(PROVIDER_ID))
+    assert len(stored) == 4
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_without_key_inserts_every_time(service):
+    items = [make_request().model_dump(mode="json")] * 3
+    await service.create_auth_requests(items, {"id": PROVIDER_ID})
+    result = await service.create_auth_requests(items, {"id": PROVIDER_ID})
+
+    assert result.counts == {"created": 3}
+    stored, _ = await service.get_auth_requests(uuid.UUID(PROVIDER_ID))
+    assert len(stored) == 6
+
+
+@pytest.mark.asyncio
+async def test_bulk_status_update(service):
+    created = await service.create_auth_requests(
+        [make_request().model_dump(mode="json")] * 3, {"id": PROVIDER_ID}
+    )
+    ids = [str(r.id) for r in created.results] + [str(uuid.uuid4()), "nope"]
+
+    result = await service.update_auth_request_statuses(
+        ids, "APPROVED", {"id": PROVIDER_ID}, chunk_size=2
+    )
+
+    assert [r.status for r in result.results] == [
+        "updated", "updated", "updated", "not_found", "invalid"
+    ]
+    assert all(r.request.status == "APPROVED" for r in result.results[:3])
+    assert (await service.get_auth_request(created.results[0].id, {"id": PROVIDER_ID})).status == "APPROVED"
+
+
+@pytest.mark.asyncio
+async def test_postgrest_bulk_requests(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(503, text="unavailable")
+        return httpx.Response(201, json=[])
+
+    repository = postgrest_repository(handler, monkeypatch)
+    try:
+        await repository.insert_many([{"id": "a", "idempotency_key": "k,1"}])
+        await repository.update_many(["a", "b"], {"status": "DENIED"}, provider_id=PROVIDER_ID)
+        await repository.list_by_idempotency_keys(PROVIDER_ID, ['k"2'])
+    finally:
+        await repository.aclose()
+
+    # Fully keyed inserts are retried like reads.
+    assert [c.method for c in calls] == ["POST", "POST", "PATCH", "GET"]
+    assert calls[1].url.params["on_conflict"] == "provider_id,idempotency_key"
+    assert "resolution=ignore-duplicates" in calls[1].headers["prefer"]
+    assert calls[2].url.params["id"] == 'in.("a","b")'
+    assert calls[2].url.params["provider_id"] == f"eq.{PROVIDER_ID}"
+    assert calls[3].url.params["idempotency_key"] == 'in.("k\\"2")'
+
+
+@pytest.mark.parametrize(
+    "timestamp", ["2024-03-01T12:30:00", "2024-03-01T12:30:00.123456+00:00", "2024-03-01T12:30:00Z"]
+)
+def test_mapper_parses_database_rows(timestamp):
+    request_id = str(uuid.uuid4())
+    record = {
+        **make_request().model_dump(mode="json"),
+        "id": request_id,
+        "status": "PENDING",
+        "submitted_at": timestamp,
+        "updated_at": timestamp,
+        "notes": None,
+        "idempotency_key": None,
+    }
+
+    response = to_auth_request_response(record)
+
+    assert response.id == uuid.UUID(request_id)
+    assert response.submitted_at.replace(tzinfo=None, microsecond=0) == datetime(2024, 3, 1, 12, 30)
+    assert "notes" not in response.model_dump()
@@ -0,0 +1,174 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.models.response import FormExtractionResponse, FieldData
+from app.services import coalescing, extraction_cache
+from app.services.cache import MemoryCacheBackend
+from app.services.coalescing import CoalescingAIProcessor, SingleFlight
+from app.services.extraction_cache import CachingAIProcessor
+from app.services.interfaces import AIModelProcessor
+from app.services.openai_client import close_openai_client
+from tests.stubs.openai_server import StubOpenAIServer
+
+CONTENT = [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+
+
+class SlowProcessor(AIModelProcessor):
+    model = "stub-model"
+    prompt_version = "1"
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def process_content(self, content, additional_context=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        field = FieldData(value="x", confidence=0.9, is_missing=False, source_file="form.png")
+        return FormExtractionResponse(
+            patient_info={"name": field},
+            procedure_info={},
+            diagnosis_info={},
+            medical_justification=field,
+            insurance_info={},
+            processing_metadata={"model": self.model},
+        )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call():
+    inner = SlowProcessor()
+    processor = CoalescingAIProcessor(inner, SingleFlight(ttl=30))
+
+    responses = await asyncio.gather(
+        *(processor.process_content(CONTENT, "notes") for _ in range(5))
+    )
+    late = await processor.process_content(CONTENT, "notes")
+    other_notes = await processor.process_content(CONTENT, "other notes")
+
+    assert inner.calls == 2
+    assert all(r.patient_info["name"].value == "x" for r in responses)
+    assert [r.processing_metadata.get("coalesced") for r in responses].count("in_flight") == 4
+    assert late.processing_metadata["coalesced"] == "recent"
+    assert "coalesced" not in other_notes.processing_metadata
+
+    # Each caller gets its own copy to add metadata to.
+    responses[0].processing_metadata["preprocess_ms"] = 1
+    assert "preprocess_ms" not in responses[1].processing_metadata
+
+
+@pytest.mark.asyncio
+async def test_failures_reach_every_waiter_and_are_not_kept():
+    inner = SlowProcessor(error=ValueError("model down"))
+    processor = CoalescingAIProcessor(inner, SingleFlight(ttl=30))
+
+    results = await asyncio.gather(
+        *(processor.process_content(CONTENT) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+
+    with pytest.raises(ValueError):
+        await processor.process_content(CONTENT)
+    assert inner.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    inner = SlowProcessor(delay=0.1)
+    processor = CoalescingAIProcessor(inner, SingleFlight(ttl=30))
+
+    leader = asyncio.create_task(processor.process_content(CONTENT))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(processor.process_content(CONTENT))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    response = await follower
+    assert response.patient_info["name"].value == "x"
+    assert inner.calls == 1
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("L", (50, 50)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_uploads_make_one_upstream_call(monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_BACKEND", "none")
+    monkeypatch.setattr(extraction_cache, "_backend", None)
+    png = _png()
+    with StubOpenAIServer(latency=0.3) as server:
+        monkeypatch.setattr(settings, "OPENAI_API_BASE", server.base_url)
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", "test")
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(
+                    *(
+                        client.post(
+                            "/api/v1/extract-form-data/",
+                            files=[("files", ("form.png", png, "image/png"))],
+                        )
+                        for _ in range(4)
+                    )
+                )
+        finally:
+            await close_openai_client()
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len(server.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_callers_only_join_calls_of_their_priority_or_higher():
+    inner = SlowProcessor()
+    flight = SingleFlight(ttl=0)
+    standard = CoalescingAIProcessor(inner, flight, priority="Standard")
+    emergency = CoalescingAIProcessor(inner, flight, priority="Emergency")
+
+    # An Emergency request does not wait on a Standard call...
+    first, second = await asyncio.gather(
+        standard.process_content(CONTENT), emergency.process_content(CONTENT)
+    )
+    assert inner.calls == 2
+    assert "coalesced" not in second.processing_metadata
+
+    # ...but a Standard request shares an Emergency one.
+    first, second = await asyncio.gather(
+        emergency.process_content(CONTENT), standard.process_content(CONTENT)
+    )
+    assert inner.calls == 3
+    assert second.processing_metadata["coalesced"] == "in_flight"
+
+
+@pytest.mark.asyncio
+async def test_key_is_computed_once_and_passed_to_the_cache(monkeypatch):
+    keys = []
+    real_key = extraction_cache.extraction_cache_key
+
+    def counting_key(*args):
+        keys.append(real_key(*args))
+        return keys[-1]
+
+    monkeypatch.setattr(coalescing, "extraction_cache_key", counting_key)
+    monkeypatch.setattr(extraction_cache, "extraction_cache_key", counting_key)
+    cache = MemoryCacheBackend()
+    inner = SlowProcessor()
+    processor = CoalescingAIProcessor(CachingAIProcessor(inner, cache), SingleFlight(ttl=0))
+
+    await processor.process_content(CONTENT)
+    assert len(keys) == 1
+    assert await cache.get(keys[0]) is not None
+    assert keys[0] == real_key(CONTENT, None, "stub-model", "1")
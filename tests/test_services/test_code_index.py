@@ -0,0 +1,158 @@
+import asyncio
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.database.repositories import SQLAlchemyAuthRequestRepository
+from app.models.auth_request import AuthRequestCreate
+from app.models.response import FieldData
+from app.services.auth_request_service import AuthRequestService
+from app.services.code_index import (
+    DEFAULT_CODE_SET_DIR,
+    CodeCheckingProcessor,
+    CodeIndex,
+    get_code_index,
+    normalize_key,
+)
+from app.services.stub_processor import StubProcessor
+
+PROVIDER_ID = str(uuid.uuid4())
+
+
+def test_codes_are_normalized_corrected_or_rejected():
+    assert normalize_key("diagnosis", "ICD-10: m17.0") == "M170"
+    assert normalize_key("procedure", "CPT 29881-RT") == "29881"
+    assert normalize_key("procedure", "2988 1") == "29881"
+
+    results = get_code_index("diagnosis").lookup_many(
+        ["g43.909", "Ml7.0", "080", "M17.9", "not a code"]
+    )
+    assert [(r["code"], r["status"]) for r in results] == [
+        ("G43.909", "valid"),
+        ("M17.0", "corrected"),
+        ("O80", "corrected"),
+        ("M17.9", "invalid"),
+        (None, "invalid"),
+    ]
+    assert results[3]["suggestions"] == ["M17.0", "N17.9"]
+
+    index = get_code_index("procedure")
+    # O is often read for 0; 29881 is one edit away but not a confusion.
+    assert index.lookup("2988O")["status"] == "corrected"
+    assert index.lookup("29882")["suggestions"] == ["29880", "29881", "29888"]
+    assert index.describe(index.lookup("29882")) == (
+        "Unknown CPT/HCPCS code; did you mean 29880, 29881, 29888?"
+    )
+
+
+def test_compiled_index_is_memory_mapped_and_rebuilt_when_the_set_changes(tmp_path):
+    source = tmp_path / "procedure_codes.txt"
+    source.write_text("# sample\n99213 Office visit\n29881\n99213\n")
+    cache_dir = str(tmp_path / "cache")
+
+    index = CodeIndex.load("procedure", str(source), cache_dir)
+    assert list(index.codes) == [b"29881", b"99213"]
+    assert len(os.listdir(cache_dir)) == 1
+    assert isinstance(CodeIndex.load("procedure", str(source), cache_dir).codes, np.memmap)
+
+    source.write_text("29881\n99213\n27447\n")
+    assert len(CodeIndex.load("procedure", str(source), cache_dir)) == 3
+    assert len(os.listdir(cache_dir)) == 2
+
+    source.write_text("29881\nM17.0\n")
+    with pytest.raises(ValueError, match=":2: not a CPT/HCPCS code"):
+        CodeIndex.load("procedure", str(source), cache_dir)
+
+
+@pytest.mark.asyncio
+async def test_extracted_codes_are_replaced_by_their_checked_form():
+    class Extracted(StubProcessor):
+        async def process_content(self, content, additional_context=None):
+            response = await super().process_content(content, additional_context)
+            response.procedure_info["code"] = FieldData(
+                value="CPT 2988l", confidence=0.8, is_missing=False, source_file="a.jpg"
+            )
+            response.diagnosis_info["primary_diagnosis"] = FieldData(
+                value="not legible", confidence=0.2, is_missing=False, source_file="a.jpg"
+            )
+            return response
+
+    response = await CodeCheckingProcessor(Extracted()).process_content(
+        [{"type": "image", "image": "", "source": "a.jpg"}]
+    )
+    assert response.procedure_info["code"].value == "29881"
+    assert response.procedure_info["code"].confidence == 0.8
+    assert response.diagnosis_info["primary_diagnosis"].value == "not legible"
+    codes = response.processing_metadata["codes"]
+    assert codes["procedure_info.code"]["status"] == "corrected"
+    assert codes["diagnosis_info.primary_diagnosis"]["status"] == "invalid"
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CODE_INDEX", True)
+    repository = SQLAlchemyAuthRequestRepository(f"sqlite:///{tmp_path / 'auth.sqlite3'}")
+    yield AuthRequestService(repository)
+    asyncio.run(repository.aclose())
+
+
+def _item(**overrides):
+    values = {
+        "patient_name": "Mary Doe",
+        "patient_id": "P-100",
+        "procedure_code": "70553",
+        "procedure_description": "MRI brain with and without contrast",
+        "diagnosis_code": "G43.909",
+        "diagnosis_description": "Migraine, unspecified",
+        "medical_justification": "Persistent headaches despite treatment",
+        "provider_id": PROVIDER_ID,
+    }
+    values.update(overrides)
+    return values
+
+
+@pytest.mark.asyncio
+async def test_submitted_codes_are_checked(service):
+    user = {"id": PROVIDER_ID}
+    created = await service.create_auth_request(
+        AuthRequestCreate(**_item(diagnosis_code="g43909")), user
+    )
+    assert created.diagnosis_code == "G43.909"
+    with pytest.raises(ValueError, match="procedure_code: Unknown CPT/HCPCS code"):
+        await service.create_auth_request(AuthRequestCreate(**_item(procedure_code="70554")), user)
+
+    result = await service.create_auth_requests(
+        [_item(), _item(procedure_code="7O553"), _item(diagnosis_code="xyz"), {"patient_name": "x"}],
+        user,
+    )
+    assert [r.status for r in result.results] == ["created", "invalid", "invalid", "invalid"]
+    (error,) = result.results[1].errors
+    assert error["loc"] == ["procedure_code"] and error["ctx"] == {"suggestions": ["70553"]}
+    assert result.results[2].errors[0]["msg"] == "Malformed ICD-10-CM code"
+    assert result.counts == {"created": 1, "invalid": 3}
+
+
+def test_sample_code_sets_are_well_formed():
+    for kind in ("procedure", "diagnosis"):
+        assert len(get_code_index(kind)) > 50
+    assert os.path.isdir(DEFAULT_CODE_SET_DIR)
+
+
+def test_edited_code_set_is_reloaded_and_changes_the_cache_key(tmp_path, monkeypatch):
+    for filename, codes in (("procedure_codes.txt", "29881\n"), ("diagnosis_codes.txt", "M17.0\n")):
+        (tmp_path / filename).write_text(codes)
+    monkeypatch.setattr(settings, "CODE_SET_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "CODE_INDEX_CACHE_DIR", str(tmp_path / "cache"))
+    processor = CodeCheckingProcessor(StubProcessor())
+    before = processor.prompt_version
+    assert before.startswith(f"{StubProcessor().prompt_version}+codes:")
+    assert get_code_index("procedure").lookup("27447")["status"] == "invalid"
+
+    source = tmp_path / "procedure_codes.txt"
+    source.write_text("29881\n27447\n")
+    os.utime(source, ns=(0, 10**18))
+    assert processor.prompt_version != before
+    assert get_code_index("procedure").lookup("27447")["status"] == "valid"
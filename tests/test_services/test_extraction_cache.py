@@ -0,0 +1,73 @@
+import pytest
+
+from app.models.response import FormExtractionResponse, FieldData
+from app.services.cache import MemoryCacheBackend, SQLiteCacheBackend
+from app.services.extraction_cache import CachingAIProcessor
+from app.services.interfaces import AIModelProcessor
+
+CONTENT = [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+
+
+class CountingProcessor(AIModelProcessor):
+    model = "stub-model"
+    prompt_version = "1"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def process_content(self, content, additional_context=None):
+        self.calls += 1
+        field = FieldData(value="x", confidence=0.9, is_missing=False, source_file="form.png")
+        return FormExtractionResponse(
+            patient_info={"name": field},
+            procedure_info={},
+            diagnosis_info={},
+            medical_justification=field,
+            insurance_info={},
+            processing_metadata={"model": self.model},
+        )
+
+
+@pytest.mark.asyncio
+async def test_identical_inputs_hit_cache():
+    inner = CountingProcessor()
+    processor = CachingAIProcessor(inner, MemoryCacheBackend())
+
+    first = await processor.process_content(CONTENT, "notes")
+    second = await processor.process_content(CONTENT, "notes")
+    other_notes = await processor.process_content(CONTENT, "other notes")
+
+    assert inner.calls == 2
+    assert first.processing_metadata["cache"] == "miss"
+    assert second.processing_metadata["cache"] == "hit"
+    assert second.patient_info["name"].value == "x"
+    assert other_notes.processing_metadata["cache"] == "miss"
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_lru_and_expired(monkeypatch):
+    backend = MemoryCacheBackend(max_entries=2)
+    await backend.set("a", b"1")
+    await backend.set("b", b"2")
+    await backend.get("a")
+    await backend.set("c", b"3")
+    assert await backend.get("b") is None
+    assert await backend.get("a") == b"1"
+
+    await backend.set("d", b"4", ttl=0.01)
+    monkeypatch.setattr("app.services.cache.time.monotonic", lambda: 1e12)
+    assert await backend.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path)
+    await backend.set("key", b"value", ttl=60)
+    backend.close()
+
+    reopened = SQLiteCacheBackend(path)
+    assert await reopened.get("key") == b"value"
+    await reopened.delete("key")
+    assert await reopened.get("key") is None
+    reopened.close()
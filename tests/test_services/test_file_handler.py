@@ -0,0 +1,111 @@
+import base64
+import io
+import random
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.services.file_handler import ImageFileHandler
+from app.services.worker_pool import shutdown_process_pool
+from app.utils.helpers import MAGIC_BYTES_LENGTH
+
+
+def make_png() -> bytes:
+    # Noise, so the PNG stays larger than the size caps below.
+    noise = random.Random(0).randbytes(64 * 64 * 3)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), noise).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+PNG_BYTES = make_png()
+
+
+class CountingBytesIO(io.BytesIO):
+    """Records how many bytes were read, to show a cap stops reading early."""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def make_upload(data: bytes, content_type: str, size=None) -> UploadFile:
+    return UploadFile(
+        CountingBytesIO(data),
+        size=size,
+        filename="upload.bin",
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+@pytest.fixture(autouse=True)
+def process_pool():
+    yield
+    shutdown_process_pool()
+
+
+@pytest.mark.asyncio
+async def test_streaming_matches_buffered_encoding(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1000)
+    streamed = await ImageFileHandler(streaming=True).process_file(
+        make_upload(PNG_BYTES, "image/png")
+    )
+    buffered = await ImageFileHandler(streaming=False).process_file(
+        make_upload(PNG_BYTES, "image/png")
+    )
+
+    assert streamed["image"] == buffered["image"]
+    assert streamed["preprocess"]["bytes_in"] == len(PNG_BYTES)
+    assert Image.open(io.BytesIO(base64.b64decode(streamed["image"]))).size == (64, 64)
+
+
+@pytest.mark.asyncio
+async def test_streaming_base64_matches_buffered_without_preprocessing(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1000)
+    streamed = await ImageFileHandler(streaming=True, preprocess=False).process_file(
+        make_upload(PNG_BYTES, "image/png")
+    )
+    buffered = await ImageFileHandler(streaming=False, preprocess=False).process_file(
+        make_upload(PNG_BYTES, "image/png")
+    )
+
+    assert streamed["image"] == buffered["image"]
+    assert base64.b64decode(streamed["image"]) == PNG_BYTES
+    assert streamed["mime_type"] == "image/png"
+
+
+@pytest.mark.asyncio
+async def test_mime_type_is_sniffed_not_trusted():
+    handler = ImageFileHandler(streaming=True)
+    with pytest.raises(HTTPException) as exc:
+        await handler.validate_file(make_upload(b"MZ\x90\x00 not an image", "image/png"))
+    assert exc.value.status_code == 400
+    assert await handler.process_file(make_upload(b"MZ\x90\x00 not an image", "image/png")) is None
+
+    upload = make_upload(PNG_BYTES, "application/octet-stream")
+    assert await handler.validate_file(upload)
+    assert (await handler.process_file(upload))["preprocess"]["original_size"] == "64x64"
+
+
+@pytest.mark.asyncio
+async def test_size_cap_enforced_while_streaming(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 4096)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1024)
+    upload = make_upload(PNG_BYTES, "image/png")
+    with pytest.raises(HTTPException) as exc:
+        await ImageFileHandler(streaming=True).process_file(upload)
+    assert "size" in exc.value.detail.lower()
+    # Rejected as the bytes arrived (after sniffing), not after reading the whole upload.
+    assert upload.file.bytes_read <= MAGIC_BYTES_LENGTH + 4096 + 1024 < len(PNG_BYTES)
+
+    # A declared size over the cap is rejected before any bytes are read.
+    upload = make_upload(PNG_BYTES, "image/png", size=len(PNG_BYTES))
+    with pytest.raises(HTTPException):
+        await ImageFileHandler(streaming=True).process_file(upload)
+    assert upload.file.bytes_read == 0
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.models.response import FieldData, FormExtractionResponse
+from app.services.extraction_prompt import OUTPUT_SCHEMA, SECTIONS, SYSTEM_PROMPT
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.openai_client import AsyncOpenAIClient
+from app.services.rate_limiter import ModelCallScheduler, RateLimitedProcessor
+from tests.stubs.openai_server import SAMPLE_EXTRACTION, StubOpenAIServer
+
+LATENCY = 0.5
+CONTENT = [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+
+
+@pytest.fixture
+def stub_server():
+    with StubOpenAIServer(latency=LATENCY) as server:
+        yield server
+
+
+@pytest.mark.asyncio
+async def test_process_content_uses_async_client(stub_server):
+    client = AsyncOpenAIClient(api_key="test", base_url=stub_server.base_url)
+    try:
+        response = await GPTVisionProcessor(client=client).process_content(CONTENT)
+    finally:
+        await client.aclose()
+
+    assert response.patient_info["name"].value == "Mary Doe"
+    assert response.processing_metadata["total_tokens"] == 1200
+    assert stub_server.requests[0]["model"] == "gpt-4.1"
+
+
+@pytest.mark.asyncio
+async def test_parallel_extractions_finish_in_time_of_one(stub_server):
+    """N concurrent extractions overlap instead of serializing on the loop."""
+    parallel = 10
+    client = AsyncOpenAIClient(api_key="test", base_url=stub_server.base_url)
+    processor = GPTVisionProcessor(client=client)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.05)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            *(processor.process_content(CONTENT) for _ in range(parallel))
+        )
+    finally:
+        elapsed = time.perf_counter() - started
+        ticker_task.cancel()
+        await client.aclose()
+
+    assert len(results) == parallel
+    assert len(stub_server.requests) == parallel
+    # Serial execution would take parallel * LATENCY seconds.
+    assert elapsed < LATENCY * 2
+    # The event loop kept running other tasks while the calls were in flight.
+    assert ticks >= int(LATENCY / 0.05) // 2
+
+
+@pytest.mark.asyncio
+async def test_stream_content_emits_sections_before_completion(stub_server):
+    client = AsyncOpenAIClient(api_key="test", base_url=stub_server.base_url)
+    events = []
+    started = time.perf_counter()
+    try:
+        async for event, data in GPTVisionProcessor(client=client).stream_content(CONTENT):
+            events.append((event, data, time.perf_counter() - started))
+    finally:
+        await client.aclose()
+
+    sections = [data["section"] for event, data, _ in events if event == "section"]
+    assert sections == [
+        "patient_info", "procedure_info", "diagnosis_info", "insurance_info", "medical_justification"
+    ]
+    assert events[0][1]["data"]["name"]["value"] == "Mary Doe"
+    assert events[0][2] < LATENCY / 2
+    event, response, _ = events[-1]
+    assert event == "complete"
+    assert response.processing_metadata["total_tokens"] == 1200
+    assert response.processing_metadata["first_section_ms"] < LATENCY * 1000 / 2
+
+
+def test_request_starts_with_the_same_system_prompt_and_ends_with_notes():
+    processor = GPTVisionProcessor()
+    first = processor._build_request(CONTENT, "urgent review")
+    second = processor._build_request(
+        [{"type": "image", "image": "d29ybGQ=", "source": "other.png"}]
+    )
+
+    assert first["messages"][0] == second["messages"][0] == {
+        "role": "system",
+        "content": SYSTEM_PROMPT,
+    }
+    assert first["prompt_cache_key"] == second["prompt_cache_key"]
+    assert first["messages"][1]["content"][-1] == {
+        "type": "text",
+        "text": "Additional notes: urgent review",
+    }
+    assert second["messages"][1]["content"][-1]["type"] == "image_url"
+
+
+def test_output_schema_covers_every_response_section():
+    sections = set(FormExtractionResponse.model_fields) - {"processing_metadata"}
+    assert set(OUTPUT_SCHEMA["properties"]) == sections
+    field = OUTPUT_SCHEMA["properties"]["patient_info"]["properties"]["name"]
+    assert set(field["required"]) == set(FieldData.model_fields)
+
+
+@pytest.mark.asyncio
+async def test_cached_prompt_tokens_are_reported():
+    with StubOpenAIServer(prompt_caching=True) as server:
+        client = AsyncOpenAIClient(api_key="test", base_url=server.base_url)
+        processor = GPTVisionProcessor(client=client)
+        try:
+            first = await processor.process_content(CONTENT)
+            second = await processor.process_content(CONTENT, "different notes")
+        finally:
+            await client.aclose()
+
+    assert first.processing_metadata["cached_tokens"] == 0
+    assert second.processing_metadata["cached_tokens"] >= 1024
+
+
+class ScriptedClient:
+    """Answers chat completions with the given output texts (or errors), in order."""
+
+    def __init__(self, *outputs):
+        self.outputs = list(outputs)
+        self.payloads = []
+
+    async def chat_completion(self, payload):
+        self.payloads.append(payload)
+        output = self.outputs.pop(0)
+        if isinstance(output, Exception):
+            raise output
+        usage = {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100}
+        return {"choices": [{"message": {"content": output}}], "usage": usage}
+
+
+@pytest.mark.asyncio
+async def test_truncated_output_retries_only_the_missing_sections():
+    text = json.dumps(SAMPLE_EXTRACTION)
+    truncated = text[: text.index('"insurance_info"')]
+    rest = {name: SAMPLE_EXTRACTION[name] for name in ("insurance_info", "medical_justification")}
+    client = ScriptedClient("```json\n" + truncated, json.dumps(rest))
+
+    response = await GPTVisionProcessor(client=client).process_content(CONTENT, "notes")
+
+    first, retry = client.payloads
+    assert first["response_format"]["json_schema"]["schema"]["required"] == list(SECTIONS)
+    assert retry["messages"][:2] == first["messages"]
+    assert retry["messages"][2]["content"].endswith("medical_justification, insurance_info")
+    assert set(retry["response_format"]["json_schema"]["schema"]["properties"]) == set(rest)
+
+    assert response.patient_info["name"].value == "Mary Doe"
+    assert response.insurance_info == GPTVisionProcessor()._map_field_data(
+        SAMPLE_EXTRACTION["insurance_info"]
+    )
+    assert response.processing_metadata["output_repair"] == "partial"
+    assert set(response.processing_metadata["retried_sections"]) == set(rest)
+    assert response.processing_metadata["total_tokens"] == 2200
+
+
+@pytest.mark.asyncio
+async def test_unrecovered_sections_are_left_missing():
+    text = json.dumps(SAMPLE_EXTRACTION)
+    truncated = text[: text.index('"insurance_info"')]
+    client = ScriptedClient(truncated, "Sorry, I can't read that.")
+    processor = GPTVisionProcessor(client=client)
+
+    response = await processor.process_content(CONTENT)
+    assert len(client.payloads) == 2
+    assert response.insurance_info == {}
+    assert response.medical_justification.is_missing
+
+    processor = GPTVisionProcessor(client=ScriptedClient("Sorry, I can't read that."))
+    processor.section_retries = 0
+    with pytest.raises(Exception, match="Failed to parse"):
+        await processor.process_content(CONTENT)
+
+
+@pytest.mark.asyncio
+async def test_section_retries_are_scheduled_and_failures_keep_the_partial_result():
+    class CountingScheduler(ModelCallScheduler):
+        def __init__(self):
+            super().__init__(rpm=0, tpm=0)
+            self.admitted = []
+
+        async def acquire(self, cost, priority="Standard"):
+            self.admitted.append(priority)
+            await super().acquire(cost, priority)
+
+    text = json.dumps(SAMPLE_EXTRACTION)
+    truncated = text[: text.index('"insurance_info"')]
+    client = ScriptedClient(truncated, httpx.ReadTimeout("timed out"))
+    processor = GPTVisionProcessor(client=client)
+    processor.section_retries = 1
+    scheduler = CountingScheduler()
+
+    response = await RateLimitedProcessor(
+        processor, priority="Urgent", scheduler=scheduler
+    ).process_content(CONTENT)
+    assert scheduler.admitted == ["Urgent", "Urgent"]
+    assert response.patient_info["name"].value == "Mary Doe"
+    assert response.medical_justification.is_missing
@@ -0,0 +1,41 @@
+import io
+
+from PIL import Image
+
+from app.services.image_preprocessor import preprocess_image, summarize_preprocessing
+
+
+def encode(image: Image.Image, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", **kwargs)
+    return buffer.getvalue()
+
+
+def test_downscales_rotates_and_drops_colour_from_scans():
+    scan = Image.new("RGB", (4000, 3000), (250, 250, 250))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    data = encode(scan, exif=exif.tobytes())
+
+    output, mime_type, stats = preprocess_image(data, 2048, "JPEG", 85, 16)
+    result = Image.open(io.BytesIO(output))
+
+    assert mime_type == "image/jpeg"
+    assert result.size == (1536, 2048)
+    assert result.mode == "L"
+    assert stats["bytes_in"] == len(data)
+    assert stats["bytes_out"] == len(output)
+    assert stats["original_size"] == "4000x3000"
+
+
+def test_keeps_colour_and_supports_webp():
+    photo = Image.new("RGB", (300, 200), (200, 30, 30))
+    output, mime_type, stats = preprocess_image(encode(photo), 2048, "WEBP", 80, 16)
+
+    assert mime_type == "image/webp"
+    assert Image.open(io.BytesIO(output)).mode == "RGB"
+    assert stats["grayscale"] is False
+
+    summary = summarize_preprocessing([{"source": "a.jpg", "preprocess": stats}])
+    assert summary["preprocess_bytes_out"] == len(output)
+    assert "a.jpg" in summary["preprocess_images"]
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from app.utils.json_stream import IncrementalObjectParser, parse_model_json
+
+DOCUMENT = {
+    "patient_info": {"name": {"value": 'Mary "M" Doe, {jr} \\ end', "confidence": 0.9}},
+    "codes": [1, [2, 3], {"a": "]"}],
+    "medical_justification": {"value": None, "confidence": 0.0},
+    "count": 3,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1000])
+def test_members_emitted_in_order_at_any_chunking(chunk_size):
+    text = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    parser = IncrementalObjectParser()
+    emitted = []
+    for start in range(0, len(text), chunk_size):
+        emitted.extend(parser.feed(text[start : start + chunk_size]))
+
+    assert emitted == list(DOCUMENT.items())
+    assert parser.result() == DOCUMENT
+
+
+def test_section_emitted_before_document_ends():
+    text = json.dumps(DOCUMENT)
+    cut = text.index('"codes"')
+    parser = IncrementalObjectParser()
+
+    assert parser.feed(text[:cut]) == [("patient_info", DOCUMENT["patient_info"])]
+    with pytest.raises(ValueError):
+        parser.result()
+
+
+def test_parse_model_json_salvages_what_it_can():
+    text = json.dumps(DOCUMENT)
+    assert parse_model_json(text) == (DOCUMENT, None)
+    assert parse_model_json("Here you go:\n```json\n" + text + "\n```") == (
+        DOCUMENT,
+        "extracted",
+    )
+
+    truncated = text[: text.index('"count"') + 5]
+    data, repair = parse_model_json(truncated)
+    assert repair == "partial"
+    assert data == {k: v for k, v in DOCUMENT.items() if k != "count"}
+
+    malformed = '{"patient_info": {"name": 1}, "codes": [1,, 2], "count": 3}'
+    assert parse_model_json(malformed) == ({"patient_info": {"name": 1}, "count": 3}, "partial")
+
+    with pytest.raises(ValueError):
+        parse_model_json("I cannot help with that.")
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.database.repositories import PostgRESTAuthRequestRepository
+from tests.benchmarks.harness import percentile, run_load
+from tests.stubs.postgrest_server import StubPostgRESTServer
+
+PROVIDER_ID = "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11"
+
+
+def row(i, **values):
+    record = {
+        "id": f"00000000-0000-4000-8000-{i:012d}",
+        "patient_name": f"Patient {i}",
+        "status": "PENDING",
+        "provider_id": PROVIDER_ID,
+        "submitted_at": f"2024-01-01T00:00:{i:02d}",
+        "idempotency_key": None,
+    }
+    record.update(values)
+    return record
+
+
+def test_percentile_uses_nearest_rank():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_run_load_bounds_concurrency_and_counts_errors():
+    in_flight = peak = 0
+
+    async def call(i):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        if i % 5 == 0:
+            raise RuntimeError("boom")
+        return i % 5 != 1
+
+    summary = await run_load(call, concurrency=4, requests=20)
+
+    assert peak == 4
+    assert summary["requests"] == 20
+    assert summary["errors"] == 8
+    assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"]
+    assert summary["rps"] > 0 and summary["peak_rss_mb"] > 0
+
+
+@pytest.mark.asyncio
+async def test_postgrest_stub_speaks_the_repository_dialect():
+    with StubPostgRESTServer() as server:
+        repository = PostgRESTAuthRequestRepository(server.url, "key")
+        try:
+            for i in range(5):
+                await repository.insert(row(i))
+            first = await repository.list_by_provider(PROVIDER_ID, limit=2, fields=["id", "submitted_at"])
+            after = (first[-1]["submitted_at"], first[-1]["id"])
+            rest = await repository.list_by_provider(PROVIDER_ID, after=after)
+
+            keyed = [row(10, idempotency_key="k1"), row(11, idempotency_key="k2")]
+            assert len(await repository.insert_many(keyed)) == 2
+            assert await repository.insert_many([row(12, idempotency_key="k1")]) == []
+            existing = await repository.list_by_idempotency_keys(PROVIDER_ID, ["k1"])
+
+            stranger = str(uuid.uuid4())
+            refused = await repository.update_many([row(1)["id"]], {"status": "DENIED"}, provider_id=stranger)
+            hidden = await repository.get(row(1)["id"], provider_id=stranger)
+            updated = await repository.update_many(
+                [row(1)["id"], row(2)["id"]], {"status": "APPROVED"}, provider_id=PROVIDER_ID
+            )
+        finally:
+            await repository.aclose()
+
+    assert [r["id"] for r in first] == [row(4)["id"], row(3)["id"]]
+    assert set(first[0]) == {"id", "submitted_at"}
+    assert [r["id"] for r in rest] == [row(i)["id"] for i in (2, 1, 0)]
+    assert [r["id"] for r in existing] == [row(10)["id"]]
+    assert refused == [] and hidden is None
+    assert {r["status"] for r in updated} == {"APPROVED"} and len(updated) == 2
@@ -0,0 +1,110 @@
+import json
+import logging
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core import logging as app_logging
+from app.core.logging import (
+    REDACTED,
+    RequestIdMiddleware,
+    configure_logging,
+    log_payload,
+    redact,
+    stop_logging,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    handler = ListHandler()
+    monkeypatch.setattr(app_logging.settings, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+    configure_logging(level="DEBUG", log_format="json", handler=handler)
+
+    def lines():
+        stop_logging()  # flushes the queue
+        return [json.loads(line) for line in handler.lines]
+
+    yield lines
+    configure_logging()
+
+
+def test_redact_replaces_phi_at_any_depth():
+    row = {
+        "id": "r-1",
+        "patient_name": "Mary Doe",
+        "payer_id": "AETNA",
+        "choices": [{"message": {"role": "assistant", "content": '{"patient_info": ...}'}}],
+        "patient_info": {"name": {"value": "Mary Doe", "confidence": 0.9}},
+        "payer_name": None,
+    }
+
+    assert redact(row) == {
+        "id": "r-1",
+        "patient_name": REDACTED,
+        "payer_id": "AETNA",
+        "choices": [{"message": {"role": "assistant", "content": REDACTED}}],
+        "patient_info": {"name": REDACTED},
+        "payer_name": None,
+    }
+    assert row["patient_name"] == "Mary Doe"
+
+
+def test_payload_logs_are_sampled_redacted_and_tagged(captured, monkeypatch):
+    logger = logging.getLogger("tests.payload")
+    token = app_logging.request_id_var.set("req-42")
+    try:
+        log_payload(logger, "Created auth request", {"id": "r-1", "patient_name": "Mary Doe"})
+        monkeypatch.setattr(app_logging.settings, "LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+        log_payload(logger, "Not sampled", {"id": "r-2"})
+        logger.info("Lazy %s", "args")
+    finally:
+        app_logging.request_id_var.reset(token)
+
+    lines = captured()
+    assert [line["message"] for line in lines] == ["Created auth request", "Lazy args"]
+    assert lines[0]["payload"] == {"id": "r-1", "patient_name": REDACTED}
+    assert lines[0]["request_id"] == lines[1]["request_id"] == "req-42"
+    assert lines[0]["level"] == "DEBUG"
+
+
+def test_payload_is_not_built_when_debug_is_off(monkeypatch):
+    logger = logging.getLogger("tests.quiet")
+    monkeypatch.setattr(logger, "isEnabledFor", lambda level: False)
+    monkeypatch.setattr(app_logging, "redact", lambda payload: pytest.fail("redacted"))
+
+    log_payload(logger, "Payload", {"patient_name": "Mary Doe"})
+
+
+def test_request_id_is_propagated_and_echoed(captured):
+    async def handler(request):
+        logging.getLogger("tests.handler").info("handling")
+        return PlainTextResponse("ok")
+
+    app = RequestIdMiddleware(Starlette(routes=[Route("/", handler)]))
+    with TestClient(app) as client:
+        given = client.get("/", headers={"X-Request-ID": "abc-123"})
+        generated = client.get("/")
+        spoofed = client.get("/", headers={"X-Request-ID": "bad id\nInjected"})
+
+    assert given.headers["X-Request-ID"] == "abc-123"
+    assert len(generated.headers["X-Request-ID"]) == 32
+    assert spoofed.headers["X-Request-ID"] != "bad id\nInjected"
+
+    lines = captured()
+    handled = [line for line in lines if line["message"] == "handling"]
+    access = [line for line in lines if line["logger"] == "app.access"]
+    assert handled[0]["request_id"] == access[0]["request_id"] == "abc-123"
+    assert access[0]["message"].startswith("GET / 200 ")
@@ -0,0 +1,82 @@
+import pytest
+
+from app.core.metrics import (
+    EXTRACTION_STAGE_SECONDS,
+    OPENAI_TOKENS,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+)
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.openai_client import AsyncOpenAIClient
+from tests.stubs.openai_server import StubOpenAIServer
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = Histogram(
+        "stage_seconds", "Stage time.", ["stage"], buckets=(0.1, 1.0), registry=registry
+    )
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.labels("parse").observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP stage_seconds Stage time.", "# TYPE stage_seconds histogram"]
+    assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 'stage_seconds_sum{stage="parse"} 4.05' in lines
+    assert 'stage_seconds_count{stage="parse"} 4' in lines
+
+
+def test_counter_and_gauge():
+    registry = MetricsRegistry()
+    tokens = Counter("tokens_total", "Tokens.", ["type"], registry=registry)
+    in_flight = Gauge("in_flight", "In flight.", registry=registry)
+
+    tokens.labels("prompt").inc(10)
+    tokens.labels("prompt").inc(5)
+    tokens.labels('we"ird').inc()
+    with in_flight.track_inprogress():
+        assert in_flight.labels().value == 1
+    with pytest.raises(ValueError):
+        tokens.labels("prompt").inc(-1)
+    with pytest.raises(ValueError):
+        tokens.labels("prompt", "extra")
+    with pytest.raises(ValueError):
+        Counter("tokens_total", "Again.", registry=registry)
+
+    text = registry.render()
+    assert 'tokens_total{type="prompt"} 15' in text
+    assert 'tokens_total{type="we\\"ird"} 1' in text
+    assert "in_flight 0" in text
+
+
+@pytest.mark.asyncio
+async def test_extraction_records_stages_and_tokens():
+    def count(stage):
+        return EXTRACTION_STAGE_SECONDS.labels(stage).count
+
+    before = {stage: count(stage) for stage in ("model_call", "parse", "map_field_data")}
+    prompt_tokens = OPENAI_TOKENS.labels("gpt-4.1", "prompt").value
+
+    with StubOpenAIServer(latency=0) as server:
+        client = AsyncOpenAIClient(api_key="test", base_url=server.base_url)
+        try:
+            response = await GPTVisionProcessor(client=client).process_content(
+                [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+            )
+        finally:
+            await client.aclose()
+
+    assert {stage: count(stage) - before[stage] for stage in before} == {
+        "model_call": 1,
+        "parse": 1,
+        "map_field_data": 1,
+    }
+    assert (
+        OPENAI_TOKENS.labels("gpt-4.1", "prompt").value - prompt_tokens
+        == response.processing_metadata["prompt_tokens"]
+    )
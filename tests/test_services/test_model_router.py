@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.cache import MemoryCacheBackend
+from app.services.extraction_cache import CachingAIProcessor
+from app.services.model_router import (
+    CircuitBreaker,
+    ModelBackend,
+    ModelRouter,
+    NoModelBackendError,
+    build_backend,
+)
+from app.services.openai_client import OpenAIAPIError
+from app.services.rate_limiter import ModelCallScheduler
+from app.services.stub_processor import StubProcessor
+from tests.stubs.openai_server import StubOpenAIServer
+
+CONTENT = [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+
+
+class FailingProcessor(StubProcessor):
+    """Raises the given error on every call."""
+
+    def __init__(self, error, latency=0.0):
+        super().__init__(latency=latency, model="failing")
+        self.error = error
+        self.calls = 0
+
+    async def process_content(self, content, additional_context=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        raise self.error
+
+
+def _backend(name, processor, latencies=(), cost=0.0):
+    backend = ModelBackend(name, processor, cost=cost, rate_limited=False)
+    for seconds in latencies:
+        backend.stats.record(seconds)
+    return backend
+
+
+def test_backends_are_ranked_by_latency_errors_and_cost():
+    fast = _backend("fast", StubProcessor(), [0.5] * 20)
+    slow = _backend("slow", StubProcessor(), [2.0] * 20)
+    flaky = _backend("flaky", StubProcessor(), [0.2] * 10 + [None] * 10)
+    pricey = _backend("pricey", StubProcessor(), [0.1] * 20, cost=5.0)
+
+    router = ModelRouter([slow, flaky, pricey, fast])
+    assert [b.name for b in router.ranked()] == ["flaky", "fast", "slow", "pricey"]
+    assert fast.stats.p95() == 0.5
+    assert flaky.stats.error_rate == 0.5
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_on_the_next_backend():
+    primary = _backend("primary", StubProcessor(latency=1.0), [0.05] * 20)
+    secondary = _backend("secondary", StubProcessor(latency=0.05), [0.2] * 20)
+    router = ModelRouter([primary, secondary], max_hedges=1)
+
+    started = time.perf_counter()
+    response = await router.process_content(CONTENT)
+    assert time.perf_counter() - started < 0.5
+    assert response.processing_metadata["backend"] == "secondary"
+
+    # The losing call was cancelled and left no outcome behind.
+    await asyncio.sleep(0)
+    assert list(primary.stats.outcomes) == [0.05] * 20
+
+
+@pytest.mark.asyncio
+async def test_failures_fail_over_and_open_the_circuit():
+    clock = [0.0]
+    failing = FailingProcessor(OpenAIAPIError(503, "unavailable"))
+    broken = _backend("broken", failing, [0.01] * 20)
+    broken.breaker = CircuitBreaker(failures=2, reset=10.0, clock=lambda: clock[0])
+    router = ModelRouter([broken, _backend("local", StubProcessor(), [0.5] * 20)])
+
+    for _ in range(3):
+        response = await router.process_content(CONTENT)
+        assert response.processing_metadata["backend"] == "local"
+    assert failing.calls == 2
+    assert broken.breaker.is_open
+
+    # After the reset a single trial call goes through; it fails and reopens.
+    clock[0] = 11.0
+    await router.process_content(CONTENT)
+    assert failing.calls == 3
+    assert broken.breaker.is_open and not broken.breaker.available()
+
+    router = ModelRouter([broken])
+    with pytest.raises(NoModelBackendError):
+        await router.process_content(CONTENT)
+
+
+@pytest.mark.asyncio
+async def test_request_errors_are_not_retried_elsewhere():
+    failing = FailingProcessor(OpenAIAPIError(400, "bad image"))
+    fallback = StubProcessor()
+    router = ModelRouter([_backend("a", failing), _backend("b", fallback)])
+
+    with pytest.raises(OpenAIAPIError):
+        await router.process_content(CONTENT)
+    assert failing.calls == 1
+    assert not router.backends[0].breaker.consecutive
+
+
+@pytest.mark.asyncio
+async def test_configured_backends_route_to_the_openai_endpoint():
+    with StubOpenAIServer() as server:
+        backends = [
+            build_backend({"name": "mini", "model": "gpt-4.1-mini", "base_url": server.base_url}),
+            build_backend({"name": "local", "type": "stub", "cost": 100}),
+        ]
+        try:
+            response = await ModelRouter(backends).process_content(CONTENT)
+        finally:
+            for backend in backends:
+                await backend.aclose()
+
+    assert response.processing_metadata["backend"] == "mini"
+    assert response.patient_info["name"].value == "Mary Doe"
+    assert server.requests[0]["model"] == "gpt-4.1-mini"
+
+
+@pytest.mark.asyncio
+async def test_stub_answers_are_flagged_degraded_and_not_cached():
+    broken = _backend("broken", FailingProcessor(OpenAIAPIError(503, "unavailable")))
+    router = ModelRouter([broken, _backend("local", StubProcessor())])
+    cache = MemoryCacheBackend()
+    processor = CachingAIProcessor(router, cache)
+
+    for _ in range(2):
+        response = await processor.process_content(CONTENT)
+        assert response.processing_metadata["degraded"] is True
+        assert response.processing_metadata["cache"] == "miss"
+    assert await cache.get(processor.cache_key(CONTENT)) is None
+
+
+@pytest.mark.asyncio
+async def test_recorded_latency_excludes_rate_limit_queueing():
+    class Model(StubProcessor):
+        system_prompt = ""
+        max_tokens = 0
+
+    scheduler = ModelCallScheduler(rpm=0, tpm=0)
+    backend = ModelBackend("queued", Model(latency=0.01), scheduler=scheduler)
+    scheduler.pause(0.3)
+
+    started = time.perf_counter()
+    await backend.call("Standard", CONTENT, None)
+    assert time.perf_counter() - started >= 0.3
+    (recorded,) = backend.stats.outcomes
+    assert recorded < 0.2
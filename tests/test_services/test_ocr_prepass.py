@@ -0,0 +1,113 @@
+import pytest
+
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.ocr import analyze_page
+from app.services.ocr_prepass import FIELD_RULES, OcrPrepassProcessor, extract_fields
+from app.services.rate_limiter import estimate_tokens
+from app.services.stub_processor import StubProcessor
+from app.services.worker_pool import shutdown_process_pool
+from tests.stubs.forms import FORM_VALUES, render_form
+
+
+@pytest.fixture(autouse=True)
+def process_pool():
+    yield
+    shutdown_process_pool()
+
+
+class RecordingProcessor(StubProcessor):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def process_content(self, content, additional_context=None):
+        self.calls.append(content)
+        return await super().process_content(content, additional_context)
+
+
+def _analyze(image):
+    return analyze_page(image, "bitmap", 0.9, 0.6, 0.5)
+
+
+def test_typed_pages_are_read_and_unreadable_regions_cropped():
+    page = _analyze(render_form(quality=60))
+    assert page["route"] == "text"
+    assert page["crops"] == []
+    assert "CPT Code: 29881" in page["text"].splitlines()
+    assert ("Policy Number: BCBS123456", 1.0) in page["lines"]
+
+    page = _analyze(render_form(handwritten_note=True))
+    assert page["route"] == "text"
+    assert page["text"].endswith("Reviewer notes\n[crop 1]")
+    assert len(page["crops"]) == 1
+
+    page = _analyze(render_form(handwritten_page=True))
+    assert page["route"] == "vision"
+    assert page["text"] == ""
+
+
+def test_rules_validate_codes_and_record_empty_fields():
+    lines = [
+        ("Procedure Code: 2988", 1.0),
+        ("CPT Code: 29881", 0.95),
+        ("Procedure: Knee Arthroscopy", 1.0),
+        ("ICD-10: m17.0", 1.0),
+        ("Symptoms:", 1.0),
+        ("Reviewer notes", 1.0),
+    ]
+    fields = extract_fields([("form.png", lines)])
+
+    assert fields[("procedure_info", "code")].value == "29881"
+    assert fields[("procedure_info", "code")].confidence == 0.95
+    assert fields[("procedure_info", "description")].value == "Knee Arthroscopy"
+    assert fields[("diagnosis_info", "primary_diagnosis")].value == "M17.0"
+    assert fields[("diagnosis_info", "symptoms")].is_missing
+    assert len(fields) == 4
+
+
+@pytest.mark.asyncio
+async def test_complete_typed_form_is_answered_without_the_model():
+    inner = RecordingProcessor()
+    processor = OcrPrepassProcessor(inner, engine="bitmap")
+    content = [{"type": "image", "image": render_form(), "source": "form.jpg"}]
+
+    response = await processor.process_content(content)
+    assert inner.calls == []
+    assert response.processing_metadata["ocr"]["route"] == "rules"
+    assert response.processing_metadata["ocr"]["rule_fields"] == len(FIELD_RULES)
+    assert response.procedure_info["code"].value == "29881"
+    assert response.insurance_info["policy_number"].source_file == "form.jpg"
+    assert "+ocr:bitmap:" in processor.prompt_version
+
+    # Notes from the requester still go to the model, as text only.
+    response = await processor.process_content(content, "urgent")
+    (sent,) = inner.calls
+    assert sent[0]["type"] == "text" and "image" not in sent[0]
+    assert response.processing_metadata["ocr"]["route"] == "text"
+    # Rule fields replace the missing fields of the (stub) model answer.
+    assert response.diagnosis_info["primary_diagnosis"].value == "M17.0"
+
+
+@pytest.mark.asyncio
+async def test_partly_readable_and_handwritten_pages_go_to_the_model():
+    values = dict(FORM_VALUES)
+    del values["Symptoms"]
+    content = [
+        {"type": "image", "image": render_form(values, handwritten_note=True), "source": "a.jpg"},
+        {"type": "image", "image": render_form(handwritten_page=True), "source": "b.jpg"},
+    ]
+    inner = RecordingProcessor()
+
+    response = await OcrPrepassProcessor(inner, engine="bitmap").process_content(content)
+    (sent,) = inner.calls
+    assert [item["type"] for item in sent] == ["text", "image"]
+    assert len(sent[0]["crops"]) == 1
+    assert sent[1] is content[1]
+    assert response.processing_metadata["ocr"]["text_pages"] == 1
+
+    payload = GPTVisionProcessor()._build_request(sent)
+    parts = payload["messages"][1]["content"]
+    assert parts[0]["text"].startswith("Source file: a.jpg (OCR text)\nPRIOR AUTHORIZATION")
+    assert [part["type"] for part in parts] == ["text", "text", "image_url", "text", "image_url"]
+    # A text page costs far less than the full page image it replaces.
+    assert estimate_tokens(sent[:1]) < estimate_tokens(content[:1])
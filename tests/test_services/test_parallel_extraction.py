@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.models.response import FormExtractionResponse, FieldData
+from app.services.interfaces import AIModelProcessor
+from app.services.extraction_cache import is_cacheable
+from app.services.parallel_extraction import ParallelExtractionProcessor, chunk_content
+
+
+def field(value, confidence, source):
+    return FieldData(value=value, confidence=confidence, is_missing=value is None, source_file=source)
+
+
+class PerPageProcessor(AIModelProcessor):
+    """Finds the patient name on every page, with higher confidence on later pages."""
+
+    model = "stub-model"
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.fail_on = fail_on
+
+    async def process_content(self, content, additional_context=None):
+        self.calls.append([item["source"] for item in content])
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        source = content[-1]["source"]
+        if source == self.fail_on:
+            raise Exception("request too large")
+        page = int(source.rsplit("#p", 1)[1])
+        return FormExtractionResponse(
+            patient_info={
+                "name": field(f"name-{page}", page / 10, source),
+                "id": field("P1" if page == 1 else None, 0.9 if page == 1 else 0.0, source),
+            },
+            procedure_info={},
+            diagnosis_info={},
+            medical_justification=field(None, 0.0, source),
+            insurance_info={},
+            processing_metadata={"model": self.model, "total_tokens": 100},
+        )
+
+
+def pages(count, name="chart.pdf"):
+    return [{"type": "image", "image": "", "source": f"{name}#p{i}"} for i in range(1, count + 1)]
+
+
+def test_chunks_never_span_documents():
+    chunks = chunk_content(pages(3) + pages(2, "fax.png"), chunk_size=2)
+    assert [[item["source"] for item in chunk] for chunk in chunks] == [
+        ["chart.pdf#p1", "chart.pdf#p2"],
+        ["chart.pdf#p3"],
+        ["fax.png#p1", "fax.png#p2"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_merge_keeps_most_confident_found_value():
+    inner = PerPageProcessor()
+    processor = ParallelExtractionProcessor(inner, chunk_size=1, max_concurrency=3)
+
+    response = await processor.process_content(pages(8))
+
+    assert len(inner.calls) == 8
+    assert inner.max_active == 3
+    assert response.patient_info["name"].value == "name-8"
+    assert response.patient_info["name"].source_file == "chart.pdf#p8"
+    # A found value beats missing ones regardless of confidence.
+    assert response.patient_info["id"].value == "P1"
+    assert response.patient_info["id"].source_file == "chart.pdf#p1"
+    assert response.processing_metadata["total_tokens"] == 800
+    assert response.processing_metadata["chunks"] == 8
+    # Cached extractions are keyed by the chunk size too.
+    assert processor.prompt_version.endswith("+chunks:1")
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_does_not_fail_batch():
+    inner = PerPageProcessor(fail_on="chart.pdf#p3")
+    processor = ParallelExtractionProcessor(inner, chunk_size=1, max_concurrency=3)
+
+    response = await processor.process_content(pages(3))
+
+    assert response.patient_info["name"].value == "name-2"
+    assert response.processing_metadata["failed_chunks"] == 1
+    assert response.processing_metadata["status"] == "partial"
+    assert response.processing_metadata["missing_sources"] == ["chart.pdf#p3"]
+    assert not is_cacheable(response)
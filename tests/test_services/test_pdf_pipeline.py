@@ -0,0 +1,56 @@
+import base64
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.services.file_handler import ImageFileHandler
+from app.services.worker_pool import shutdown_process_pool
+
+
+@pytest.fixture(autouse=True)
+def process_pool():
+    yield
+    shutdown_process_pool()
+
+
+def make_pdf(pages: int) -> UploadFile:
+    images = [Image.new("RGB", (200, 260), (255, 255 - i * 40, 255)) for i in range(pages)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:])
+    data = buffer.getvalue()
+    return UploadFile(
+        io.BytesIO(data),
+        size=len(data),
+        filename="chart.pdf",
+        headers=Headers({"content-type": "application/pdf"}),
+    )
+
+
+@pytest.mark.asyncio
+async def test_pdf_pages_are_rasterized_with_page_sources(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_RASTER_DPI", 36)
+    handler = ImageFileHandler()
+    upload = make_pdf(3)
+
+    await handler.validate_file(upload)
+    items = [item async for item in handler.iter_file(upload)]
+
+    assert [item["source"] for item in items] == ["chart.pdf#p1", "chart.pdf#p2", "chart.pdf#p3"]
+    page = Image.open(io.BytesIO(base64.b64decode(items[0]["image"])))
+    assert page.format == "JPEG"
+    assert page.size == (100, 130)
+    # Preprocessed from the rendered bitmap, not from a JPEG of it.
+    assert items[0]["preprocess"]["bytes_in"] == 100 * 130 * 3
+
+
+@pytest.mark.asyncio
+async def test_pdf_page_limit(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_MAX_PAGES", 2)
+    with pytest.raises(HTTPException) as exc:
+        [item async for item in ImageFileHandler().iter_file(make_pdf(3))]
+    assert exc.value.status_code == 400
+    assert "limit" in exc.value.detail
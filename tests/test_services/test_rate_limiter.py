@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from app.models.response import FieldData, FormExtractionResponse
+from app.services.gpt_processor import GPTVisionProcessor
+from app.services.openai_client import AsyncOpenAIClient, OpenAIAPIError
+from app.services.rate_limiter import (
+    UNKNOWN_IMAGE_TOKENS,
+    ModelCallScheduler,
+    RateLimitedProcessor,
+    estimate_tokens,
+    image_tokens,
+)
+from tests.stubs.openai_server import StubOpenAIServer
+
+CONTENT = [{"type": "image", "image": "aGVsbG8=", "source": "form.png"}]
+
+
+@pytest.mark.parametrize(
+    "size, tokens",
+    [((512, 512), 255), ((1024, 1024), 765), ((1240, 1754), 1105), ((2048, 4096), 1105)],
+)
+def test_image_tokens_follow_tile_pricing(size, tokens):
+    assert image_tokens(*size) == tokens
+
+
+def test_estimate_counts_prompt_images_and_completion_budget():
+    content = [
+        {"type": "image", "source": "a.png", "preprocess": {"output_size": "1024x1024"}},
+        {"type": "image", "source": "b.png"},
+    ]
+    estimate = estimate_tokens(content, prompt="x" * 400, max_tokens=4000)
+    # 400 prompt characters plus two "Source file: x.png" labels, at 4 per token.
+    assert estimate == 4000 + 765 + UNKNOWN_IMAGE_TOKENS + 109
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_by_priority():
+    # One call per 50ms with no burst: the first is admitted, the rest queue.
+    scheduler = ModelCallScheduler(rpm=1200, tpm=0, burst=0)
+    await scheduler.acquire(1)
+    order = []
+
+    async def call(priority):
+        await scheduler.acquire(1, priority)
+        order.append(priority)
+
+    tasks = [asyncio.create_task(call(p)) for p in ("Standard", "Urgent", "Emergency")]
+    await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert order == ["Emergency", "Urgent", "Standard"]
+
+
+@pytest.mark.asyncio
+async def test_token_budget_delays_calls_until_refilled():
+    # 6000 TPM refills about 100 tokens/s; the bucket holds one second of it.
+    scheduler = ModelCallScheduler(rpm=0, tpm=6000, burst=1)
+    started = time.perf_counter()
+    await scheduler.acquire(100)
+    await scheduler.acquire(20)
+    assert time.perf_counter() - started >= 0.18
+
+    # A rejected call gives its tokens back.
+    scheduler.settle(20, 0)
+    started = time.perf_counter()
+    await scheduler.acquire(20)
+    assert time.perf_counter() - started < 0.05
+
+
+class FlakyProcessor:
+    """Raises the given errors on its first calls, then succeeds."""
+
+    model = "stub-model"
+    max_tokens = 10
+    system_prompt = ""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def process_content(self, content, additional_context=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FormExtractionResponse(
+            patient_info={},
+            procedure_info={},
+            diagnosis_info={},
+            medical_justification=FieldData(
+                value=None, confidence=0.0, is_missing=True, source_file=""
+            ),
+            insurance_info={},
+            processing_metadata={"model": self.model, "total_tokens": 5},
+        )
+
+
+@pytest.mark.asyncio
+async def test_retries_honour_retry_after_and_stop_on_client_errors():
+    scheduler = ModelCallScheduler(rpm=0, tpm=0)
+    inner = FlakyProcessor([OpenAIAPIError(429, "slow down", retry_after=0.1)])
+    started = time.perf_counter()
+    await RateLimitedProcessor(inner, scheduler=scheduler).process_content(CONTENT)
+    assert inner.calls == 2
+    assert time.perf_counter() - started >= 0.1
+
+    inner = FlakyProcessor([OpenAIAPIError(400, "bad request")])
+    with pytest.raises(OpenAIAPIError):
+        await RateLimitedProcessor(inner, scheduler=scheduler).process_content(CONTENT)
+    assert inner.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_server_calls_all_succeed_after_429s():
+    with StubOpenAIServer(rpm_limit=2, window=0.5) as server:
+        client = AsyncOpenAIClient(api_key="test", base_url=server.base_url)
+        processor = RateLimitedProcessor(
+            GPTVisionProcessor(client=client), scheduler=ModelCallScheduler(rpm=0, tpm=0)
+        )
+        try:
+            responses = await asyncio.gather(
+                *(processor.process_content(CONTENT) for _ in range(5))
+            )
+        finally:
+            await client.aclose()
+
+    assert all(r.patient_info["name"].value == "Mary Doe" for r in responses)
+    assert server.rate_limited > 0
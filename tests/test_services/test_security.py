@@ -0,0 +1,162 @@
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import auth_requests
+from app.core.security import AuthenticationError, JWTVerifier
+
+SECRET = "super-secret-jwt-token-with-at-least-32-characters"
+ISSUER = "https://example.supabase.co/auth/v1"
+JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
+
+
+def claims(**overrides):
+    values = {
+        "sub": "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11",
+        "aud": "authenticated",
+        "iss": ISSUER,
+        "role": "authenticated",
+        "email": "dr@example.com",
+        "exp": int(time.time()) + 3600,
+    }
+    values.update(overrides)
+    return values
+
+
+def rsa_key(kid):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private.public_key(), as_dict=True)
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private, jwk
+
+
+class JWKSServer:
+    def __init__(self, *jwks):
+        self.jwks = list(jwks)
+        self.fetches = 0
+
+    def __call__(self, request):
+        self.fetches += 1
+        return httpx.Response(200, json={"keys": self.jwks})
+
+
+def verifier(jwks_server=None, **kwargs):
+    return JWTVerifier(
+        jwt_secret=kwargs.pop("jwt_secret", SECRET),
+        jwks_url=JWKS_URL,
+        audience="authenticated",
+        issuer=ISSUER,
+        transport=httpx.MockTransport(jwks_server or JWKSServer()),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_hs256_token_is_verified_locally_and_cached(monkeypatch):
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *a, **k: decodes.append(1) or real_decode(*a, **k))
+    checker = verifier()
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+    try:
+        first = await checker.verify(token)
+        second = await checker.verify(token)
+    finally:
+        await checker.aclose()
+
+    assert first == second
+    assert first["email"] == "dr@example.com"
+    assert len(decodes) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "token",
+    [
+        jwt.encode(claims(exp=int(time.time()) - 120), SECRET, algorithm="HS256"),
+        jwt.encode(claims(aud="anon-app"), SECRET, algorithm="HS256"),
+        jwt.encode(claims(iss="https://evil.example/auth/v1"), SECRET, algorithm="HS256"),
+        jwt.encode(claims(), "a-different-secret-of-at-least-32-chars", algorithm="HS256"),
+        jwt.encode(claims(), None, algorithm="none"),
+        "not-a-jwt",
+    ],
+    ids=["expired", "audience", "issuer", "signature", "alg-none", "garbage"],
+)
+async def test_invalid_tokens_are_rejected(token):
+    checker = verifier()
+    try:
+        with pytest.raises(AuthenticationError):
+            await checker.verify(token)
+    finally:
+        await checker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rs256_keys_are_refetched_when_rotated(monkeypatch):
+    monkeypatch.setattr("app.core.security.settings.JWKS_MIN_REFRESH_INTERVAL", 0)
+    old_key, old_jwk = rsa_key("old")
+    new_key, new_jwk = rsa_key("new")
+    server = JWKSServer(old_jwk)
+    checker = verifier(server)
+    try:
+        old_token = jwt.encode(claims(), old_key, algorithm="RS256", headers={"kid": "old"})
+        assert (await checker.verify(old_token))["role"] == "authenticated"
+        fetches = server.fetches
+
+        server.jwks = [old_jwk, new_jwk]
+        new_token = jwt.encode(claims(), new_key, algorithm="RS256", headers={"kid": "new"})
+        await checker.verify(new_token)
+        assert server.fetches == fetches + 1
+
+        # A public key must never be accepted as an HMAC secret.
+        forged = jwt.encode(claims(), "forged-secret-of-at-least-32-characters", algorithm="HS256")
+        with pytest.raises(AuthenticationError):
+            await checker.verify(forged)
+        with pytest.raises(AuthenticationError):
+            await checker.verify(jwt.encode(claims(), new_key, algorithm="RS256", headers={"kid": "gone"}))
+    finally:
+        await checker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hs256_without_secret_uses_fallback_once():
+    calls = []
+
+    async def fallback(token):
+        calls.append(token)
+        return {"sub": "user-1", "role": "authenticated", "exp": time.time() + 3600}
+
+    checker = verifier(jwt_secret=None, fallback=fallback)
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+    try:
+        await checker.verify(token)
+        await checker.verify(token)
+    finally:
+        await checker.aclose()
+
+    assert calls == [token]
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_maps_claims(monkeypatch):
+    checker = verifier()
+    monkeypatch.setattr(auth_requests, "get_jwt_verifier", lambda: checker)
+    try:
+        user = await auth_requests.get_current_user(
+            f"Bearer {jwt.encode(claims(), SECRET, algorithm='HS256')}"
+        )
+        with pytest.raises(HTTPException) as error:
+            await auth_requests.get_current_user("Bearer not-a-jwt")
+    finally:
+        await checker.aclose()
+
+    assert user == {
+        "id": "2b1f7a4e-5c1d-4a8e-9a43-3f0f6d0e8c11",
+        "role": "authenticated",
+        "email": "dr@example.com",
+    }
+    assert error.value.status_code == 401